@@ -0,0 +1,97 @@
+"""
+Throughput of a database bound endpoint under concurrent clients: a sync endpoint with a Session, which holds
+a thread of the threadpool for every query, against an async endpoint with an AsyncSession.
+Queries call a sleep() function registered in SQLite, standing for a slow query or the round trip to PostgreSQL.
+SQLite has no network, so the async endpoint is bound by the CPU of this process for low latencies.
+
+Usage: python -m benchmarks.bench_async_db [requests] [clients] [latency_ms]
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+import anyio.to_thread
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shop import constants
+
+DEFAULT_REQUESTS = 2_000
+DEFAULT_CLIENTS = 200
+DEFAULT_LATENCY_MS = 100
+
+
+def register_sleep(dbapi_connection, connection_record):
+    dbapi_connection.create_function("sleep", 1, lambda ms: time.sleep(ms / 1000) or ms)
+
+
+def make_app(path: str, latency_ms: int, clients: int) -> FastAPI:
+    # enough connections for every client, the threadpool is the only limit of the sync endpoint
+    engine = create_engine(f"sqlite:///{path}", pool_size=clients, connect_args={"check_same_thread": False})
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", pool_size=clients)
+    event.listen(engine, "connect", register_sleep)
+    event.listen(async_engine.sync_engine, "connect", register_sleep)
+    session_factory = sessionmaker(bind=engine)
+    async_session_factory = async_sessionmaker(async_engine)
+    query = text(f"SELECT sleep({latency_ms})")
+
+    def get_db():
+        with session_factory() as db:
+            yield db
+
+    async def get_async_db():
+        async with async_session_factory() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_endpoint(db: Session = Depends(get_db)):
+        return {"value": db.execute(query).scalar()}
+
+    @app.get("/async")
+    async def async_endpoint(db: AsyncSession = Depends(get_async_db)):
+        return {"value": (await db.execute(query)).scalar()}
+
+    return app
+
+
+async def run(app: FastAPI, path: str, requests: int, clients: int) -> float:
+    anyio.to_thread.current_default_thread_limiter().total_tokens = constants.THREADPOOL_SIZE
+    remaining = iter(range(requests))
+
+    async def client(async_client: httpx.AsyncClient):
+        for _ in remaining:
+            response = await async_client.get(path)
+            response.raise_for_status()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as async_client:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(async_client) for _ in range(clients)))
+        return time.perf_counter() - started
+
+
+def main(requests: int, clients: int, latency_ms: int):
+    with tempfile.TemporaryDirectory() as directory:
+        app = make_app(os.path.join(directory, "bench.db"), latency_ms, clients)
+        sync_elapsed = asyncio.run(run(app, "/sync", requests, clients))
+        async_elapsed = asyncio.run(run(app, "/async", requests, clients))
+
+    print(f"{requests} requests from {clients} clients, {latency_ms} ms per query, {constants.THREADPOOL_SIZE} threads")
+    # each thread runs at most 1000 / latency_ms queries per second
+    ceiling = constants.THREADPOOL_SIZE * 1000 / latency_ms
+    print(f"sync endpoint:  {requests / sync_elapsed:>8.0f} requests/s (threadpool ceiling {ceiling:.0f})")
+    print(f"async endpoint: {requests / async_elapsed:>8.0f} requests/s")
+    print(f"speedup {sync_elapsed / async_elapsed:.1f}x")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_REQUESTS, DEFAULT_CLIENTS, DEFAULT_LATENCY_MS][len(arguments) :]))
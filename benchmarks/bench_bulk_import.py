@@ -0,0 +1,91 @@
+"""
+Items created per minute by a shop: one POST /item/ per item against a single POST /item/bulk with a CSV
+of all the items, through the app with a SQLite database (authentication is skipped).
+
+Usage: python -m benchmarks.bench_bulk_import [bulk_items] [single_items]
+"""
+
+import csv
+import io
+import os
+import sys
+import tempfile
+import time
+
+from fastapi import Depends
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from shop import migrate, models
+from shop.main import app
+from shop.utils import get_current_shop, get_db
+
+DEFAULT_BULK_ITEMS = 50_000
+DEFAULT_SINGLE_ITEMS = 500
+
+
+def item_data(category_id: int, name: str) -> dict:
+    return {
+        "category_id": category_id,
+        "name": name,
+        "image": "/image.jpg",
+        "title": f"{name} title",
+        "description": f"{name} description",
+        "price": 9.5,
+    }
+
+
+def setup_app(path: str) -> int:
+    engine = create_engine(f"sqlite:///{path}")
+    migrate.upgrade(engine)
+    session_factory = sessionmaker(bind=engine, autoflush=False)
+    with session_factory() as db:
+        user = models.User(username="bench", email="bench@example.com", role="SHOP", _password="-")
+        user.shop = models.Shop(shop_name="Bench Shop", slug="bench-shop", is_approved=True)
+        user.shop.categories.append(models.Category(name="Bench", slug="bench-shop-bench"))
+        db.add(user)
+        db.commit()
+        category_id = user.shop.categories[0].id
+
+    def bench_db():
+        with session_factory() as db:
+            yield db
+
+    def bench_shop(db=Depends(get_db)):
+        return db.query(models.Shop).filter(models.Shop.slug == "bench-shop").one()
+
+    app.dependency_overrides[get_db] = bench_db
+    app.dependency_overrides[get_current_shop] = bench_shop
+    return category_id
+
+
+def main(bulk_items: int, single_items: int):
+    with tempfile.TemporaryDirectory() as directory:
+        category_id = setup_app(os.path.join(directory, "bulk.db"))
+        client = TestClient(app)
+
+        started = time.perf_counter()
+        for number in range(single_items):
+            response = client.post("/item/", json=item_data(category_id, f"single {number}"))
+            assert response.status_code == 200, response.text
+        single = time.perf_counter() - started
+
+        output = io.StringIO()
+        writer = csv.DictWriter(output, fieldnames=list(item_data(category_id, "")))
+        writer.writeheader()
+        writer.writerows(item_data(category_id, f"bulk {number}") for number in range(bulk_items))
+        content = output.getvalue().encode()
+        started = time.perf_counter()
+        response = client.post("/item/bulk", files={"file": ("items.csv", content, "text/csv")})
+        bulk = time.perf_counter() - started
+        assert response.status_code == 200 and response.json()["created"] == bulk_items, response.text
+        app.dependency_overrides.clear()
+
+    print(f"POST /item/     {single_items:>7} items {single:>8.2f} s {single_items / single * 60:>10.0f} items/minute")
+    print(f"POST /item/bulk {bulk_items:>7} items {bulk:>8.2f} s {bulk_items / bulk * 60:>10.0f} items/minute")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_BULK_ITEMS, DEFAULT_SINGLE_ITEMS][len(arguments) :]))
@@ -0,0 +1,65 @@
+"""
+Prices of a shop catalog changed per minute: one PATCH /item/{slug}/ per item against a single PATCH /item/bulk
+with the changes of all the items, through the app with a SQLite database (authentication is skipped).
+
+Usage: python -m benchmarks.bench_bulk_update [bulk_items] [single_items]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+
+from benchmarks.bench_bulk_import import item_data, setup_app
+from shop import models
+from shop.main import app
+from shop.utils import get_db
+
+DEFAULT_BULK_ITEMS = 50_000
+DEFAULT_SINGLE_ITEMS = 500
+
+
+def seed_items(category_id: int, items: int) -> list[str]:
+    db = next(app.dependency_overrides[get_db]())
+    shop = db.query(models.Shop).filter(models.Shop.slug == "bench-shop").one()
+    slugs = [f"bench-shop-item-{number}" for number in range(items)]
+    db.execute(
+        insert(models.Item),
+        [{**item_data(category_id, slug), "shop_id": shop.id, "slug": slug, "is_approved": True} for slug in slugs],
+    )
+    db.commit()
+    db.close()
+    return slugs
+
+
+def main(bulk_items: int, single_items: int):
+    with tempfile.TemporaryDirectory() as directory:
+        category_id = setup_app(os.path.join(directory, "bulk.db"))
+        slugs = seed_items(category_id, max(bulk_items, single_items))
+        client = TestClient(app)
+
+        started = time.perf_counter()
+        for slug in slugs[:single_items]:
+            response = client.patch(f"/item/{slug}/", json={"price": 12.5})
+            assert response.status_code == 200, response.text
+        single = time.perf_counter() - started
+
+        changes = [{"slug": slug, "price": 15.0, "is_available": True} for slug in slugs[:bulk_items]]
+        started = time.perf_counter()
+        response = client.patch("/item/bulk", json=changes)
+        bulk = time.perf_counter() - started
+        assert response.status_code == 200 and response.json()["updated"] == bulk_items, response.text
+        app.dependency_overrides.clear()
+
+    print(
+        f"PATCH /item/{{slug}}/ {single_items:>7} items {single:>8.2f} s {single_items / single * 60:>10.0f} items/minute"
+    )
+    print(f"PATCH /item/bulk     {bulk_items:>7} items {bulk:>8.2f} s {bulk_items / bulk * 60:>10.0f} items/minute")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_BULK_ITEMS, DEFAULT_SINGLE_ITEMS][len(arguments) :]))
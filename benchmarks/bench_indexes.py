@@ -0,0 +1,259 @@
+"""
+Time of the lookup helpers of shop.utils on a seeded SQLite database (1M orders by default), before and after
+the indexes of migration 0003: the schema is built by the migrations up to 0002, seeded, timed, then migrated
+to the latest revision and timed again.
+
+Usage: python -m benchmarks.bench_indexes [orders] [repeats]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+
+from shop import migrate, models, utils
+from shop.schemas import UserRoleEnum
+
+DEFAULT_ORDERS = 1_000_000
+DEFAULT_REPEATS = 20
+
+CUSTOMERS = 20_000
+SHOPS = 500
+CATEGORIES_PER_SHOP = 10
+ITEMS_PER_SHOP = 40
+CHUNK_SIZE = 50_000
+START = datetime(2025, 1, 1)
+
+
+def chunked_insert(connection, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == CHUNK_SIZE:
+            connection.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        connection.execute(insert(table), chunk)
+
+
+def seed(engine, orders: int):
+    rng = random.Random(0)
+    users = CUSTOMERS + SHOPS
+    items = SHOPS * ITEMS_PER_SHOP
+    with engine.begin() as connection:
+        chunked_insert(
+            connection,
+            models.User.__table__,
+            (
+                {
+                    "username": f"user{user_id}",
+                    "email": f"user{user_id}@example.com",
+                    "password": "-",
+                    "role": UserRoleEnum.SHOP if user_id <= SHOPS else UserRoleEnum.CUSTOMER,
+                }
+                for user_id in range(1, users + 1)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.Shop.__table__,
+            (
+                {"user_id": shop_id, "shop_name": f"shop{shop_id}", "slug": f"shop{shop_id}"}
+                for shop_id in range(1, SHOPS + 1)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.Category.__table__,
+            (
+                {"shop_id": shop_id, "name": f"category{number}", "slug": f"shop{shop_id}-category{number}"}
+                for shop_id in range(1, SHOPS + 1)
+                for number in range(CATEGORIES_PER_SHOP)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.Item.__table__,
+            (
+                {
+                    "shop_id": (item_id - 1) // ITEMS_PER_SHOP + 1,
+                    "category_id": (
+                        ((item_id - 1) // ITEMS_PER_SHOP) * CATEGORIES_PER_SHOP + item_id % CATEGORIES_PER_SHOP + 1
+                    ),
+                    "name": f"item{item_id}",
+                    "slug": f"item{item_id}",
+                    "price": float(item_id % 100 + 1),
+                    "is_approved": item_id % 10 != 0,
+                    "is_available": True,
+                }
+                for item_id in range(1, items + 1)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.Order.__table__,
+            (
+                {
+                    "user_id": rng.randint(SHOPS + 1, users),
+                    "order_key": f"pi_{order_id}",
+                    "billing_status": order_id % 10 != 0,
+                    "total_paid": 10.0,
+                }
+                for order_id in range(1, orders + 1)
+            ),
+        )
+        shop_orders = []
+        order_items = []
+        for order_id, user_id, billing_status in connection.execute(
+            models.Order.__table__.select().with_only_columns(
+                models.Order.id, models.Order.user_id, models.Order.billing_status
+            )
+        ):
+            shop_id = rng.randint(1, SHOPS)
+            shop_orders.append(
+                {
+                    "shop_id": shop_id,
+                    "order_id": order_id,
+                    "user_id": user_id,
+                    "billing_status": billing_status,
+                    "total_paid": 10.0,
+                    "created_at": START + timedelta(minutes=order_id),
+                }
+            )
+            for _ in range(rng.randint(1, 2)):
+                order_items.append(
+                    {
+                        "order_id": order_id,
+                        "item_id": (shop_id - 1) * ITEMS_PER_SHOP + rng.randint(1, ITEMS_PER_SHOP),
+                        "price": 5.0,
+                        "quantity": 1,
+                    }
+                )
+        chunked_insert(connection, models.ShopOrder.__table__, shop_orders)
+        chunked_insert(connection, models.OrderItem.__table__, order_items)
+        chunked_insert(
+            connection,
+            models.CartItem.__table__,
+            (
+                {"user_id": rng.randint(SHOPS + 1, users), "item_id": rng.randint(1, items), "price": 5.0}
+                for _ in range(CUSTOMERS)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.ItemReview.__table__,
+            (
+                {"user_id": rng.randint(SHOPS + 1, users), "item_id": rng.randint(1, items), "stars": 5}
+                for _ in range(CUSTOMERS)
+            ),
+        )
+        chunked_insert(
+            connection,
+            models.association_table,
+            ({"user_id": user_id, "item_id": rng.randint(1, items)} for user_id in range(SHOPS + 1, users + 1)),
+        )
+        connection.exec_driver_sql("ANALYZE")
+
+
+def helpers(orders: int) -> dict:
+    """
+    Calls of the helpers with random arguments, the 409/404 of empty results count like any other call.
+    """
+    users = CUSTOMERS + SHOPS
+    items = SHOPS * ITEMS_PER_SHOP
+
+    def customer(rng):
+        return rng.randint(SHOPS + 1, users)
+
+    def shop(rng):
+        return rng.randint(1, SHOPS)
+
+    def item_for_shop(db, rng):
+        item_id = rng.randint(1, items)
+        return utils.get_item_by_slug_for_shop(db, (item_id - 1) // ITEMS_PER_SHOP + 1, f"item{item_id}")
+
+    def period(rng):
+        start = START + timedelta(minutes=rng.randint(1, orders))
+        return str(start), str(start + timedelta(days=7))
+
+    return {
+        "get_cart_item": lambda db, rng: utils.get_cart_item(db, customer(rng), rng.randint(1, items)),
+        "get_cart_items": lambda db, rng: utils.get_cart_items(db, customer(rng)),
+        "get_orders": lambda db, rng: utils.get_orders(db, customer(rng)),
+        "get_order_by_order_key": lambda db, rng: utils.get_order_by_order_key(db, f"pi_{rng.randint(1, orders)}"),
+        "get_shop_orders": lambda db, rng: utils.get_shop_orders(db, shop(rng)),
+        "get_shop_orders_by_user_id_for_shop": lambda db, rng: utils.get_shop_orders_by_user_id_for_shop(
+            db, customer(rng), shop(rng)
+        ),
+        "get_all_users_ordered_in_shop": lambda db, rng: utils.get_all_users_ordered_in_shop(db, shop(rng)),
+        "get_stats_for_each_item": lambda db, rng: utils.get_stats_for_each_item(db, shop(rng)),
+        "get_total_revenue_with_filtering": lambda db, rng: utils.get_total_revenue_with_filtering(
+            db, shop(rng), *period(rng)
+        ),
+        "get_total_revenue": lambda db, rng: utils.get_total_revenue(db, shop(rng)),
+        "check_if_user_bought_item": lambda db, rng: utils.check_if_user_bought_item(
+            db, customer(rng), rng.randint(1, items)
+        ),
+        "check_free_category_name": lambda db, rng: utils.check_free_category_name(
+            db, shop(rng), f"category{rng.randint(0, CATEGORIES_PER_SHOP)}"
+        ),
+        "check_free_item_name": lambda db, rng: utils.check_free_item_name(
+            db, shop(rng), f"item{rng.randint(1, items)}"
+        ),
+        "get_item_by_slug_for_shop": item_for_shop,
+        "get_catalog_facets (shop)": lambda db, rng: utils.get_catalog_facets(db, shop=f"shop{shop(rng)}"),
+    }
+
+
+def run(session_factory, orders: int, repeats: int) -> dict:
+    timings = {}
+    for name, call in helpers(orders).items():
+        rng = random.Random(name)
+        with session_factory() as db:
+            started = time.perf_counter()
+            for _ in range(repeats):
+                try:
+                    call(db, rng)
+                except HTTPException:
+                    pass
+                db.expunge_all()
+            timings[name] = (time.perf_counter() - started) / repeats
+    return timings
+
+
+def main(orders: int, repeats: int):
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'indexes.db')}")
+        session_factory = sessionmaker(bind=engine)
+        migrate.upgrade(engine, "0002")
+
+        started = time.perf_counter()
+        seed(engine, orders)
+        print(f"seeded {orders} orders in {time.perf_counter() - started:.1f} s")
+        before = run(session_factory, orders, repeats)
+
+        started = time.perf_counter()
+        migrate.upgrade(engine)
+        with engine.begin() as connection:
+            connection.exec_driver_sql("ANALYZE")
+        print(f"created the indexes in {time.perf_counter() - started:.1f} s")
+        after = run(session_factory, orders, repeats)
+        engine.dispose()
+
+    print(f"{'helper':<36} {'before':>12} {'after':>12} {'speedup':>9}")
+    for name in before:
+        print(
+            f"{name:<36} {before[name] * 1000:>9.2f} ms {after[name] * 1000:>9.2f} ms "
+            f"{before[name] / after[name]:>8.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_ORDERS, DEFAULT_REPEATS][len(arguments) :]))
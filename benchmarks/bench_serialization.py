@@ -0,0 +1,111 @@
+"""
+Compare the serialization paths of list responses on 1k, 10k and 100k items:
+
+* response_model - pydantic validation of ORM objects, jsonable_encoder and stdlib json (FastAPI's default path)
+* type_adapter   - ORM objects validated and encoded by a cached TypeAdapter (FAST_SERIALIZATION off)
+* fast           - column rows encoded straight with orjson (FAST_SERIALIZATION on)
+
+Usage: python -m benchmarks.bench_serialization [rows ...]
+"""
+
+import json
+import sys
+import time
+from datetime import datetime
+from unittest.mock import patch
+
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from shop import serializers
+from shop.models import Base, Item, ItemReview
+from shop.schemas import ItemOut
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+REPEAT = 3
+
+
+def seed(db, rows: int):
+    db.execute(Item.__table__.delete())
+    db.execute(ItemReview.__table__.delete())
+    created_at = datetime(2024, 1, 1, 12, 30)
+    db.execute(
+        Item.__table__.insert(),
+        [
+            {
+                "id": item_id,
+                "shop_id": 1,
+                "category_id": 1,
+                "name": f"item-{item_id}",
+                "image": "https://example.com/image.png",
+                "title": f"Title of item {item_id}",
+                "description": "Description " * 10,
+                "price": item_id % 500 + 0.99,
+                "average_rating": item_id % 5 + 0.5,
+                "slug": f"item-{item_id}",
+                "is_approved": True,
+                "is_available": True,
+                "created_at": created_at,
+                "updated_at": created_at,
+            }
+            for item_id in range(1, rows + 1)
+        ],
+    )
+    # every tenth item has a review
+    db.execute(
+        ItemReview.__table__.insert(),
+        [{"item_id": item_id, "user_id": 1, "stars": 4, "comment": "Nice"} for item_id in range(1, rows + 1, 10)],
+    )
+    db.commit()
+
+
+def response_model_path(db) -> bytes:
+    items = db.query(Item).all()
+    models = [ItemOut.model_validate(item) for item in items]
+    return json.dumps(jsonable_encoder(models)).encode()
+
+
+def type_adapter_path(db) -> bytes:
+    with patch("shop.constants.FAST_SERIALIZATION", False):
+        items = serializers.project(db.query(Item), ItemOut).all()
+        return serializers.dump_list(db, items, ItemOut)
+
+
+def fast_path(db) -> bytes:
+    with patch("shop.constants.FAST_SERIALIZATION", True):
+        items = serializers.project(db.query(Item), ItemOut).all()
+        return serializers.dump_list(db, items, ItemOut)
+
+
+def best_of(function, session_factory) -> float:
+    timings = []
+    for _ in range(REPEAT):
+        # a fresh session every run, so no run reuses ORM objects of the previous one
+        with session_factory() as db:
+            started = time.perf_counter()
+            function(db)
+            timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main(sizes):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(bind=engine)
+    paths = {"response_model": response_model_path, "type_adapter": type_adapter_path, "fast": fast_path}
+
+    print(f"{'rows':>8} " + " ".join(f"{name:>16}" for name in paths) + f" {'speedup':>8}")
+    for rows in sizes:
+        with session_factory() as db:
+            seed(db, rows)
+            assert json.loads(fast_path(db)) == json.loads(response_model_path(db))
+        timings = {name: best_of(function, session_factory) for name, function in paths.items()}
+        speedup = timings["response_model"] / timings["fast"]
+        print(
+            f"{rows:>8} " + " ".join(f"{timing * 1000:>14.1f}ms" for timing in timings.values()) + f" {speedup:>7.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main([int(size) for size in sys.argv[1:]] or DEFAULT_SIZES)
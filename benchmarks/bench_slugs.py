@@ -0,0 +1,87 @@
+"""
+Creation of many items with the same name, each saved with its unique slug and committed like a request does:
+the previous allocation, which looks up one candidate slug per query and appends the counters (x-1-2-3),
+against the allocation of the next free suffix in a single query. The old one needs a query per item already
+there, so it only creates the first `legacy_items`.
+
+Usage: python -m benchmarks.bench_slugs [items] [legacy_items]
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from slugify import slugify
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from shop import migrate, utils
+from shop.models import Item
+from shop.querystats import collect
+
+DEFAULT_ITEMS = 10_000
+DEFAULT_LEGACY_ITEMS = 1_000
+SHOP_NAME = "Bench Shop"
+ITEM_NAME = "Popular Item"
+
+
+def legacy_item_slug(db: Session, shop_name: str, item_name: str):
+    unique_slug = f"{slugify(shop_name)}-{slugify(item_name)}"
+    counter = 1
+
+    while db.query(Item).filter(Item.slug == unique_slug).first():
+        unique_slug = f"{unique_slug}-{counter}"
+        counter += 1
+
+    return unique_slug
+
+
+def run(session_factory, generate_slug, items: int) -> dict:
+    statements = 0
+    last = []
+    started = time.perf_counter()
+    for number in range(items):
+        item_started = time.perf_counter()
+        with session_factory() as db, collect() as stats:
+            slug = utils.add_with_unique_slug(
+                db, Item(name=ITEM_NAME), lambda db: generate_slug(db, SHOP_NAME, ITEM_NAME)
+            )
+            db.commit()
+        statements += stats.count
+        if number >= items - 100:
+            last.append(time.perf_counter() - item_started)
+    return {
+        "seconds": time.perf_counter() - started,
+        "statements": statements / items,
+        "last": sum(last) / len(last),
+        "slug": slug,
+    }
+
+
+def main(items: int, legacy_items: int):
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        for name, generate_slug, count in [
+            ("per candidate", legacy_item_slug, legacy_items),
+            ("next suffix", utils.generate_unique_item_slug, items),
+        ]:
+            engine = create_engine(f"sqlite:///{os.path.join(directory, f'{count}-{name}.db')}")
+            migrate.upgrade(engine)
+            results[name] = (count, run(sessionmaker(bind=engine), generate_slug, count))
+            engine.dispose()
+
+    print(f"{'allocation':<14} {'items':>7} {'total':>9} {'statements/item':>16} {'last 100 items':>15}  last slug")
+    for name, (count, result) in results.items():
+        slug = (
+            result["slug"] if len(result["slug"]) <= 40 else f"{result['slug'][:37]}... ({len(result['slug'])} chars)"
+        )
+        print(
+            f"{name:<14} {count:>7} {result['seconds']:>7.2f} s {result['statements']:>16.1f} "
+            f"{result['last'] * 1000:>10.2f} ms/item  {slug}"
+        )
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_ITEMS, DEFAULT_LEGACY_ITEMS][len(arguments) :]))
@@ -0,0 +1,46 @@
+"""
+Cost of verifying an access token: python-jose decoding on every request against a hit
+of the verified token cache, for a pool of clients each sending its own token again and again.
+
+Usage: python -m benchmarks.bench_token_cache [requests] [clients]
+"""
+
+import sys
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+from shop.keyring import KeyRing
+
+DEFAULT_REQUESTS = 100_000
+DEFAULT_CLIENTS = 1_000
+
+
+def run(key_ring: KeyRing, tokens: list, requests: int) -> float:
+    started = time.perf_counter()
+    for number in range(requests):
+        key_ring.decode(tokens[number % len(tokens)], options={"verify_aud": False})
+    return time.perf_counter() - started
+
+
+def main(requests: int, clients: int):
+    expire = datetime.utcnow() + timedelta(days=8)
+    signing_ring = KeyRing({"bench": "bench-secret" * 4}, "bench")
+    tokens = [
+        signing_ring.encode({"type": "access_token", "sub": str(user_id), "exp": expire}) for user_id in range(clients)
+    ]
+
+    with patch("shop.constants.TOKEN_CACHE_MAXSIZE", 0):
+        uncached = run(KeyRing(signing_ring.keys, "bench"), tokens, requests)
+    cached_ring = KeyRing(signing_ring.keys, "bench")
+    cached = run(cached_ring, tokens, requests)
+
+    print(f"{requests} requests from {clients} clients")
+    print(f"jose decode:  {uncached / requests * 1e6:8.1f} us/request {requests / uncached:>10.0f} requests/s")
+    print(f"token cache:  {cached / requests * 1e6:8.1f} us/request {requests / cached:>10.0f} requests/s")
+    print(f"hit rate:     {cached_ring.verified.stats()['hit_rate']:.2%}, speedup {uncached / cached:.1f}x")
+
+
+if __name__ == "__main__":
+    arguments = [int(argument) for argument in sys.argv[1:]]
+    main(*(arguments + [DEFAULT_REQUESTS, DEFAULT_CLIENTS][len(arguments) :]))
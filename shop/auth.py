@@ -1,32 +1,30 @@
+import secrets
 from datetime import datetime, timedelta
 from typing import List, MutableMapping, Optional, Union
 
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
-from jose import jwt
 from jose.exceptions import ExpiredSignatureError, JWTError
-from passlib.context import CryptContext
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm.session import Session
 
-from shop import constants
+from shop import constants, revocation
+from shop.keyring import key_ring
 from shop.models import NewsLetter, User
+from shop.passwords import verify_password_async
 
 JWTPayloadMapping = MutableMapping[str, Union[datetime, bool, str, List[str], List[int]]]
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/login")
 
-PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return PWD_CONTEXT.verify(plain_password, hashed_password)
-
-
-def authenticate(*, email: str, password: str, db: Session) -> Optional[User]:
-    user = db.query(User).filter(User.email == email).first()
+async def authenticate(*, email: str, password: str, db: AsyncSession) -> Optional[User]:
+    user = (await db.execute(select(User).where(User.email == email))).scalars().first()
     if not user:
         return None
-    if not verify_password(password, user.password):  # 1
+    # bcrypt runs on the password hashing pool, the event loop keeps serving other requests meanwhile
+    if not await verify_password_async(password, user.password):  # 1
         return None
     return user
 
@@ -39,6 +37,26 @@ def create_access_token(*, sub: str) -> str:  # 2
     )
 
 
+def create_refresh_token(*, sub: str) -> str:
+    return _create_token(
+        token_type="refresh_token",
+        lifetime=timedelta(minutes=constants.REFRESH_TOKEN_EXPIRE_MINUTES),
+        sub=sub,
+    )
+
+
+def create_activation_token(*, sub: str) -> str:
+    return _create_token(token_type="activation_token", lifetime=timedelta(minutes=5), sub=sub)
+
+
+def create_reset_password_token(*, sub: str) -> str:
+    return _create_token(token_type="reset_password_token", lifetime=timedelta(hours=12), sub=sub)
+
+
+def create_newsletter_token(*, email: str) -> str:
+    return _create_token(token_type="newsletter_token", lifetime=timedelta(hours=12), sub=email)
+
+
 def _create_token(token_type: str, lifetime: timedelta, sub: str) -> str:
     payload = {}
     expire = datetime.utcnow() + lifetime
@@ -46,13 +64,37 @@ def _create_token(token_type: str, lifetime: timedelta, sub: str) -> str:
     payload["exp"] = expire
     payload["iat"] = datetime.utcnow()
     payload["sub"] = str(sub)
+    # id of the token, to revoke it
+    payload["jti"] = secrets.token_hex(16)
 
-    return jwt.encode(payload, constants.JWT_SECRET, constants.ALGORITHM)
+    return key_ring.encode(payload)
+
+
+def verify_refresh_token(token: str, db: Session) -> dict:
+    """
+    Claims of a valid refresh token which has not been used or revoked yet.
+    """
+    try:
+        payload = key_ring.decode(token)
+    except ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Token has expired.")
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token.")
+    if payload.get("type") != "refresh_token" or payload.get("sub") is None:
+        raise HTTPException(status_code=401, detail="Invalid token.")
+    if revocation.is_revoked(db, payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked.")
+    return payload
 
 
-def verify_token(token: str, db: Session):
+def verify_token(token: str, db: Session, token_type: str):
+    """
+    User of an emailed token, which must be of `token_type` (activation_token or reset_password_token).
+    """
     try:
-        payload = jwt.decode(token, constants.JWT_SECRET, algorithms=[constants.ALGORITHM])
+        payload = key_ring.decode(token)
+        if payload.get("type") != token_type:
+            raise HTTPException(status_code=401, detail="Invalid token.")
         user = db.query(User).filter(User.id == payload.get("sub")).first()
         if user:
             return user
@@ -66,7 +108,9 @@ def verify_token(token: str, db: Session):
 
 def verify_token_newsletter(token: str, db: Session):
     try:
-        payload = jwt.decode(token, constants.JWT_SECRET, algorithms=[constants.ALGORITHM])
+        payload = key_ring.decode(token)
+        if payload.get("type") != "newsletter_token":
+            raise HTTPException(status_code=401, detail="Invalid token.")
         email: str = payload.get("sub")
 
         if email is None:
@@ -0,0 +1,278 @@
+"""
+Bulk import and update of the items of a shop.
+
+Imports read the rows one by one from a CSV or NDJSON upload and handle them in batches of
+BULK_IMPORT_BATCH_SIZE: validated with schemas.ItemCreate, checked for taken names with one query, given
+slugs with one query (see utils.allocate_slugs) and inserted with a single executemany, each batch in its
+own transaction. Rows which fail are skipped and listed in the report, the other rows of their batch are imported.
+
+Updates change BULK_UPDATE_BATCH_SIZE items per UPDATE statement, in a single transaction.
+"""
+
+import codecs
+import csv
+import json
+import os
+from itertools import islice
+from typing import Iterable, Iterator, NamedTuple, Optional
+
+from fastapi import HTTPException, UploadFile
+from pydantic import ValidationError
+from sqlalchemy import String, case, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from shop import cache, constants, replica, schemas, utils
+from shop.models import Category, Item, Shop
+
+CSV_CONTENT_TYPES = {"text/csv", "application/csv"}
+NDJSON_CONTENT_TYPES = {"application/x-ndjson", "application/ndjson", "application/jsonl", "application/jsonlines"}
+CSV_EXTENSIONS = {".csv"}
+NDJSON_EXTENSIONS = {".ndjson", ".jsonl"}
+
+# String columns of the items with a length, checked before the insert fails the whole batch
+LIMITED_FIELDS = {
+    column.key: column.type.length
+    for column in Item.__table__.columns
+    if isinstance(column.type, String) and column.type.length
+}
+
+
+class Row(NamedTuple):
+    line: int
+    data: Optional[dict]
+    error: Optional[str] = None
+
+
+def upload_format(upload: UploadFile) -> str:
+    content_type = (upload.content_type or "").split(";")[0].strip().lower()
+    extension = os.path.splitext(upload.filename or "")[1].lower()
+    if content_type in CSV_CONTENT_TYPES or extension in CSV_EXTENSIONS:
+        return "csv"
+    if content_type in NDJSON_CONTENT_TYPES or extension in NDJSON_EXTENSIONS:
+        return "ndjson"
+    raise HTTPException(status_code=415, detail="Upload a CSV (.csv) or an NDJSON (.ndjson, .jsonl) file.")
+
+
+def read_csv(stream) -> Iterator[Row]:
+    """
+    Rows of a CSV file with a header line naming the fields of schemas.ItemCreate.
+    """
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    for data in reader:
+        if None in data:
+            yield Row(reader.line_num, None, "More values than columns in the header.")
+        else:
+            yield Row(reader.line_num, data)
+
+
+def read_ndjson(stream) -> Iterator[Row]:
+    """
+    Rows of a file with a JSON object per line, blank lines are skipped.
+    """
+    for line, text in enumerate(codecs.iterdecode(stream, "utf-8-sig"), start=1):
+        if not text.strip():
+            continue
+        try:
+            data = json.loads(text)
+        except json.JSONDecodeError:
+            yield Row(line, None, "Invalid JSON.")
+            continue
+        if not isinstance(data, dict):
+            yield Row(line, None, "Expected a JSON object.")
+            continue
+        yield Row(line, data)
+
+
+READERS = {"csv": read_csv, "ndjson": read_ndjson}
+
+
+def _validation_messages(error: ValidationError) -> list[str]:
+    return [f"{'.'.join(str(part) for part in detail['loc'])}: {detail['msg']}" for detail in error.errors()]
+
+
+class ItemImport:
+    """
+    Import of rows into the items of `shop`, `report()` once all the rows went through `run`.
+    """
+
+    def __init__(self, db: Session, shop: Shop, batch_size: int = constants.BULK_IMPORT_BATCH_SIZE):
+        self.db = db
+        self.shop_id = shop.id
+        self.shop_name = shop.shop_name
+        self.batch_size = batch_size
+        self.category_ids = set(db.scalars(select(Category.id).where(Category.shop_id == shop.id)))
+        # names of the rows imported so far, names in the database are checked per batch
+        self.names = set()
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+
+    def fail(self, line: int, errors: list[str]):
+        self.failed += 1
+        if len(self.errors) < constants.BULK_IMPORT_MAX_ERRORS:
+            self.errors.append(schemas.ItemImportError(line=line, errors=errors))
+
+    def run(self, rows: Iterable[Row]):
+        rows = iter(rows)
+        try:
+            while batch := list(islice(rows, self.batch_size)):
+                self.import_batch(batch)
+        except UnicodeDecodeError:
+            self.fail(0, ["The file is not UTF-8 text, the rows after the last imported batch were skipped."])
+
+    def validate(self, row: Row) -> Optional[schemas.ItemCreate]:
+        if row.error:
+            self.fail(row.line, [row.error])
+            return None
+        try:
+            item = schemas.ItemCreate.model_validate(row.data)
+        except ValidationError as error:
+            self.fail(row.line, _validation_messages(error))
+            return None
+        errors = [
+            f"{field}: At most {length} characters."
+            for field, length in LIMITED_FIELDS.items()
+            if len(getattr(item, field, None) or "") > length
+        ]
+        if item.category_id not in self.category_ids:
+            errors.append("category_id: Category not found.")
+        if item.name in self.names:
+            errors.append(f"name: The file has another item with the name '{item.name}'.")
+        if errors:
+            self.fail(row.line, errors)
+            return None
+        return item
+
+    def import_batch(self, batch: list[Row]):
+        items = {}
+        for row in batch:
+            item = self.validate(row)
+            if item is not None:
+                items[row.line] = item
+                self.names.add(item.name)
+        if not items:
+            return
+
+        names = [item.name for item in items.values()]
+        taken = set(self.db.scalars(select(Item.name).where(Item.shop_id == self.shop_id, Item.name.in_(names))))
+        for line, item in list(items.items()):
+            if item.name in taken:
+                self.fail(line, [f"name: You already have item with the name '{item.name}'."])
+                del items[line]
+        if not items:
+            return
+
+        base_slugs = [utils.item_base_slug(self.shop_name, item.name) for item in items.values()]
+        for attempt in range(constants.SLUG_ATTEMPTS):
+            slugs = utils.allocate_slugs(self.db, Item.slug, base_slugs)
+            values = [
+                {**item.model_dump(), "shop_id": self.shop_id, "slug": slug}
+                for item, slug in zip(items.values(), slugs)
+            ]
+            try:
+                self.db.execute(insert(Item), values)
+                self.commit_inserted(len(values))
+            except IntegrityError as error:
+                self.db.rollback()
+                if utils.is_unique_violation(error, Item.slug):
+                    # a concurrent request took one of the slugs
+                    continue
+                # another constraint failed for some of the rows, they are found by inserting the rows one by one
+                self.import_rows_one_by_one(dict(zip(items, values)))
+            return
+        for line in items:
+            self.fail(line, ["slug: Slug is already taken, try again."])
+
+    def import_rows_one_by_one(self, values_by_line: dict[int, dict]):
+        inserted = 0
+        for line, values in values_by_line.items():
+            try:
+                with self.db.begin_nested():
+                    self.db.execute(insert(Item), [values])
+            except IntegrityError as error:
+                if utils.is_unique_violation(error, Item.slug):
+                    self.fail(line, ["slug: Slug is already taken, try again."])
+                else:
+                    self.fail(line, [f"The item could not be saved: {str(error.orig).splitlines()[0]}"])
+                continue
+            inserted += 1
+        self.commit_inserted(inserted)
+
+    def commit_inserted(self, inserted: int):
+        if inserted:
+            # the executemany doesn't go through the flush, which tracks the changes otherwise
+            cache.record_bulk_change(self.db, cache.catalog_cache, cache.items_inserted_tags(self.shop_id))
+            replica.remember_write(self.db)
+        self.db.commit()
+        self.created += inserted
+
+    def report(self) -> schemas.ItemImportOut:
+        self.errors.sort(key=lambda error: error.line)
+        return schemas.ItemImportOut(created=self.created, failed=self.failed, errors=self.errors)
+
+
+def import_items(db: Session, shop: Shop, upload: UploadFile) -> schemas.ItemImportOut:
+    rows = READERS[upload_format(upload)](upload.file)
+    item_import = ItemImport(db, shop)
+    item_import.run(rows)
+    return item_import.report()
+
+
+def update_items(
+    db: Session, shop: Shop, changes: list[schemas.ItemBulkPatch], batch_size: int = constants.BULK_UPDATE_BATCH_SIZE
+) -> schemas.ItemBulkPatchOut:
+    """
+    Apply the changes to the items of `shop` with one UPDATE per batch of items, which sets every changed
+    column with a CASE over the slugs. The caches are invalidated once, when the changes are committed.
+    """
+    # like separate requests, the last change of a field wins
+    values_by_slug = {}
+    for change in changes:
+        values_by_slug.setdefault(change.slug, {}).update(change.model_dump(exclude={"slug"}, exclude_none=True))
+    values_by_slug = {slug: values for slug, values in values_by_slug.items() if values}
+    if not values_by_slug:
+        raise HTTPException(status_code=422, detail="Model was not changed.")
+
+    category_ids = {values["category_id"] for values in values_by_slug.values() if "category_id" in values}
+    if category_ids:
+        shop_category_ids = set(
+            db.scalars(select(Category.id).where(Category.shop_id == shop.id, Category.id.in_(category_ids)))
+        )
+        if category_ids - shop_category_ids:
+            raise HTTPException(status_code=409, detail="Category not found.")
+
+    shop_id = shop.id
+    updated = {}
+    fields = set()
+    slugs = list(values_by_slug)
+    for start in range(0, len(slugs), batch_size):
+        batch = {slug: values_by_slug[slug] for slug in slugs[start : start + batch_size]}
+        batch_fields = sorted({field for values in batch.values() for field in values})
+        statement = (
+            update(Item)
+            .where(Item.shop_id == shop_id, Item.slug.in_(list(batch)))
+            .values(
+                {
+                    field: case(
+                        {slug: values[field] for slug, values in batch.items() if field in values},
+                        value=Item.slug,
+                        else_=getattr(Item, field),
+                    )
+                    for field in batch_fields
+                }
+            )
+            .returning(Item.id, Item.slug)
+            .execution_options(synchronize_session=False)
+        )
+        updated.update({slug: item_id for item_id, slug in db.execute(statement)})
+        fields.update(batch_fields)
+
+    if updated:
+        # the UPDATE statements don't go through the flush, which tracks the changes otherwise
+        cache.record_bulk_change(db, cache.catalog_cache, cache.items_updated_tags(shop_id, updated.values(), fields))
+        replica.remember_write(db)
+    db.commit()
+    return schemas.ItemBulkPatchOut(
+        updated=len(updated), not_found=[slug for slug in values_by_slug if slug not in updated]
+    )
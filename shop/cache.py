@@ -0,0 +1,360 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Hashable, Iterable, NamedTuple, Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from shop import constants
+from shop.models import Category, Item, ItemReview, Shop, User
+
+# Item columns that decide whether an item shows up in a catalog list at all
+CATALOG_MEMBERSHIP_FIELDS = ("is_approved", "is_available", "shop_id", "category_id")
+# Item columns that catalog lists are sorted or range-filtered by
+CATALOG_ORDER_FIELDS = ("price", "average_rating", "created_at")
+
+
+class TTLCache:
+    """
+    Thread-safe LRU cache with a time-to-live for every entry.
+    Entries can be tagged and dropped by tag, so writers don't need to know the exact cache keys.
+    A cache with maxsize 0 stores nothing.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, value, tags)
+        self._keys_by_tag = defaultdict(set)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            expires_at, value, _ = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value, tags: Iterable[Hashable] = (), ttl: Optional[float] = None):
+        if self.maxsize <= 0:
+            return
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        tags = frozenset(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (expires_at, value, tags)
+            for tag in tags:
+                self._keys_by_tag[tag].add(key)
+            while len(self._entries) > self.maxsize:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def invalidate(self, *tags: Hashable):
+        """
+        Drop every entry carrying any of the given tags.
+        """
+        with self._lock:
+            for tag in tags:
+                for key in self._keys_by_tag.pop(tag, ()):
+                    if key in self._entries:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_tag.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._keys_by_tag.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._keys_by_tag[tag]
+
+
+class Principal(NamedTuple):
+    """
+    Authenticated user resolved from a token: the user's columns (without the password hash)
+    and the id of the user's approved shop.
+    """
+
+    user_id: int
+    role: str
+    is_active: bool
+    is_superuser: bool
+    shop_id: Optional[int]
+    user: dict
+
+
+class CachedResponse(NamedTuple):
+    body: bytes
+    headers: dict
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def _as_utc(value: datetime) -> datetime:
+    # sqlite returns naive datetimes, they are stored in UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def make_cached_response(body: bytes, headers: dict = None, last_modified: datetime = None) -> CachedResponse:
+    """
+    Serialized JSON response with its validators: a strong ETag (digest of the body)
+    and Last-Modified (when known).
+    """
+    etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+    headers = dict(headers or {})
+    headers["ETag"] = etag
+    if last_modified is not None:
+        last_modified = _as_utc(last_modified).replace(microsecond=0)
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return CachedResponse(body=body, headers=headers, etag=etag, last_modified=last_modified)
+
+
+def is_not_modified(request: Request, cached: CachedResponse) -> bool:
+    """
+    Evaluate If-None-Match, or If-Modified-Since when there is no If-None-Match (RFC 9110, 13.2.2).
+    """
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {etag.strip().removeprefix("W/") for etag in if_none_match.split(",")}
+        return "*" in etags or cached.etag in etags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and cached.last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        return cached.last_modified <= _as_utc(since)
+
+    return False
+
+
+def conditional_response(request: Request, cached: CachedResponse) -> Response:
+    if is_not_modified(request, cached):
+        return Response(status_code=304, headers=cached.headers)
+    return Response(content=cached.body, media_type="application/json", headers=cached.headers)
+
+
+def last_modified_of(*records) -> Optional[datetime]:
+    """
+    Latest modification time of items (updated_at) or shops (modified_at), falling back to created_at.
+    """
+    timestamps = []
+    for record in records:
+        timestamp = getattr(record, "updated_at", None) or getattr(record, "modified_at", None) or record.created_at
+        if timestamp is not None:
+            timestamps.append(_as_utc(timestamp))
+    return max(timestamps, default=None)
+
+
+catalog_cache = TTLCache(maxsize=constants.CATALOG_CACHE_MAXSIZE, ttl=constants.CATALOG_CACHE_TTL)
+# a ttl of 0 turns the principal cache off, every request then looks the user up
+principal_cache = TTLCache(
+    maxsize=constants.PRINCIPAL_CACHE_MAXSIZE if constants.PRINCIPAL_CACHE_TTL > 0 else 0,
+    ttl=constants.PRINCIPAL_CACHE_TTL,
+)
+
+
+def principal_key(sub: str) -> tuple:
+    return ("principal", sub)
+
+
+def principal_tags(principal: Principal) -> set:
+    return {("user", principal.user_id)}
+
+
+def item_detail_key(item_slug: str, fieldset: tuple = None) -> tuple:
+    return ("item", item_slug, fieldset)
+
+
+def item_list_key(**filters) -> tuple:
+    """
+    Normalized filter tuple of a catalog list, empty filters are the same as missing ones.
+    """
+    return ("items",) + tuple((name, value if value != "" else None) for name, value in sorted(filters.items()))
+
+
+def item_facets_key(**filters) -> tuple:
+    return ("facets",) + item_list_key(**filters)[1:]
+
+
+def item_detail_tags(item: Item) -> set:
+    return {("item", item.id)}
+
+
+def item_list_tags(items: list[Item], shop: str = None, category: str = None, sort=None, **ranges) -> set:
+    """
+    Tags of a catalog page: every listed item and shop, plus the filters it was built with.
+    Pages which new items from any shop could join are tagged with the whole catalog,
+    sorted or range-filtered pages also with the ordered catalog.
+    """
+    tags = {("item", item.id) for item in items}
+    shop_ids = {item.shop_id for item in items}
+    tags.update(("shop", shop_id) for shop_id in shop_ids)
+    if not shop or len(shop_ids) != 1:
+        # no shop filter, or an unknown shop slug which falls back to the whole catalog
+        tags.add(("catalog",))
+    if shop:
+        tags.add(("shop-slug", shop))
+    if category:
+        tags.add(("category", category))
+    if sort is not None or any(value is not None for value in ranges.values()):
+        tags.add(("ordered-catalog",))
+    return tags
+
+
+def _old_and_new_values(obj, field: str) -> set:
+    history = inspect(obj).attrs[field].history
+    return {value for value in (*history.deleted, getattr(obj, field)) if value is not None}
+
+
+def _changed_fields(obj) -> set:
+    state = inspect(obj)
+    return {attr.key for attr in state.attrs if attr.history.has_changes()}
+
+
+def _catalog_tags_for_change(obj, change: str) -> set:
+    tags = set()
+    if isinstance(obj, (Item, Category, Shop)):
+        # facets count every item by shop, category, price and rating
+        tags.add(("facets",))
+    if isinstance(obj, Item):
+        tags.add(("item", obj.id))
+        changed_fields = _changed_fields(obj) if change == "dirty" else set()
+        if change == "new" or changed_fields & set(CATALOG_MEMBERSHIP_FIELDS):
+            tags.add(("catalog",))
+            tags.update(("shop", shop_id) for shop_id in _old_and_new_values(obj, "shop_id"))
+        if changed_fields & set(CATALOG_ORDER_FIELDS):
+            # the item may move into (or out of) sorted and range-filtered pages
+            tags.add(("ordered-catalog",))
+    elif isinstance(obj, ItemReview):
+        tags.update(("item", item_id) for item_id in _old_and_new_values(obj, "item_id"))
+    elif isinstance(obj, Category):
+        tags.update(("category", name) for name in _old_and_new_values(obj, "name"))
+    elif isinstance(obj, Shop):
+        tags.add(("shop", obj.id))
+        tags.update(("shop-slug", slug) for slug in _old_and_new_values(obj, "slug"))
+    return tags
+
+
+def _principal_tags_for_change(obj, change: str) -> set:
+    if isinstance(obj, User):
+        return {("user", obj.id)}
+    if isinstance(obj, Shop):
+        # approval, creation or deletion of the shop changes the user's approved shop
+        return {("user", user_id) for user_id in _old_and_new_values(obj, "user_id")}
+    return set()
+
+
+def record_bulk_change(session: Session, cache: TTLCache, tags: Iterable[Hashable]):
+    """
+    Invalidate `tags` once the transaction is committed, for bulk statements which don't go through the flush.
+    """
+    session.info.setdefault("cache_tags", {}).setdefault(id(cache), set()).update(tags)
+
+
+def items_inserted_tags(shop_id: int) -> set:
+    """
+    Tags of new items of a shop, what _catalog_tags_for_change returns for each of them.
+    """
+    return {("facets",), ("catalog",), ("shop", shop_id)}
+
+
+def items_updated_tags(shop_id: int, item_ids: Iterable[int], fields: Iterable[str]) -> set:
+    """
+    Tags of items of a shop with `fields` changed, what _catalog_tags_for_change returns for each of them.
+    """
+    fields = set(fields)
+    tags = {("facets",)}
+    tags.update(("item", item_id) for item_id in item_ids)
+    if fields & set(CATALOG_MEMBERSHIP_FIELDS):
+        tags.update({("catalog",), ("shop", shop_id)})
+    if fields & set(CATALOG_ORDER_FIELDS):
+        tags.add(("ordered-catalog",))
+    return tags
+
+
+# caches invalidated on commit -> function returning the tags of a new, changed or deleted object
+INVALIDATED_CACHES = (
+    (catalog_cache, _catalog_tags_for_change),
+    (principal_cache, _principal_tags_for_change),
+)
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_cache_changes(session, flush_context):
+    # the caches are invalidated only once the transaction is committed,
+    # otherwise a concurrent read could cache the old rows again before the commit
+    changes = [("new", obj) for obj in session.new]
+    changes += [("dirty", obj) for obj in session.dirty if session.is_modified(obj, include_collections=False)]
+    changes += [("deleted", obj) for obj in session.deleted]
+    tags_by_cache = session.info.setdefault("cache_tags", {})
+    for cache, tags_for_change in INVALIDATED_CACHES:
+        tags = tags_by_cache.setdefault(id(cache), set())
+        for change, obj in changes:
+            tags |= tags_for_change(obj, change)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_caches(session):
+    tags_by_cache = session.info.pop("cache_tags", None)
+    if not tags_by_cache:
+        return
+    for cache, _ in INVALIDATED_CACHES:
+        tags = tags_by_cache.get(id(cache))
+        if tags:
+            cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_cache_changes(session):
+    # a rolled back savepoint (e.g. a slug conflict) keeps the changes flushed before it
+    if session.in_nested_transaction():
+        return
+    session.info.pop("cache_tags", None)
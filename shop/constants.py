@@ -6,10 +6,82 @@ from dotenv import load_dotenv
 load_dotenv()
 
 ENVIRONMENT = os.environ.get("ENV")
-# Generate a random secret key (e.g., 64 characters in length)
-JWT_SECRET = secrets.token_urlsafe(64)
+# JWT signing keys shared by all processes (see shop/keyring.py): a JSON object {"kid": "secret", ...}
+# in JWT_KEYS or in the file JWT_KEYS_FILE, the active key is JWT_ACTIVE_KID (or the last one)
+JWT_KEYS = os.getenv("JWT_KEYS")
+JWT_KEYS_FILE = os.getenv("JWT_KEYS_FILE")
+JWT_ACTIVE_KID = os.getenv("JWT_ACTIVE_KID")
+# Single signing key used without a key ring, random (e.g., 64 characters in length) when not configured
+JWT_SECRET_CONFIGURED = bool(os.getenv("JWT_SECRET"))
+JWT_SECRET = os.getenv("JWT_SECRET") or secrets.token_urlsafe(64)
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 8
+ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 15))
+REFRESH_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_MINUTES", 60 * 24 * 8))
+# Seconds between two loads of the tokens revoked by other processes
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", 10))
+
+# Keyset pagination of the public catalog
+ITEMS_PAGE_SIZE: int = 100
+ITEMS_MAX_PAGE_SIZE: int = 500
+
+# Rows fetched per round trip by the streaming catalog export
+EXPORT_BATCH_SIZE: int = 1000
+
+# Bucket boundaries of the catalog facets
+PRICE_FACET_BOUNDARIES = (10, 25, 50, 100, 250, 500)
+RATING_FACET_BOUNDARIES = (1, 2, 3, 4)
+
+# In-process cache of serialized catalog responses
+CATALOG_CACHE_MAXSIZE = int(os.getenv("CATALOG_CACHE_MAXSIZE", 2048))
+CATALOG_CACHE_TTL = float(os.getenv("CATALOG_CACHE_TTL", 60))
+
+# Decoded claims of verified tokens, kept until the token expires (tokens without exp for TOKEN_CACHE_TTL)
+TOKEN_CACHE_MAXSIZE = int(os.getenv("TOKEN_CACHE_MAXSIZE", 10000))
+TOKEN_CACHE_TTL = float(os.getenv("TOKEN_CACHE_TTL", 300))
+
+# Process-local cache of authenticated users, keyed by the token subject.
+# Other processes see a deactivation or role change only once their entry expires, so keep the ttl short.
+PRINCIPAL_CACHE_MAXSIZE = int(os.getenv("PRINCIPAL_CACHE_MAXSIZE", 10000))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", 30))
+
+# Threads hashing and verifying passwords, and the number of jobs (queued and running) accepted before 503s
+PASSWORD_HASHING_WORKERS = int(os.getenv("PASSWORD_HASHING_WORKERS", min(4, os.cpu_count() or 1)))
+PASSWORD_HASHING_MAX_PENDING = int(os.getenv("PASSWORD_HASHING_MAX_PENDING", 64))
+
+# Statements per request: sent in X-Query-* response headers (not in prod unless enabled), and a statement
+# shape sent N_PLUS_ONE_THRESHOLD times or more in a request is logged as a probable N+1
+QUERY_STATS_HEADERS = os.getenv("QUERY_STATS_HEADERS", str(ENVIRONMENT != "prod")).lower() in ("1", "true", "yes")
+N_PLUS_ONE_THRESHOLD = int(os.getenv("N_PLUS_ONE_THRESHOLD", 5))
+
+# Bulk item imports: rows validated, checked and inserted per transaction, failed rows listed in the report
+BULK_IMPORT_BATCH_SIZE = int(os.getenv("BULK_IMPORT_BATCH_SIZE", 1000))
+BULK_IMPORT_MAX_ERRORS = int(os.getenv("BULK_IMPORT_MAX_ERRORS", 1000))
+# Bulk item updates: items changed per UPDATE statement, all of them in one transaction
+BULK_UPDATE_BATCH_SIZE = int(os.getenv("BULK_UPDATE_BATCH_SIZE", 500))
+BULK_UPDATE_MAX_ITEMS = int(os.getenv("BULK_UPDATE_MAX_ITEMS", 50000))
+
+# Slugs generated again when a concurrent request saved the same slug first, before answering 409
+SLUG_ATTEMPTS = int(os.getenv("SLUG_ATTEMPTS", 3))
+
+# Threads running the sync (`def`) endpoints and dependencies, `async def` ones use the async engine instead
+THREADPOOL_SIZE = int(os.getenv("THREADPOOL_SIZE", 40))
+
+# Throttling of login and signup attempts, which run bcrypt (off when running the tests unless enabled)
+RATE_LIMIT_ENABLED = os.getenv(
+    "RATE_LIMIT_ENABLED", "false" if os.getenv("ENVIRONMENT") == "test" else "true"
+).lower() in ("1", "true", "yes")
+# Take the client address from X-Forwarded-For, only behind a proxy which sets it
+RATE_LIMIT_TRUST_FORWARDED_FOR = os.getenv("RATE_LIMIT_TRUST_FORWARDED_FOR", "false").lower() in ("1", "true", "yes")
+# token buckets: (capacity, requests per second), sliding windows: (requests, seconds)
+LOGIN_IP_BUCKET = (10, 10 / 60)
+LOGIN_IP_WINDOW = (100, 60 * 60)
+LOGIN_ACCOUNT_WINDOW = (10, 15 * 60)
+SIGNUP_IP_BUCKET = (5, 1 / 60)
+SIGNUP_IP_WINDOW = (20, 60 * 60)
+SIGNUP_ACCOUNT_WINDOW = (3, 60 * 60)
+
+# Encode large list responses from column rows with orjson instead of validating ORM objects in pydantic
+FAST_SERIALIZATION = os.getenv("FAST_SERIALIZATION", "false").lower() in ("1", "true", "yes")
 
 STRIPE_API_KEY = os.environ.get("STRIPE_SECRET_KEY")
 
@@ -20,5 +92,26 @@ POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
 POSTGRES_HOST = os.getenv("POSTGRES_HOST")
+# Full database URL, takes precedence over the POSTGRES_* variables
+DATABASE_URL = os.getenv("DATABASE_URL")
+
+# Optional read replica of DATABASE_URL for the read-only endpoints, skipped while it lags more than
+# REPLICA_MAX_LAG seconds (checked every REPLICA_LAG_CHECK_INTERVAL seconds). A user who has written
+# reads from the primary for REPLICA_MAX_LAG seconds. Catalog responses cached from a lagging replica
+# are at most REPLICA_MAX_LAG seconds older than CATALOG_CACHE_TTL allows.
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+REPLICA_MAX_LAG = float(os.getenv("REPLICA_MAX_LAG", 5))
+REPLICA_LAG_CHECK_INTERVAL = float(os.getenv("REPLICA_LAG_CHECK_INTERVAL", 2))
+
+# Connection pool of every process (and of the sync and the async engine each): at most
+# DB_POOL_SIZE + DB_MAX_OVERFLOW connections, keep replicas * workers * 2 * that below max_connections.
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 10))
+# Seconds to wait for a free connection before failing the request
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 30))
+# Seconds after which a connection is replaced, below the server or proxy idle timeout (-1 never)
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+# Test connections with a round trip when they are checked out, dropped connections are replaced
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes")
 
 SENDGRID_API_KEY = os.environ.get("SENDGRID_API_KEY")
@@ -1,24 +1,116 @@
 import os
 
-from sqlalchemy import create_engine
+from sqlalchemy import URL, create_engine, make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.sql.dml import UpdateBase
+from sqlalchemy.sql.selectable import Select
 
 from shop import constants
+from shop.pooling import MonitoredAsyncQueuePool, MonitoredQueuePool, monitor_pool
 
-SQLALCHEMY_DATABASE_URL = (
+SQLALCHEMY_DATABASE_URL = constants.DATABASE_URL or (
     f"postgresql://{constants.POSTGRES_USER}:{constants.POSTGRES_PASSWORD}"
     f"@{constants.POSTGRES_HOST}/{constants.POSTGRES_DB}"
 )
 
 # SQLALCHEMY_DATABASE_URL = "sqlite:///./shop.db"
-# SQLALCHEMY_DATABASE_URL = os.getenv('SQLALCHEMY_DATABASE_URL')
 SQLALCHEMY_DATABASE_URL_TEST = "sqlite:///./test.db"
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-test_engine = create_engine(SQLALCHEMY_DATABASE_URL_TEST, connect_args={"check_same_thread": False})
+ASYNC_DRIVERS = {"postgresql": "asyncpg", "sqlite": "aiosqlite"}
+
+
+def async_url(url: str) -> URL:
+    """
+    The same database through its asyncio driver.
+    """
+    url = make_url(url)
+    backend = url.get_backend_name()
+    return url.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}")
+
+
+def pool_options() -> dict:
+    return {
+        "pool_size": constants.DB_POOL_SIZE,
+        "max_overflow": constants.DB_MAX_OVERFLOW,
+        "pool_timeout": constants.DB_POOL_TIMEOUT,
+        "pool_recycle": constants.DB_POOL_RECYCLE,
+        "pool_pre_ping": constants.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(SQLALCHEMY_DATABASE_URL, poolclass=MonitoredQueuePool, **pool_options())
+test_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL_TEST,
+    connect_args={"check_same_thread": False},
+    poolclass=MonitoredQueuePool,
+    **pool_options(),
+)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
+async_engine = create_async_engine(
+    async_url(SQLALCHEMY_DATABASE_URL), poolclass=MonitoredAsyncQueuePool, **pool_options()
+)
+async_test_engine = create_async_engine(
+    async_url(SQLALCHEMY_DATABASE_URL_TEST), poolclass=MonitoredAsyncQueuePool, **pool_options()
+)
+
+# objects stay loaded after commit, expired attributes can't be lazy loaded outside of the greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+AsyncTestingSessionLocal = async_sessionmaker(async_test_engine, autoflush=False, expire_on_commit=False)
+
+# optional streaming replica of the primary database, for read-only endpoints
+replica_engine = (
+    create_engine(constants.DATABASE_REPLICA_URL, poolclass=MonitoredQueuePool, **pool_options())
+    if constants.DATABASE_REPLICA_URL
+    else None
+)
+async_replica_engine = (
+    create_async_engine(async_url(constants.DATABASE_REPLICA_URL), poolclass=MonitoredAsyncQueuePool, **pool_options())
+    if constants.DATABASE_REPLICA_URL
+    else None
+)
+
+
+class RoutingSession(Session):
+    """
+    Session running its SELECTs on the replica, while flushes and other statements go to the primary (bind).
+    After the first write every statement goes to the primary, the session reads its own writes.
+    """
+
+    def __init__(self, *args, replica=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.replica = replica
+
+    def get_bind(self, mapper=None, *, clause=None, **kwargs):
+        if self.replica is not None:
+            if self._flushing or isinstance(clause, UpdateBase):
+                self.replica = None
+            elif isinstance(clause, Select):
+                return self.replica
+        return super().get_bind(mapper, clause=clause, **kwargs)
+
+
+ReadSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=engine)
+ReadTestingSessionLocal = sessionmaker(class_=RoutingSession, autocommit=False, autoflush=False, bind=test_engine)
+# the replica of these is the sync_engine of an asyncio engine
+AsyncReadSessionLocal = async_sessionmaker(
+    async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+AsyncReadTestingSessionLocal = async_sessionmaker(
+    async_test_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+# pool stats of an engine are in engine.pool.monitor
+monitor_pool(engine, "sync")
+monitor_pool(async_engine.sync_engine, "async")
+monitor_pool(test_engine, "test")
+monitor_pool(async_test_engine.sync_engine, "test-async")
+if replica_engine is not None:
+    monitor_pool(replica_engine, "replica")
+    monitor_pool(async_replica_engine.sync_engine, "replica-async")
+
 Base = declarative_base()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from typing import Optional
+
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+from shop import constants
+from shop.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Minimal seconds between two checks of the key file for changes (e.g. an updated kubernetes secret)
+KEY_FILE_RELOAD_INTERVAL = 5.0
+
+
+class KeyRing:
+    """
+    JWT signing keys shared by every process: tokens are signed with the active key and carry its id
+    in the `kid` header, every key of the ring verifies tokens.
+
+    Rotation: add the new key to the ring everywhere, then make it the active one, and drop the old key
+    once the last token signed with it has expired.
+    """
+
+    def __init__(self, keys: dict, active_kid: str, algorithm: str = constants.ALGORITHM, path: str = None):
+        if not keys:
+            raise ValueError("The JWT key ring is empty.")
+        if active_kid not in keys:
+            raise ValueError(f"The active JWT key {active_kid!r} is not in the key ring.")
+        self.keys = dict(keys)
+        self.active_kid = active_kid
+        self.algorithm = algorithm
+        self.path = path
+        self._path_mtime = os.path.getmtime(path) if path else None
+        self._reloaded_at = time.monotonic()
+        self._lock = threading.Lock()
+        # verified claims by token digest, a token is decoded once and not on every request
+        self.verified = TTLCache(maxsize=constants.TOKEN_CACHE_MAXSIZE, ttl=constants.TOKEN_CACHE_TTL)
+
+    @classmethod
+    def from_file(cls, path: str, active_kid: str = None) -> "KeyRing":
+        with open(path) as key_file:
+            keys, file_active_kid = _parse_keys(key_file.read())
+        return cls(keys, active_kid or file_active_kid, path=path)
+
+    def encode(self, payload: dict) -> str:
+        self._reload_if_changed()
+        return jwt.encode(
+            payload, self.keys[self.active_kid], algorithm=self.algorithm, headers={"kid": self.active_kid}
+        )
+
+    def decode(self, token: str, options: dict = None) -> dict:
+        """
+        Verify the token with the key named in its header. Tokens without a kid (signed before the key ring)
+        are tried with every key. Raises JWTError (ExpiredSignatureError for expired tokens).
+        Claims of valid tokens are cached until the token expires.
+        """
+        cache_key = (hashlib.blake2b(token.encode(), digest_size=16).digest(), frozenset((options or {}).items()))
+        claims = self.verified.get(cache_key)
+        if claims is None:
+            claims = self._decode(token, options)
+            exp = claims.get("exp")
+            ttl = None if exp is None else exp - time.time()
+            if ttl is None or ttl > 0:
+                self.verified.set(cache_key, claims, ttl=ttl)
+        return dict(claims)
+
+    def _decode(self, token: str, options: dict = None) -> dict:
+        kid = jwt.get_unverified_header(token).get("kid")
+        if kid is None:
+            return self._decode_with_any_key(token, options)
+        secret = self.keys.get(kid)
+        if secret is None and self._reload_if_changed():
+            # the token may come from a process which has already loaded a newer key file
+            secret = self.keys.get(kid)
+        if secret is None:
+            raise JWTError("Unknown signing key.")
+        return jwt.decode(token, secret, algorithms=[self.algorithm], options=options)
+
+    def _decode_with_any_key(self, token: str, options: dict = None) -> dict:
+        error = None
+        for secret in self.keys.values():
+            try:
+                return jwt.decode(token, secret, algorithms=[self.algorithm], options=options)
+            except ExpiredSignatureError:
+                raise
+            except JWTError as exc:
+                error = exc
+        raise error
+
+    def _reload_if_changed(self) -> bool:
+        if self.path is None:
+            return False
+        with self._lock:
+            if time.monotonic() - self._reloaded_at < KEY_FILE_RELOAD_INTERVAL:
+                return False
+            self._reloaded_at = time.monotonic()
+            try:
+                mtime = os.path.getmtime(self.path)
+                if mtime == self._path_mtime:
+                    return False
+                with open(self.path) as key_file:
+                    keys, file_active_kid = _parse_keys(key_file.read())
+            except (OSError, ValueError):
+                logger.exception("Could not reload the JWT key file %s", self.path)
+                return False
+            active_kid = constants.JWT_ACTIVE_KID or file_active_kid
+            if active_kid not in keys:
+                logger.error("The active JWT key %r is not in the reloaded key file %s", active_kid, self.path)
+                return False
+            self.keys, self.active_kid, self._path_mtime = keys, active_kid, mtime
+            # tokens signed with a removed key must not stay valid
+            self.verified.clear()
+            return True
+
+
+def _parse_keys(raw: str) -> tuple[dict, Optional[str]]:
+    """
+    Keys as a JSON object: {"kid": "secret", ...}, or {"active": "kid", "keys": {"kid": "secret", ...}}.
+    Without an explicit active key the last one is active.
+    """
+    data = json.loads(raw)
+    if not isinstance(data, dict):
+        raise ValueError("JWT keys must be a JSON object.")
+    if "keys" in data:
+        keys, active_kid = data["keys"], data.get("active")
+    else:
+        keys, active_kid = data, None
+    if not isinstance(keys, dict) or not all(isinstance(secret, str) and secret for secret in keys.values()):
+        raise ValueError("JWT keys must map key ids to non-empty secrets.")
+    return keys, active_kid or (list(keys)[-1] if keys else None)
+
+
+def load_key_ring() -> KeyRing:
+    """
+    Key ring from JWT_KEYS_FILE or JWT_KEYS, else a single key from JWT_SECRET.
+    Outside production a random key is generated when nothing is configured,
+    tokens then only work in this process until it restarts.
+    """
+    if constants.JWT_KEYS_FILE:
+        return KeyRing.from_file(constants.JWT_KEYS_FILE, constants.JWT_ACTIVE_KID)
+    if constants.JWT_KEYS:
+        keys, active_kid = _parse_keys(constants.JWT_KEYS)
+        return KeyRing(keys, constants.JWT_ACTIVE_KID or active_kid)
+    if not constants.JWT_SECRET_CONFIGURED:
+        if constants.ENVIRONMENT == "prod":
+            raise RuntimeError("Configure JWT_KEYS, JWT_KEYS_FILE or JWT_SECRET, tokens must be shared by replicas.")
+        logger.warning("No JWT keys configured, using a random key for this process.")
+    return KeyRing({"default": constants.JWT_SECRET}, "default")
+
+
+key_ring = load_key_ring()
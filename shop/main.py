@@ -1,16 +1,47 @@
-from fastapi import Depends, FastAPI, Query
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
+from contextlib import asynccontextmanager
 
-from shop import constants, models, schemas
-from shop.database import engine
+import anyio.to_thread
+from fastapi import Depends, FastAPI, Query, Request
+from fastapi.responses import HTMLResponse, StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
+
+from shop import cache, constants, models, schemas, search, serializers
+from shop.database import async_engine, async_test_engine
+from shop.migrate import check_schema_version
+from shop.querystats import QueryStatsMiddleware
 from shop.routers import categories, items, orders, shops, signup, superuser, users
-from shop.utils import get_db
+from shop.utils import (
+    ITEM_SORT_KEYS,
+    filter_catalog_items,
+    get_async_read_db,
+    get_catalog_facets,
+    get_catalog_filters,
+    get_db,
+    get_item_fieldset,
+    get_session_factory,
+    iter_catalog_export,
+    paginate_items,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # the schema is created and changed by `python -m shop.migrate`, workers only check its revision
+    await anyio.to_thread.run_sync(check_schema_version, get_session_factory().kw["bind"])
+    # every sync endpoint holds one of these threads (and a pooled connection) for the whole request
+    anyio.to_thread.current_default_thread_limiter().total_tokens = constants.THREADPOOL_SIZE
+    yield
+    await async_engine.dispose()
+    await async_test_engine.dispose()
+
 
 if constants.ENVIRONMENT == "prod":
-    app = FastAPI(docs_url=None, redoc_url=None)
+    app = FastAPI(docs_url=None, redoc_url=None, lifespan=lifespan)
 else:
-    app = FastAPI()
+    app = FastAPI(lifespan=lifespan)
+
+app.add_middleware(QueryStatsMiddleware, headers=constants.QUERY_STATS_HEADERS)
 
 app.include_router(users.router)
 app.include_router(signup.router)
@@ -20,9 +51,6 @@ app.include_router(shops.router)
 app.include_router(orders.router)
 app.include_router(superuser.router)
 
-# Create all tables in the database (if they don't exist)
-models.Base.metadata.create_all(bind=engine)
-
 
 @app.get("/")
 async def root():
@@ -43,73 +71,95 @@ def get_all_users(db: Session = Depends(get_db)):
     """
     Endpoint to get all users
     """
-    users = db.query(models.User).all()
-    return users
+    users = serializers.project(db.query(models.User), schemas.UserOut).all()
+    return serializers.list_response(db, users, schemas.UserOut)
 
 
 @app.get("/items/", response_model=list[schemas.ItemOut])
-def get_all_items_with_filtering(
-    shop: str = Query(None, description="Filter items by shop slug"),
-    category: str = Query(None, description="Filter items by category name"),
-    db: Session = Depends(get_db),
+async def get_all_items_with_filtering(
+    request: Request,
+    filters: dict = Depends(get_catalog_filters),
+    sort: schemas.ItemSortEnum = Query(None, description="Sort items, by id when not given"),
+    after: str = Query(None, description="Cursor of the page, the X-Next-Cursor header of the previous page"),
+    limit: int = Query(constants.ITEMS_PAGE_SIZE, ge=1, le=constants.ITEMS_MAX_PAGE_SIZE),
+    fieldset: tuple = Depends(get_item_fieldset),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
-    Endpoint to get all items with filtering by shop's name and category's name
+    Endpoint to get all items with filtering by shop's name, category's name, price and rating.
+    Items are paginated with a cursor, the cursor of the next page is sent in the X-Next-Cursor header.
+    Returned fields can be picked with `fields`, reviews are added with `include=reviews`.
+    Supports conditional requests with If-None-Match.
     """
-    all_items = (
-        db.query(models.Item)
-        .filter(
-            models.Item.is_approved == True,
-            models.Item.is_available == True,
+    cache_key = cache.item_list_key(sort=sort, after=after, limit=limit, fieldset=fieldset, **filters)
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is None:
+        schema = serializers.partial_schema(schemas.ItemOut, fieldset)
+        items, records, next_cursor = await db.run_sync(
+            load_item_page, schema, filters, sort=sort, after=after, limit=limit
         )
-        .all()
-    )
-    if shop:
-        shop_exists = db.query(models.Shop).filter(models.Shop.slug == shop).first()
-        if shop_exists:
-            items_by_shop = (
-                db.query(models.Item)
-                .join(models.Item.shop)
-                .filter(
-                    models.Shop.slug == shop,
-                    models.Item.is_approved == True,
-                    models.Item.is_available == True,
-                )
-            )
-            if category:
-                category_exists = (
-                    db.query(models.Category)
-                    .join(models.Category.shop)
-                    .filter(
-                        models.Shop.slug == shop,
-                        models.Category.name == category,
-                    )
-                    .first()
-                )
-                if category_exists:
-                    items_by_shop_category = (
-                        items_by_shop.join(models.Item.category).filter(models.Category.name == category).all()
-                    )
-
-                    if items_by_shop_category:
-                        return items_by_shop_category
-
-            return items_by_shop.all()
-        else:
-            return all_items
-
-    if category:
-        items_by_category = (
-            db.query(models.Item)
-            .join(models.Item.category)
-            .filter(
-                models.Category.name == category,
-                models.Item.is_approved == True,
-                models.Item.is_available == True,
-            )
-            .all()
-        )
-        if items_by_category:
-            return items_by_category
+        # validating and encoding the page is CPU work, it's kept off the event loop
+        body = await anyio.to_thread.run_sync(serializers.encode_list, records, schema)
+        headers = {"X-Next-Cursor": next_cursor} if next_cursor is not None else {}
+        # no Last-Modified: the newest item on the page says nothing about items which left the list
+        cached = cache.make_cached_response(body, headers=headers)
+        cache.catalog_cache.set(cache_key, cached, tags=cache.item_list_tags(items, sort=sort, **filters))
+    return cache.conditional_response(request, cached)
+
+
+def load_item_page(
+    db: Session, schema: type, filters: dict, sort: schemas.ItemSortEnum, after: str, limit: int
+) -> tuple[list, list, str]:
+    query = filter_catalog_items(db.query(models.Item), **filters)
+    # the sort key and shop are needed for the cursor and cache tags
+    sort_columns, _ = ITEM_SORT_KEYS[sort]
+    query = serializers.project(query, schema, *sort_columns, models.Item.shop_id)
+    items, next_cursor = paginate_items(query, sort=sort, after=after, limit=limit)
+    return items, serializers.load_list(db, items, schema), next_cursor
+
+
+@app.get("/items/facets", response_model=schemas.ItemFacetsOut)
+async def get_item_facets(
+    request: Request,
+    filters: dict = Depends(get_catalog_filters),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Endpoint to get the number of items per shop, category, rating range and price range
+    for the same filters as the items list.
+    """
+    cache_key = cache.item_facets_key(**filters)
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is None:
+        facets = schemas.ItemFacetsOut.model_validate(await db.run_sync(get_catalog_facets, **filters))
+        cached = cache.make_cached_response(facets.model_dump_json().encode())
+        cache.catalog_cache.set(cache_key, cached, tags=[("facets",)])
+    return cache.conditional_response(request, cached)
+
+
+@app.get("/items/export.ndjson", response_class=StreamingResponse)
+def export_items():
+    """
+    Endpoint to export the whole approved catalog, one JSON object per line.
+    Rows are streamed from a server-side cursor, so memory use doesn't depend on the catalog size.
+    """
+    # the stream outlives the request's dependencies, so it opens its own session
+    return StreamingResponse(iter_catalog_export(get_session_factory()), media_type="application/x-ndjson")
+
+
+@app.get("/items/search", response_model=list[schemas.ItemOut])
+async def search_items(
+    q: str = Query(..., min_length=1, description="Words to search in item's name, title and description"),
+    limit: int = Query(constants.ITEMS_PAGE_SIZE, ge=1, le=constants.ITEMS_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """
+    Endpoint to search items, the best matches come first.
+    """
+    return await db.run_sync(render_search, q, limit=limit, offset=offset)
+
 
-    return all_items
+def render_search(db: Session, q: str, limit: int, offset: int) -> list[schemas.ItemOut]:
+    query = search.search_items(db, q).options(selectinload(models.Item.reviews))
+    return [schemas.ItemOut.model_validate(item) for item in query.offset(offset).limit(limit)]
@@ -0,0 +1,183 @@
+"""
+Schema migrations of the database, run once per release before the new version of the app starts:
+
+    python -m shop.migrate            # upgrade to the latest revision
+    python -m shop.migrate <revision> # upgrade to a revision
+    python -m shop.migrate check      # exit with 1 when the database is behind the latest revision
+
+Downgrades and new revisions go through the alembic command (see alembic.ini).
+
+The app itself only checks the revision of the database when it starts, it runs no DDL.
+"""
+
+import logging
+import os
+import sys
+from contextlib import contextmanager
+from pathlib import Path
+
+from alembic import command, op
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from alembic.util import CommandError
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.pool import NullPool
+
+from shop.database import SQLALCHEMY_DATABASE_URL, SQLALCHEMY_DATABASE_URL_TEST
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = Path(__file__).resolve().parent.parent / "alembic.ini"
+MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
+
+# Revision matching the schema which create_all built from the original models. Databases created by later
+# versions of the app before there were migrations may have more, the next revision creates what is missing.
+BASELINE_REVISION = "0001"
+
+# Key of the Postgres advisory lock held while migrating, concurrent runs wait for each other
+LOCK_KEY = 7_310_420_021
+
+# Created by the migrations only, not by the models: the full-text search index and the Postgres
+# pattern indexes of the slug prefix scans. Autogenerate leaves them alone.
+MIGRATION_ONLY_NAMES = {
+    "search_vector",
+    "ix_item_search_vector",
+    "ix_shop_slug_pattern",
+    "ix_category_slug_pattern",
+    "ix_item_slug_pattern",
+}
+MIGRATION_ONLY_PREFIXES = ("item_fts",)
+
+
+def database_url() -> str:
+    if os.getenv("ENVIRONMENT") == "test":
+        return SQLALCHEMY_DATABASE_URL_TEST
+    return SQLALCHEMY_DATABASE_URL
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI)) if ALEMBIC_INI.exists() else Config()
+    config.set_main_option("script_location", str(MIGRATIONS_DIR))
+    return config
+
+
+def head_revision() -> str:
+    return ScriptDirectory.from_config(alembic_config()).get_current_head()
+
+
+def include_name(name, type_, parent_names) -> bool:
+    return name not in MIGRATION_ONLY_NAMES and not (name or "").startswith(MIGRATION_ONLY_PREFIXES)
+
+
+@contextmanager
+def locked(connection: Connection):
+    """
+    Hold the advisory lock on Postgres for the whole run. It is a session lock, the revisions commit their own
+    transactions and the indexes built concurrently run outside of them.
+    """
+    if connection.dialect.name != "postgresql":
+        yield
+        return
+    connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": LOCK_KEY})
+    connection.commit()
+    try:
+        yield
+    finally:
+        connection.rollback()
+        connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": LOCK_KEY})
+        connection.commit()
+
+
+def create_index_concurrently(name: str, table: str, columns: list, **kw):
+    """
+    op.create_index for the tables in use, inside op.get_context().autocommit_block(): Postgres builds the index
+    without blocking the writes, which can't run in a transaction. A failed build leaves an invalid index behind,
+    it is dropped first so that the migration can run again.
+    """
+    bind = op.get_bind()
+    # nothing to look up when the SQL is only printed (--sql)
+    if bind.dialect.name == "postgresql" and not op.get_context().as_sql:
+        invalid = bind.execute(
+            text(
+                "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = pg_index.indexrelid "
+                "WHERE pg_class.relname = :name AND NOT pg_index.indisvalid"
+            ),
+            {"name": name},
+        ).first()
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True)
+    op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True, **kw)
+
+
+def drop_index_concurrently(name: str, table: str):
+    op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
+
+
+def current_revision(connection: Connection):
+    """
+    Revision of the database, None when it has never been migrated. Fails the transaction in that case
+    on Postgres, run it on a connection of its own or check the version table first.
+    """
+    try:
+        return connection.execute(text("SELECT version_num FROM alembic_version")).scalar()
+    except DBAPIError:
+        return None
+
+
+def upgrade(engine: Engine, revision: str = "head"):
+    """
+    Migrate the database up to `revision`. A database created by create_all before there were migrations
+    is stamped with the baseline revision first.
+    """
+    config = alembic_config()
+    with engine.connect() as connection, locked(connection):
+        config.attributes["connection"] = connection
+        inspector = inspect(connection)
+        unversioned = not inspector.has_table("alembic_version") and inspector.has_table("users")
+        # alembic runs every revision in a transaction of its own
+        connection.commit()
+        if unversioned:
+            logger.info("Existing schema without revision, stamping it with %s.", BASELINE_REVISION)
+            command.stamp(config, BASELINE_REVISION)
+        command.upgrade(config, revision)
+
+
+def check_schema_version(engine: Engine):
+    """
+    Fail when the database is behind the code, a single query and no DDL, for the start of every worker.
+    A database ahead of the code (the code was rolled back) is only logged, migrations keep old code working.
+    """
+    head = head_revision()
+    with engine.connect() as connection:
+        current = current_revision(connection)
+    if current == head:
+        return
+    if current is None:
+        raise RuntimeError("The database has no schema, run `python -m shop.migrate`.")
+    try:
+        ScriptDirectory.from_config(alembic_config()).get_revision(current)
+    except CommandError:
+        logger.warning("The database is at revision %s, newer than this code (%s).", current, head)
+        return
+    raise RuntimeError(f"The database is at revision {current}, run `python -m shop.migrate` to upgrade to {head}.")
+
+
+def main(arguments: list):
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s [%(name)s] %(message)s")
+    engine = create_engine(database_url(), poolclass=NullPool)
+    revision = arguments[0] if arguments else "head"
+    if revision == "check":
+        try:
+            check_schema_version(engine)
+        except RuntimeError as error:
+            logger.error(str(error))
+            sys.exit(1)
+        logger.info("The database is at revision %s.", head_revision())
+        return
+    upgrade(engine, revision)
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
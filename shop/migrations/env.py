@@ -0,0 +1,61 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+
+from shop import migrate, models
+
+config = context.config
+target_metadata = models.Base.metadata
+
+# shop.migrate passes its connection and keeps the logging of the process
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)
+
+
+def run_migrations_offline():
+    """
+    Print the SQL instead of running it (`alembic upgrade head --sql`).
+    """
+    context.configure(
+        url=migrate.database_url(),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+        render_as_batch=True,
+        include_name=migrate.include_name,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations(connection):
+    # batch mode lets SQLite (the test database) alter tables by copying them, a transaction per revision
+    # keeps the revisions which build indexes concurrently (outside of a transaction) short
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        render_as_batch=True,
+        include_name=migrate.include_name,
+        transaction_per_migration=True,
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        run_migrations(connection)
+        return
+    engine = create_engine(migrate.database_url(), poolclass=NullPool)
+    with engine.connect() as connection, migrate.locked(connection):
+        run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
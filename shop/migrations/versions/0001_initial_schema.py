@@ -0,0 +1,310 @@
+"""initial schema, as built by create_all before the revoked tokens, the catalog indexes and the search index
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 01:50:21.844970
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: Union[str, Sequence[str], None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        "newsletter",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("email", sa.String(length=100), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+    )
+    op.create_index("ix_newsletter_id", "newsletter", ["id"], unique=False)
+
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("first_name", sa.String(length=50), nullable=True),
+        sa.Column("last_name", sa.String(length=50), nullable=True),
+        sa.Column("username", sa.String(length=50), nullable=True),
+        sa.Column("email", sa.String(length=100), nullable=True),
+        sa.Column("password", sa.String(length=128), nullable=False),
+        sa.Column("role", sa.Enum("SHOP", "CUSTOMER", name="userroleenum"), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("modified_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("last_login", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("is_staff", sa.Boolean(), nullable=True),
+        sa.Column("is_active", sa.Boolean(), nullable=True),
+        sa.Column("is_superuser", sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("email"),
+        sa.UniqueConstraint("username"),
+    )
+    op.create_index("ix_users_id", "users", ["id"], unique=False)
+
+    op.create_table(
+        "order",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("first_name", sa.String(length=50), nullable=True),
+        sa.Column("last_name", sa.String(length=50), nullable=True),
+        sa.Column("phone_number", sa.String(length=14), nullable=True),
+        sa.Column("address", sa.String(length=250), nullable=True),
+        sa.Column("country", sa.String(length=16), nullable=True),
+        sa.Column("city", sa.String(length=16), nullable=True),
+        sa.Column("pin_code", sa.String(length=15), nullable=True),
+        sa.Column("billing_status", sa.Boolean(), nullable=True),
+        sa.Column("order_key", sa.String(length=200), nullable=True),
+        sa.Column("total_paid", sa.Float(precision=2), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_order_id", "order", ["id"], unique=False)
+
+    op.create_table(
+        "shop",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("shop_name", sa.String(length=50), nullable=True),
+        sa.Column("docs", sa.String(), nullable=True),
+        sa.Column("avatar", sa.String(length=255), nullable=True),
+        sa.Column("cover_photo", sa.String(length=255), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("slug", sa.String(), nullable=True),
+        sa.Column("is_approved", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("modified_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("slug"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index("ix_shop_id", "shop", ["id"], unique=False)
+    op.create_index("ix_shop_shop_name", "shop", ["shop_name"], unique=True)
+
+    op.create_table(
+        "user_profiles",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("profile_picture", sa.String(length=255), nullable=True),
+        sa.Column("phone_number", sa.String(length=14), nullable=True),
+        sa.Column("dob", sa.DateTime(), nullable=True),
+        sa.Column("address", sa.String(length=250), nullable=True),
+        sa.Column("country", sa.String(length=16), nullable=True),
+        sa.Column("city", sa.String(length=16), nullable=True),
+        sa.Column("pin_code", sa.String(length=15), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.Column("modified_at", sa.DateTime(), server_default=sa.func.now(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("user_id"),
+    )
+    op.create_index("ix_user_profiles_id", "user_profiles", ["id"], unique=False)
+
+    op.create_table(
+        "category",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("shop_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=100), nullable=True),
+        sa.Column("slug", sa.String(), nullable=True),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["shop_id"],
+            ["shop.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("slug"),
+    )
+    op.create_index("ix_category_id", "category", ["id"], unique=False)
+
+    op.create_table(
+        "shop_order",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("shop_id", sa.Integer(), nullable=True),
+        sa.Column("order_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("billing_status", sa.Boolean(), nullable=True),
+        sa.Column("total_paid", sa.Float(precision=2), nullable=True),
+        sa.Column("status", sa.Enum("NEW", "IN_PROCESS", "SENT", name="shoporderstatusenum"), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["order_id"],
+            ["order.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["shop_id"],
+            ["shop.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_shop_order_id", "shop_order", ["id"], unique=False)
+
+    op.create_table(
+        "item",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("shop_id", sa.Integer(), nullable=True),
+        sa.Column("category_id", sa.Integer(), nullable=True),
+        sa.Column("name", sa.String(length=55), nullable=True),
+        sa.Column("image", sa.String(), nullable=True),
+        sa.Column("title", sa.String(length=200), nullable=True),
+        sa.Column("description", sa.Text(), nullable=True),
+        sa.Column("price", sa.Float(precision=2), nullable=True),
+        sa.Column("average_rating", sa.Float(precision=2), nullable=True),
+        sa.Column("slug", sa.String(), nullable=True),
+        sa.Column("is_approved", sa.Boolean(), nullable=True),
+        sa.Column("is_available", sa.Boolean(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["category_id"],
+            ["category.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["shop_id"],
+            ["shop.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("slug"),
+    )
+    op.create_index("ix_item_id", "item", ["id"], unique=False)
+
+    op.create_table(
+        "cart",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("item_id", sa.Integer(), nullable=True),
+        sa.Column("quantity", sa.Integer(), nullable=True),
+        sa.Column("price", sa.Float(precision=2), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_cart_id", "cart", ["id"], unique=False)
+
+    op.create_table(
+        "item_review",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=True),
+        sa.Column("user_id", sa.Integer(), nullable=True),
+        sa.Column("stars", sa.Integer(), nullable=True),
+        sa.Column("comment", sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_item_review_id", "item_review", ["id"], unique=False)
+
+    op.create_table(
+        "order_item",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("order_id", sa.Integer(), nullable=True),
+        sa.Column("item_id", sa.Integer(), nullable=True),
+        sa.Column("price", sa.Float(precision=2), nullable=True),
+        sa.Column("quantity", sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["order_id"],
+            ["order.id"],
+        ),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_order_item_id", "order_item", ["id"], unique=False)
+
+    op.create_table(
+        "wish_list",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("item_id", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["item_id"],
+            ["item.id"],
+        ),
+        sa.ForeignKeyConstraint(
+            ["user_id"],
+            ["users.id"],
+        ),
+        sa.PrimaryKeyConstraint("user_id", "item_id"),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table("wish_list")
+    op.drop_index("ix_order_item_id", table_name="order_item")
+
+    op.drop_table("order_item")
+    op.drop_index("ix_item_review_id", table_name="item_review")
+
+    op.drop_table("item_review")
+    op.drop_index("ix_cart_id", table_name="cart")
+
+    op.drop_table("cart")
+    op.drop_index("ix_item_id", table_name="item")
+
+    op.drop_table("item")
+    op.drop_index("ix_shop_order_id", table_name="shop_order")
+
+    op.drop_table("shop_order")
+    op.drop_index("ix_category_id", table_name="category")
+
+    op.drop_table("category")
+    op.drop_index("ix_user_profiles_id", table_name="user_profiles")
+
+    op.drop_table("user_profiles")
+    op.drop_index("ix_shop_shop_name", table_name="shop")
+    op.drop_index("ix_shop_id", table_name="shop")
+
+    op.drop_table("shop")
+    op.drop_index("ix_order_id", table_name="order")
+
+    op.drop_table("order")
+    op.drop_index("ix_users_id", table_name="users")
+
+    op.drop_table("users")
+    op.drop_index("ix_newsletter_id", table_name="newsletter")
+
+    op.drop_table("newsletter")
+    if op.get_bind().dialect.name == "postgresql":
+        sa.Enum(name="shoporderstatusenum").drop(op.get_bind())
+        sa.Enum(name="userroleenum").drop(op.get_bind())
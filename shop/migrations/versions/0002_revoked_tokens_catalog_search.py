@@ -0,0 +1,126 @@
+"""revoked tokens, catalog sort indexes and the full-text search index of items
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 14:05:37.517203
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from shop.migrate import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: Union[str, Sequence[str], None] = "0001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Databases stamped with 0001 may already have some of these: create_all added the revoked_token table and
+# the app installed the search index when it started, before there were migrations. Everything is created
+# only when it is missing.
+
+# (name, columns) of the catalog sort orders, id is the keyset pagination tie-breaker
+CATALOG_INDEXES = [
+    ("ix_item_catalog_created_at", ["is_approved", "is_available", "created_at", "id"]),
+    ("ix_item_catalog_price", ["is_approved", "is_available", "price", "id"]),
+    ("ix_item_catalog_rating", ["is_approved", "is_available", "average_rating", "id"]),
+]
+
+# Postgres: generated tsvector column with a GIN index (ix_item_search_vector)
+POSTGRES_SEARCH_COLUMN_DDL = """
+    ALTER TABLE item ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(title, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+"""
+
+# SQLite: external-content FTS5 table, kept in sync with the item table by triggers
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+        name, title, description, content='item', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_insert AFTER INSERT ON item BEGIN
+        INSERT INTO item_fts(rowid, name, title, description)
+        VALUES (new.id, new.name, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_delete AFTER DELETE ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, title, description)
+        VALUES ('delete', old.id, old.name, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_update AFTER UPDATE OF name, title, description ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, title, description)
+        VALUES ('delete', old.id, old.name, old.title, old.description);
+        INSERT INTO item_fts(rowid, name, title, description)
+        VALUES (new.id, new.name, new.title, new.description);
+    END
+    """,
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    op.create_table(
+        "revoked_token",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("jti", sa.String(length=64), nullable=False),
+        sa.Column("revoked_at", sa.DateTime(), nullable=False),
+        sa.Column("expires_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("jti"),
+        if_not_exists=True,
+    )
+    op.create_index("ix_revoked_token_expires_at", "revoked_token", ["expires_at"], unique=False, if_not_exists=True)
+    op.create_index("ix_revoked_token_id", "revoked_token", ["id"], unique=False, if_not_exists=True)
+    op.create_index("ix_revoked_token_revoked_at", "revoked_token", ["revoked_at"], unique=False, if_not_exists=True)
+
+    if bind.dialect.name == "postgresql":
+        op.execute(POSTGRES_SEARCH_COLUMN_DDL)
+
+    # the writes to the items go on while the indexes are built
+    with op.get_context().autocommit_block():
+        for name, columns in CATALOG_INDEXES:
+            create_index_concurrently(name, "item", columns, unique=False)
+        if bind.dialect.name == "postgresql":
+            create_index_concurrently("ix_item_search_vector", "item", ["search_vector"], postgresql_using="gin")
+
+    if bind.dialect.name == "sqlite":
+        for statement in SQLITE_SEARCH_DDL:
+            op.execute(statement)
+        # index the items which were there before the FTS table, a no-op for an index already in sync
+        op.execute("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    if dialect == "sqlite":
+        for trigger in ["item_fts_after_update", "item_fts_after_delete", "item_fts_after_insert"]:
+            op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        op.execute("DROP TABLE IF EXISTS item_fts")
+
+    with op.get_context().autocommit_block():
+        if dialect == "postgresql":
+            drop_index_concurrently("ix_item_search_vector", "item")
+        for name, _ in reversed(CATALOG_INDEXES):
+            drop_index_concurrently(name, "item")
+
+    if dialect == "postgresql":
+        op.execute("ALTER TABLE item DROP COLUMN IF EXISTS search_vector")
+
+    op.drop_index("ix_revoked_token_revoked_at", table_name="revoked_token")
+    op.drop_index("ix_revoked_token_id", table_name="revoked_token")
+    op.drop_index("ix_revoked_token_expires_at", table_name="revoked_token")
+    op.drop_table("revoked_token")
@@ -0,0 +1,61 @@
+"""indexes for the foreign keys and lookups of the helpers in shop.utils, partial ones for listed items and paid orders
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 09:12:40.318524
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+from shop.migrate import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: Union[str, Sequence[str], None] = "0002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns)
+INDEXES = [
+    ("ix_wish_list_item_id", "wish_list", ["item_id"]),
+    ("ix_category_shop_id_name", "category", ["shop_id", "name"]),
+    ("ix_item_shop_id_name", "item", ["shop_id", "name"]),
+    ("ix_item_category_id", "item", ["category_id"]),
+    ("ix_cart_user_id_item_id", "cart", ["user_id", "item_id"]),
+    ("ix_order_user_id", "order", ["user_id"]),
+    ("ix_order_order_key", "order", ["order_key"]),
+    ("ix_order_item_order_id", "order_item", ["order_id"]),
+    ("ix_order_item_item_id", "order_item", ["item_id"]),
+    ("ix_shop_order_shop_id", "shop_order", ["shop_id"]),
+    ("ix_shop_order_order_id", "shop_order", ["order_id"]),
+    ("ix_item_review_item_id", "item_review", ["item_id"]),
+]
+
+# (name, table, columns, condition), the conditions are the ones rendered by the models
+PARTIAL_INDEXES = [
+    ("ix_item_listed_shop_id", "item", ["shop_id", "id"], "is_approved = {true} AND is_available = {true}"),
+    ("ix_shop_order_billed_shop_id", "shop_order", ["shop_id", "created_at"], "billing_status = {true}"),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    true = "true" if op.get_bind().dialect.name == "postgresql" else "1"
+    # the order tables are the largest ones, their writes go on while the indexes are built
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            create_index_concurrently(name, table, columns, unique=False)
+        for name, table, columns, condition in PARTIAL_INDEXES:
+            where = sa.text(condition.format(true=true))
+            create_index_concurrently(name, table, columns, unique=False, postgresql_where=where, sqlite_where=where)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, *_ in reversed(INDEXES + PARTIAL_INDEXES):
+            drop_index_concurrently(name, table)
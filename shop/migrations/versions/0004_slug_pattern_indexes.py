@@ -0,0 +1,43 @@
+"""Postgres pattern indexes for the slug prefix scans of the slug allocation
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 11:40:05.902113
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from shop.migrate import create_index_concurrently, drop_index_concurrently
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: Union[str, Sequence[str], None] = "0003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# The unique indexes of the slugs use the collation of the database, which LIKE 'prefix%' can't use unless it
+# is "C". SQLite (the test database) scans the prefix without them.
+TABLES = ["shop", "category", "item"]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for table in TABLES:
+            create_index_concurrently(
+                f"ix_{table}_slug_pattern", table, ["slug"], postgresql_ops={"slug": "varchar_pattern_ops"}
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != "postgresql":
+        return
+    with op.get_context().autocommit_block():
+        for table in reversed(TABLES):
+            drop_index_concurrently(f"ix_{table}_slug_pattern", table)
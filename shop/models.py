@@ -1,9 +1,9 @@
-from passlib.context import CryptContext
-from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, Integer, String, Table, Text
+from sqlalchemy import Boolean, Column, DateTime, Enum, Float, ForeignKey, Index, Integer, String, Table, Text, and_
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from shop.database import Base
+from shop.passwords import hash_password
 from shop.schemas import ShopOrderStatusEnum, UserRoleEnum
 
 association_table = Table(
@@ -11,6 +11,8 @@ association_table = Table(
     Base.metadata,
     Column("user_id", ForeignKey("users.id"), primary_key=True),
     Column("item_id", ForeignKey("item.id"), primary_key=True),
+    # the primary key starts with user_id, wish lists per item are counted in the shop stats
+    Index("ix_wish_list_item_id", "item_id"),
 )
 
 
@@ -54,8 +56,11 @@ class User(Base):
 
     # Method to set the hashed password
     def set_password(self, password):
-        pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-        self._password = pwd_context.hash(password)
+        self._password = hash_password(password)
+
+    # Method to set a password hashed beforehand, e.g. with passwords.hash_password_async
+    def set_password_hash(self, password_hash):
+        self._password = password_hash
 
 
 class UserProfile(Base):
@@ -119,6 +124,7 @@ class Shop(Base):
 
 class Category(Base):
     __tablename__ = "category"
+    __table_args__ = (Index("ix_category_shop_id_name", "shop_id", "name"),)
 
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shop.id"))
@@ -134,6 +140,15 @@ class Category(Base):
 
 class Item(Base):
     __tablename__ = "item"
+    __table_args__ = (
+        # catalog sort orders, id is the keyset pagination tie-breaker
+        Index("ix_item_catalog_price", "is_approved", "is_available", "price", "id"),
+        Index("ix_item_catalog_rating", "is_approved", "is_available", "average_rating", "id"),
+        Index("ix_item_catalog_created_at", "is_approved", "is_available", "created_at", "id"),
+        # items of a shop, unique names per shop, slug lookups go through the unique slug index
+        Index("ix_item_shop_id_name", "shop_id", "name"),
+        Index("ix_item_category_id", "category_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shop.id"))
@@ -174,6 +189,7 @@ class Item(Base):
 
 class CartItem(Base):
     __tablename__ = "cart"
+    __table_args__ = (Index("ix_cart_user_id_item_id", "user_id", "item_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -192,6 +208,11 @@ class CartItem(Base):
 
 class Order(Base):
     __tablename__ = "order"
+    __table_args__ = (
+        Index("ix_order_user_id", "user_id"),
+        # the Stripe webhook looks orders up by payment intent
+        Index("ix_order_order_key", "order_key"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -218,6 +239,10 @@ class Order(Base):
 
 class OrderItem(Base):
     __tablename__ = "order_item"
+    __table_args__ = (
+        Index("ix_order_item_order_id", "order_id"),
+        Index("ix_order_item_item_id", "item_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     order_id = Column(Integer, ForeignKey("order.id"))
@@ -233,6 +258,10 @@ class OrderItem(Base):
 
 class ShopOrder(Base):
     __tablename__ = "shop_order"
+    __table_args__ = (
+        Index("ix_shop_order_shop_id", "shop_id"),
+        Index("ix_shop_order_order_id", "order_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     shop_id = Column(Integer, ForeignKey("shop.id"))
@@ -251,6 +280,25 @@ class ShopOrder(Base):
     user = relationship("User", back_populates="shop_orders")
 
 
+# Partial indexes, the conditions have to match the filters of the queries (`== True`) to be used.
+# Items listed in the catalog of a shop.
+Index(
+    "ix_item_listed_shop_id",
+    Item.shop_id,
+    Item.id,
+    postgresql_where=and_(Item.is_approved == True, Item.is_available == True),
+    sqlite_where=and_(Item.is_approved == True, Item.is_available == True),
+)
+# Paid orders of a shop, by date for the revenue stats.
+Index(
+    "ix_shop_order_billed_shop_id",
+    ShopOrder.shop_id,
+    ShopOrder.created_at,
+    postgresql_where=ShopOrder.billing_status == True,
+    sqlite_where=ShopOrder.billing_status == True,
+)
+
+
 class NewsLetter(Base):
     __tablename__ = "newsletter"
 
@@ -265,6 +313,7 @@ class NewsLetter(Base):
 
 class ItemReview(Base):
     __tablename__ = "item_review"
+    __table_args__ = (Index("ix_item_review_item_id", "item_id"),)
 
     id = Column(Integer, primary_key=True, index=True)
     item_id = Column(Integer, ForeignKey("item.id"))
@@ -275,3 +324,19 @@ class ItemReview(Base):
 
     item = relationship("Item", back_populates="reviews")
     user = relationship("User", back_populates="item_reviews")
+
+
+class RevokedToken(Base):
+    """
+    SQLAlchemy model for RevokedToken.
+    Represents the 'revoked_token' table in the database.
+    Ids (jti) of logged out and rotated tokens, shared by all processes until the tokens expire.
+    """
+
+    __tablename__ = "revoked_token"
+
+    id = Column(Integer, primary_key=True, index=True)
+    jti = Column(String(64), unique=True, nullable=False)
+    # naive UTC, like the exp claim
+    revoked_at = Column(DateTime, nullable=False, index=True)
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from fastapi import HTTPException
+from passlib.context import CryptContext
+
+from shop import constants
+
+# One context for the whole process, building a CryptContext is not free
+PWD_CONTEXT = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a dedicated, bounded thread pool (bcrypt releases the GIL while hashing),
+    so slow hashes neither block the event loop nor take the threads serving other requests.
+    Jobs above `max_pending` (queued and running) are refused with 503.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hashing")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.max_pending_seen = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_run = 0.0
+        self.max_run = 0.0
+
+    def submit(self, function, *args) -> Future:
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=503, detail="Too many requests, try again later.", headers={"Retry-After": "1"}
+            )
+        with self._lock:
+            self.pending += 1
+            self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        return self._executor.submit(self._run, time.perf_counter(), function, *args)
+
+    def _run(self, submitted_at: float, function, *args):
+        started_at = time.perf_counter()
+        try:
+            return function(*args)
+        finally:
+            finished_at = time.perf_counter()
+            self._slots.release()
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+                self.total_wait += started_at - submitted_at
+                self.max_wait = max(self.max_wait, started_at - submitted_at)
+                self.total_run += finished_at - started_at
+                self.max_run = max(self.max_run, finished_at - started_at)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self.pending,
+                "max_pending_seen": self.max_pending_seen,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self.total_wait / self.completed * 1000, 3) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+                "avg_run_ms": round(self.total_run / self.completed * 1000, 3) if self.completed else 0.0,
+                "max_run_ms": round(self.max_run * 1000, 3),
+            }
+
+
+password_hasher = PasswordHasher(
+    workers=constants.PASSWORD_HASHING_WORKERS, max_pending=constants.PASSWORD_HASHING_MAX_PENDING
+)
+
+
+def hash_password(password: str) -> str:
+    return password_hasher.submit(PWD_CONTEXT.hash, password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return password_hasher.submit(PWD_CONTEXT.verify, plain_password, hashed_password).result()
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(password_hasher.submit(PWD_CONTEXT.hash, password))
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await asyncio.wrap_future(password_hasher.submit(PWD_CONTEXT.verify, plain_password, hashed_password))
@@ -0,0 +1,150 @@
+import bisect
+import logging
+import threading
+import time
+
+from sqlalchemy import event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (milliseconds) of the checkout wait time histogram buckets, the last bucket is unbounded
+WAIT_BUCKETS_MS = (1, 5, 10, 50, 100, 500, 1000, 5000)
+
+
+class PoolMonitor:
+    """
+    Counters of a connection pool: checkouts, wait time to get a connection, timeouts and exhaustion.
+    The pool is exhausted when every connection, overflow included, is checked out: the next request waits.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.pool = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.exhaustions = 0
+        self.exhausted = False
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.wait_histogram = [0] * (len(WAIT_BUCKETS_MS) + 1)
+
+    def waited(self, seconds: float):
+        with self._lock:
+            self.checkouts += 1
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            self.wait_histogram[bisect.bisect_left(WAIT_BUCKETS_MS, seconds * 1000)] += 1
+
+    def timed_out(self, seconds: float):
+        with self._lock:
+            self.timeouts += 1
+        logger.error(
+            "Database pool %s exhausted: no connection after %.1f s, %s", self.name, seconds, self.pool.status()
+        )
+
+    def update_exhausted(self, returning: int = 0):
+        """
+        Log the changes between exhausted and not, `returning` connections are being checked in.
+        """
+        pool = self.pool
+        full = pool.checkedout() - returning >= pool.size() + max(pool._max_overflow, 0)
+        if full and not self.exhausted:
+            with self._lock:
+                self.exhaustions += 1
+            logger.warning("Database pool %s exhausted, requests wait for a connection: %s", self.name, pool.status())
+        elif not full and self.exhausted:
+            logger.info("Database pool %s has free connections again: %s", self.name, pool.status())
+        self.exhausted = full
+
+    def stats(self) -> dict:
+        pool = self.pool
+        with self._lock:
+            stats = {
+                "size": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "exhaustions": self.exhaustions,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "avg_wait_ms": round(self.total_wait / self.checkouts * 1000, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+            bounds = [f"le_{bound}ms" for bound in WAIT_BUCKETS_MS] + [f"gt_{WAIT_BUCKETS_MS[-1]}ms"]
+            stats["wait_histogram"] = dict(zip(bounds, self.wait_histogram))
+        return stats
+
+
+class MonitoredPoolMixin:
+    """
+    Times how long getting a connection waits, SQLAlchemy has events for a checkout but not for the wait before.
+    """
+
+    monitor: PoolMonitor = None
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            if self.monitor is not None:
+                self.monitor.timed_out(time.perf_counter() - started)
+            raise
+        if self.monitor is not None:
+            self.monitor.waited(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # engine.dispose() replaces the pool, the counters carry on
+        pool = super().recreate()
+        pool.monitor = self.monitor
+        if self.monitor is not None:
+            self.monitor.pool = pool
+        return pool
+
+
+class MonitoredQueuePool(MonitoredPoolMixin, QueuePool):
+    pass
+
+
+class MonitoredAsyncQueuePool(MonitoredPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def monitor_pool(engine, name: str) -> PoolMonitor:
+    """
+    Attach a PoolMonitor to an engine created with a Monitored*QueuePool poolclass.
+    """
+    monitor = PoolMonitor(name)
+    monitor.pool = engine.pool
+    engine.pool.monitor = monitor
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        with monitor._lock:
+            monitor.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        monitor.update_exhausted()
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        if monitor.exhausted:
+            # the pool counts the connection as checked out until the checkin listeners have run
+            monitor.update_exhausted(returning=1)
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        with monitor._lock:
+            monitor.invalidations += 1
+
+    return monitor
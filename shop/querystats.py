@@ -0,0 +1,118 @@
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from shop import constants
+
+logger = logging.getLogger(__name__)
+
+# Placeholder lists, e.g. the IN lists of selectinload, have a length depending on the rows, not on the code
+_PLACEHOLDER = r"\s*(?:\?|%s|%\(\w+\)s|\$\d+|:\w+)\s*"
+_PLACEHOLDER_LIST = re.compile(rf"\((?:{_PLACEHOLDER},)+{_PLACEHOLDER}\)")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    The statement with its placeholder lists collapsed, the same code sends statements of the same shape.
+    """
+    return _PLACEHOLDER_LIST.sub("(...)", statement)
+
+
+class QueryStats:
+    """
+    Statements sent to the database during a request (or any block run with `collect()`).
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def add(self, statement: str, duration: float):
+        self.count += 1
+        self.duration += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold: int = constants.N_PLUS_ONE_THRESHOLD) -> list[tuple[str, int]]:
+        """
+        Shapes sent at least `threshold` times, usually a query in a loop (N+1), most repeated first.
+        """
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def collect():
+    """
+    Count the statements sent by the current context (threadpool calls of a request share it) inside the block.
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current_stats.get() is not None:
+        conn.info.setdefault("query_started_at", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    started_at = conn.info.get("query_started_at")
+    if stats is not None and started_at:
+        stats.add(statement, time.perf_counter() - started_at.pop())
+
+
+class QueryStatsMiddleware:
+    """
+    Counts the statements and the database time of every request and logs the repeated statements.
+    With `headers`, they are sent in X-Query-Count, X-Query-Time-Ms and X-Query-Repeated (the most repeated
+    shape's count, only when over the threshold).
+    """
+
+    def __init__(self, app, headers: bool = False, threshold: int = constants.N_PLUS_ONE_THRESHOLD):
+        self.app = app
+        self.headers = headers
+        self.threshold = threshold
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                repeated = stats.repeated(self.threshold)
+                if repeated:
+                    logger.warning(
+                        "%s %s sent %d statements, repeated (N+1?): %s",
+                        scope["method"],
+                        scope["path"],
+                        stats.count,
+                        "; ".join(f"{count}x {shape}" for shape, count in repeated),
+                    )
+                if self.headers:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-query-count", str(stats.count).encode()))
+                    headers.append((b"x-query-time-ms", f"{stats.duration * 1000:.3f}".encode()))
+                    if repeated:
+                        headers.append((b"x-query-repeated", str(repeated[0][1]).encode()))
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        with collect() as stats:
+            await self.app(scope, receive, send_with_stats)
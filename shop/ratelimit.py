@@ -0,0 +1,250 @@
+import logging
+import math
+import threading
+import time
+from collections import Counter
+from typing import NamedTuple, Optional, Protocol
+
+from fastapi import HTTPException, Request
+
+from shop import constants
+
+logger = logging.getLogger(__name__)
+
+
+class SharedClient(Protocol):
+    """
+    Key-value store shared by all processes, e.g. a thin wrapper around redis (INCR/EXPIRE, WATCH/MULTI).
+    Values are floats, keys expire `ttl` seconds after the last write.
+    """
+
+    def get(self, key: str) -> Optional[float]: ...
+
+    def compare_and_set(self, key: str, expected: Optional[float], value: float, ttl: float) -> bool: ...
+
+    def incr(self, key: str, ttl: float) -> float: ...
+
+
+class MemoryBackend:
+    """
+    Process-local implementation of SharedClient, limits then apply to every process separately.
+    """
+
+    def __init__(self, maxsize: int = 100_000):
+        self.maxsize = maxsize
+        self._values = {}  # key -> (value, expires_at)
+        self._lock = threading.Lock()
+
+    def _get(self, key: str, now: float) -> Optional[float]:
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= now:
+            del self._values[key]
+            return None
+        return entry[0]
+
+    def _set(self, key: str, value: float, ttl: float, now: float):
+        if key not in self._values and len(self._values) >= self.maxsize:
+            self._values = {key: entry for key, entry in self._values.items() if entry[1] > now}
+            if len(self._values) >= self.maxsize:
+                # still full of live entries, drop the oldest ones (dicts keep insertion order)
+                for old_key in list(self._values)[: self.maxsize // 10 or 1]:
+                    del self._values[old_key]
+        self._values[key] = (value, now + ttl)
+
+    def get(self, key: str) -> Optional[float]:
+        with self._lock:
+            return self._get(key, time.monotonic())
+
+    def compare_and_set(self, key: str, expected: Optional[float], value: float, ttl: float) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if self._get(key, now) != expected:
+                return False
+            self._set(key, value, ttl, now)
+            return True
+
+    def incr(self, key: str, ttl: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            value = (self._get(key, now) or 0) + 1
+            self._set(key, value, ttl, now)
+            return value
+
+
+class SharedBackend:
+    """
+    SharedClient with a key prefix, which lets requests through while the store is unavailable.
+    """
+
+    def __init__(self, client: SharedClient, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+        self.errors = 0
+
+    def get(self, key: str) -> Optional[float]:
+        try:
+            return self.client.get(self.prefix + key)
+        except Exception:
+            self._failed()
+            return None
+
+    def compare_and_set(self, key: str, expected: Optional[float], value: float, ttl: float) -> bool:
+        try:
+            return self.client.compare_and_set(self.prefix + key, expected, value, ttl)
+        except Exception:
+            self._failed()
+            return True
+
+    def incr(self, key: str, ttl: float) -> float:
+        try:
+            return self.client.incr(self.prefix + key, ttl)
+        except Exception:
+            self._failed()
+            return 0
+
+    def _failed(self):
+        self.errors += 1
+        logger.exception("Rate limit store is unavailable, the request is not limited.")
+
+
+class TokenBucket(NamedTuple):
+    """
+    `capacity` requests at once, refilled with `rate` requests per second.
+    """
+
+    capacity: float
+    rate: float
+
+
+class SlidingWindow(NamedTuple):
+    """
+    At most `limit` requests in any `window` seconds (approximated from the current and the previous window).
+    """
+
+    limit: int
+    window: float
+
+
+# Clock shared by the processes, the shared store keeps absolute times
+clock = time.time
+
+
+def take_token(backend, key: str, bucket: TokenBucket) -> float:
+    """
+    Take a token from the bucket, returns 0 when allowed, else the seconds until a token is available.
+    Stores a single value per key, the time at which the bucket is full again (GCRA).
+    """
+    interval = 1 / bucket.rate
+    burst = bucket.capacity * interval
+    for _ in range(5):
+        now = clock()
+        full_at = backend.get(key)
+        new_full_at = max(full_at or now, now) + interval
+        if new_full_at - now > burst:
+            return new_full_at - now - burst
+        if backend.compare_and_set(key, full_at, new_full_at, ttl=burst):
+            return 0.0
+    # too much contention on the key, refuse rather than loop
+    return interval
+
+
+def hit_window(backend, key: str, window: SlidingWindow) -> float:
+    """
+    Count a request, returns 0 when allowed, else the seconds until the oldest counted requests slide out.
+    """
+    now = clock()
+    current = math.floor(now / window.window)
+    elapsed = now / window.window - current
+    count = backend.incr(f"{key}:{current}", ttl=window.window * 2)
+    previous = backend.get(f"{key}:{current - 1}") or 0
+    if previous * (1 - elapsed) + count <= window.limit:
+        return 0.0
+    return (1 - elapsed) * window.window
+
+
+class RateLimiter:
+    def __init__(self, backend):
+        self.backend = backend
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.throttled = Counter()
+
+    def check(self, rules: list) -> float:
+        """
+        Apply (name, key, limit) rules in order, returns the longest wait of the refused ones (0 when allowed).
+        """
+        retry_after = 0.0
+        refused = []
+        for name, key, limit in rules:
+            backend_key = f"{name}:{key}"
+            if isinstance(limit, TokenBucket):
+                wait = take_token(self.backend, backend_key, limit)
+            else:
+                wait = hit_window(self.backend, backend_key, limit)
+            if wait > 0:
+                refused.append(name)
+                retry_after = max(retry_after, wait)
+        with self._lock:
+            if refused:
+                self.throttled.update(refused)
+            else:
+                self.allowed += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        with self._lock:
+            stats = {"allowed": self.allowed, "throttled": dict(self.throttled)}
+        stats["backend_errors"] = getattr(self.backend, "errors", 0)
+        return stats
+
+
+rate_limiter = RateLimiter(MemoryBackend())
+
+
+def client_ip(request: Request) -> str:
+    if constants.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            # the proxy appends the address it saw, the entries before it are up to the client
+            return forwarded_for.split(",")[-1].strip()
+    return request.client.host if request.client else "unknown"
+
+
+def _throttle(rules: list):
+    if not constants.RATE_LIMIT_ENABLED:
+        return
+    retry_after = rate_limiter.check(rules)
+    if retry_after > 0:
+        raise HTTPException(
+            status_code=429,
+            detail="Too many attempts, try again later.",
+            headers={"Retry-After": str(math.ceil(retry_after))},
+        )
+
+
+def throttle_login(request: Request, account: str):
+    """
+    Refuse a login attempt over the per-IP or per-account limits with 429, before the password is verified.
+    """
+    _throttle(
+        [
+            ("login-ip", client_ip(request), TokenBucket(*constants.LOGIN_IP_BUCKET)),
+            ("login-ip-window", client_ip(request), SlidingWindow(*constants.LOGIN_IP_WINDOW)),
+            ("login-account", account.lower(), SlidingWindow(*constants.LOGIN_ACCOUNT_WINDOW)),
+        ]
+    )
+
+
+def throttle_signup(request: Request, account: str):
+    """
+    Refuse a signup over the per-IP or per-account limits with 429, before the password is hashed.
+    """
+    _throttle(
+        [
+            ("signup-ip", client_ip(request), TokenBucket(*constants.SIGNUP_IP_BUCKET)),
+            ("signup-ip-window", client_ip(request), SlidingWindow(*constants.SIGNUP_IP_WINDOW)),
+            ("signup-account", account.lower(), SlidingWindow(*constants.SIGNUP_ACCOUNT_WINDOW)),
+        ]
+    )
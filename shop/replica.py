@@ -0,0 +1,158 @@
+import logging
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+import anyio.to_thread
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.orm import Session
+
+from shop import constants
+from shop.cache import TTLCache
+from shop.database import async_replica_engine, async_url, replica_engine
+
+logger = logging.getLogger(__name__)
+
+# Seconds the replica is behind the primary, 0 when it has replayed everything it received
+LAG_QUERIES = {
+    "postgresql": text(
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+        " ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+    ),
+}
+
+
+class ReplicaRouter:
+    """
+    Decides per request whether the reads go to the replica: not while the replica lags more than `max_lag`
+    seconds or is unavailable, and not for a user who has written in the last `max_lag` seconds.
+    """
+
+    def __init__(
+        self,
+        engine: Optional[Engine],
+        max_lag: float,
+        check_interval: float,
+        async_engine: Optional[AsyncEngine] = None,
+    ):
+        self.engine = engine
+        # the same replica for the asyncio sessions
+        if async_engine is None and engine is not None:
+            async_engine = create_async_engine(async_url(engine.url))
+        self.async_engine = async_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        # users who have written recently, they must read their own writes
+        self.writers = TTLCache(maxsize=100_000, ttl=max_lag)
+        self._lock = threading.Lock()
+        self._lag = 0.0
+        self._checked_at = None
+        self._stats_lock = threading.Lock()
+        self.reads = Counter()
+
+    def measure_lag(self) -> float:
+        query = LAG_QUERIES.get(self.engine.dialect.name)
+        if query is None:
+            # no replication to measure (e.g. a SQLite file standing in for the replica)
+            return 0.0
+        with self.engine.connect() as connection:
+            return float(connection.execute(query).scalar() or 0.0)
+
+    def _lag_is_due(self) -> bool:
+        return self._checked_at is None or time.monotonic() - self._checked_at >= self.check_interval
+
+    def lag(self) -> float:
+        """
+        Last measured lag, measured again every `check_interval` seconds, infinite when the replica is down.
+        """
+        # one request measures, the others go on with the last value meanwhile
+        if self._lag_is_due() and self._lock.acquire(blocking=False):
+            try:
+                self._lag = self.measure_lag()
+            except Exception:
+                logger.exception("Could not measure the replica lag, reading from the primary.")
+                self._lag = float("inf")
+            finally:
+                self._checked_at = time.monotonic()
+                self._lock.release()
+        return self._lag
+
+    def choose(self, sub: Optional[str]) -> Optional[Engine]:
+        """
+        Replica engine for the reads of a request by `sub` (None when anonymous), None for the primary.
+        """
+        if self.engine is None:
+            return None
+        if sub is not None and self.writers.get(sub) is not None:
+            reason = "primary_recent_write"
+        elif self.lag() > self.max_lag:
+            reason = "primary_lag"
+        else:
+            reason = "replica"
+        with self._stats_lock:
+            self.reads[reason] += 1
+        return self.engine if reason == "replica" else None
+
+    async def choose_async(self, sub: Optional[str]) -> Optional[AsyncEngine]:
+        """
+        choose() for the asyncio sessions. The lag is measured on a worker thread, a replica which doesn't
+        answer must not hold up the event loop.
+        """
+        if self.engine is None:
+            return None
+        if self._lag_is_due():
+            chosen = await anyio.to_thread.run_sync(self.choose, sub)
+        else:
+            chosen = self.choose(sub)
+        return self.async_engine if chosen is not None else None
+
+    def wrote(self, sub: str):
+        self.writers.set(sub, True)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            reads = dict(self.reads)
+        return {
+            "enabled": self.engine is not None,
+            "lag": self._lag if self._checked_at is not None else None,
+            "max_lag": self.max_lag,
+            "reads": reads,
+        }
+
+
+replica_router = ReplicaRouter(
+    replica_engine,
+    max_lag=constants.REPLICA_MAX_LAG,
+    check_interval=constants.REPLICA_LAG_CHECK_INTERVAL,
+    async_engine=async_replica_engine,
+)
+
+
+def remember_write(session: Session):
+    """
+    Read from the primary after the commit, called by the flush and by bulk statements which don't flush.
+    """
+    session.info["replica_wrote"] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _remember_write(session, flush_context):
+    remember_write(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember_writer(session):
+    # the user of the request is set on the session by get_current_principal
+    if session.info.pop("replica_wrote", False) and session.info.get("sub") is not None:
+        replica_router.wrote(session.info["sub"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    # a rolled back savepoint keeps the writes flushed before it
+    if session.in_nested_transaction():
+        return
+    session.info.pop("replica_wrote", None)
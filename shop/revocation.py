@@ -0,0 +1,131 @@
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from shop import constants
+from shop.models import RevokedToken
+
+
+class RevocationList:
+    """
+    Ids of revoked tokens which have not expired yet, checked on every request without touching the database.
+    Entries are dropped once their token expires, so the list never holds more than the tokens revoked
+    within one token lifetime. Revocations of other processes are pulled from the revoked_token table
+    at most every `sync_interval` seconds.
+    """
+
+    def __init__(self, sync_interval: float):
+        self.sync_interval = sync_interval
+        self._expires_by_jti = {}  # jti -> exp (unix time)
+        self._expiry_heap = []  # (exp, jti)
+        self._synced_at = None  # revoked_at of the last sync (naive UTC)
+        self._next_sync = 0.0
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.revoked_hits = 0
+        self.syncs = 0
+
+    def add(self, jti: str, exp: float):
+        with self._lock:
+            self._add(jti, exp)
+
+    def _add(self, jti: str, exp: float):
+        if jti not in self._expires_by_jti:
+            self._expires_by_jti[jti] = exp
+            heapq.heappush(self._expiry_heap, (exp, jti))
+
+    def _purge(self, now: float):
+        while self._expiry_heap and self._expiry_heap[0][0] <= now:
+            _, jti = heapq.heappop(self._expiry_heap)
+            self._expires_by_jti.pop(jti, None)
+
+    def is_revoked(self, jti: str) -> bool:
+        with self._lock:
+            self._purge(time.time())
+            self.checks += 1
+            revoked = jti in self._expires_by_jti
+            if revoked:
+                self.revoked_hits += 1
+            return revoked
+
+    def sync(self, db: Session, force: bool = False):
+        """
+        Load the tokens revoked by other processes since the last sync.
+        """
+        if not force and time.monotonic() < self._next_sync:
+            return
+        self._next_sync = time.monotonic() + self.sync_interval
+        query = db.query(RevokedToken.jti, RevokedToken.revoked_at, RevokedToken.expires_at).filter(
+            RevokedToken.expires_at > datetime.utcnow()
+        )
+        if self._synced_at is not None:
+            # overlap with the previous sync, transactions may commit in a different order than they revoked
+            query = query.filter(RevokedToken.revoked_at >= self._synced_at - timedelta(seconds=60))
+        rows = query.all()
+        with self._lock:
+            for jti, revoked_at, expires_at in rows:
+                self._add(jti, _unix_time(expires_at))
+                if self._synced_at is None or revoked_at > self._synced_at:
+                    self._synced_at = revoked_at
+            self._synced_at = self._synced_at or datetime.utcnow()
+            self.syncs += 1
+
+    def clear(self):
+        with self._lock:
+            self._expires_by_jti.clear()
+            self._expiry_heap.clear()
+            self._synced_at = None
+            self._next_sync = 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": len(self._expires_by_jti),
+                "checks": self.checks,
+                "revoked_hits": self.revoked_hits,
+                "syncs": self.syncs,
+            }
+
+
+def _unix_time(value: datetime) -> float:
+    return (value - datetime(1970, 1, 1)).total_seconds()
+
+
+revocation_list = RevocationList(sync_interval=constants.REVOCATION_SYNC_INTERVAL)
+
+
+def revoke_token(db: Session, claims: dict) -> bool:
+    """
+    Revoke a token by its jti until it expires, the caller commits.
+    Returns False when the token had already been revoked, here or by a concurrent request.
+    """
+    jti, exp = claims.get("jti"), claims.get("exp")
+    if jti is None or exp is None:
+        return False
+    revocation_list.add(jti, exp)
+    now = datetime.utcnow()
+    revoked = False
+    if not db.query(RevokedToken.id).filter(RevokedToken.jti == jti).first():
+        try:
+            # a concurrent request revoking the same token inserts the same jti
+            with db.begin_nested():
+                db.add(RevokedToken(jti=jti, revoked_at=now, expires_at=datetime.utcfromtimestamp(exp)))
+                db.flush()
+            revoked = True
+        except IntegrityError:
+            pass
+    # the table only needs the tokens which could still be used
+    db.query(RevokedToken).filter(RevokedToken.expires_at <= now).delete(synchronize_session=False)
+    return revoked
+
+
+def is_revoked(db: Session, claims: dict) -> bool:
+    jti = claims.get("jti")
+    if jti is None:
+        return False
+    revocation_list.sync(db)
+    return revocation_list.is_revoked(jti)
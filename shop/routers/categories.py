@@ -28,14 +28,15 @@ def create_category(
     """
     utils.check_free_category_name(db, current_shop.id, category_data.name)
 
-    slug = utils.generate_unique_category_slug(db, current_shop.shop_name, category_data.name)
-
     new_category = models.Category(
         shop_id=current_shop.id,
         name=category_data.name,
-        slug=slug,
     )
-    db.add(new_category)
+    utils.add_with_unique_slug(
+        db,
+        new_category,
+        lambda db: utils.generate_unique_category_slug(db, current_shop.shop_name, category_data.name),
+    )
     db.commit()
     db.refresh(new_category)
 
@@ -92,18 +93,23 @@ def update_category(
     category = utils.get_category_by_slug_and_shop_id(db, current_shop.id, category_slug)
 
     changed = 0
+    renamed = False
     for key, value in category_data_dict.items():
         current_value = getattr(category, key)
         if value is not None:
             if value != current_value:
                 if key == "name":
                     utils.check_free_category_name(db, current_shop.id, value)
-                    setattr(category, "slug", utils.generate_unique_category_slug(db, current_shop.shop_name, value))
+                    renamed = True
                 setattr(category, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(
+            db, category, lambda db: utils.generate_unique_category_slug(db, current_shop.shop_name, category.name)
+        )
     db.commit()
     db.refresh(category)
 
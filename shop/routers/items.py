@@ -1,10 +1,20 @@
 from typing import Union
 
-from fastapi import APIRouter, Depends, HTTPException
+import anyio.to_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, UploadFile
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from shop import models, schemas, utils
-from shop.utils import get_current_shop, get_current_user, get_db
+from shop import bulk, cache, constants, models, schemas, serializers, utils
+from shop.utils import (
+    get_async_read_db,
+    get_current_shop,
+    get_current_user,
+    get_db,
+    get_item_fieldset,
+    get_read_db,
+)
 
 router = APIRouter(prefix="/item", tags=["items"])
 
@@ -33,25 +43,73 @@ def create_item(
         raise HTTPException(status_code=409, detail="Category not found.")
 
     utils.check_free_item_name(db, current_shop.id, item_data.name)
-    slug = utils.generate_unique_item_slug(db, current_shop.shop_name, item_data.name)
 
     new_item = models.Item(
         shop_id=current_shop.id,
         category_id=item_data.category_id,
         name=item_data.name,
-        slug=slug,
         image=item_data.image,
         title=item_data.title,
         description=item_data.description,
         price=item_data.price,
     )
-    db.add(new_item)
+    utils.add_with_unique_slug(
+        db, new_item, lambda db: utils.generate_unique_item_slug(db, current_shop.shop_name, item_data.name)
+    )
     db.commit()
     db.refresh(new_item)
 
     return new_item
 
 
+@router.post("/bulk", response_model=schemas.ItemImportOut)
+def import_items(
+    file: UploadFile,
+    current_shop: models.Shop = Depends(get_current_shop),
+    db: Session = Depends(get_db),
+):
+    """
+    Endpoint to create many Items from a CSV or NDJSON file, with the fields of a single Item per row.
+
+    Parameters:
+    - file (UploadFile): CSV file with a header line, or NDJSON file with a JSON object per line.
+
+    Returns:
+    - schemas.ItemImportOut: Number of created and failed rows, and the errors of the failed rows.
+
+    Raises:
+    - HTTPException 415: If the file is neither CSV nor NDJSON.
+    """
+    return bulk.import_items(db, current_shop, file)
+
+
+@router.patch("/bulk", response_model=schemas.ItemBulkPatchOut)
+def update_items(
+    changes: list[schemas.ItemBulkPatch],
+    current_shop: models.Shop = Depends(get_current_shop),
+    db: Session = Depends(get_db),
+):
+    """
+    Endpoint to update many Items of the shop at once, e.g. prices and availability.
+
+    Parameters:
+    - changes (list[schemas.ItemBulkPatch]): Slug of every Item with the fields to change.
+
+    Returns:
+    - schemas.ItemBulkPatchOut: Number of updated Items and the slugs not found in the shop.
+
+    Raises:
+    - HTTPException 409: If a category does not belong to the shop.
+    - HTTPException 413: If there are more than BULK_UPDATE_MAX_ITEMS changes.
+    - HTTPException 422: If no field is changed.
+    """
+    if len(changes) > constants.BULK_UPDATE_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413, detail=f"At most {constants.BULK_UPDATE_MAX_ITEMS} items can be updated at once."
+        )
+    return bulk.update_items(db, current_shop, changes)
+
+
 @router.patch("/{item_slug}/", response_model=schemas.ItemOut)
 def update_item(
     item_data: schemas.ItemPatch,
@@ -76,20 +134,24 @@ def update_item(
     item_data_dict = item_data.model_dump()
 
     item = utils.get_item_by_slug_for_shop(db, current_shop.id, item_slug)
-    utils.check_item_owner(db, current_shop.id, item_slug)
     changed = 0
+    renamed = False
     for key, value in item_data_dict.items():
         current_value = getattr(item, key)
         if value is not None:
             if value != current_value:
                 if key == "name":
                     utils.check_free_item_name(db, current_shop.id, value)
-                    setattr(item, "slug", utils.generate_unique_item_slug(db, current_shop.shop_name, value))
+                    renamed = True
                 setattr(item, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(
+            db, item, lambda db: utils.generate_unique_item_slug(db, current_shop.shop_name, item.name)
+        )
     db.commit()
     db.refresh(item)
 
@@ -122,28 +184,51 @@ def delete_item(
 
 
 @router.get("/{item_slug}/", response_model=schemas.ItemOut)
-def get_item(
+async def get_item(
     item_slug: str,
-    db: Session = Depends(get_db),
+    request: Request,
+    fieldset: tuple = Depends(get_item_fieldset),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
     """
     Endpoint to get an Item from the database.
 
     Parameters:
     - item_slug (str): The slug of the Item to be fetched.
+    - fields (str): Comma separated fields to return, all of them by default.
+    - include (str): Comma separated related data to return (reviews).
 
     Returns:
     - schemas.Item: The fetched Item as a Pydantic model.
+    - 304 Not Modified: If the Item matches the If-None-Match/If-Modified-Since validators.
 
     Raises:
     - HTTPException 404: If the Item with the given slug does not exist.
     """
+    cache_key = cache.item_detail_key(item_slug, fieldset)
+    cached = cache.catalog_cache.get(cache_key)
+    if cached is None:
+        schema = serializers.partial_schema(schemas.ItemOut, fieldset)
+        item = await db.run_sync(load_item, item_slug, schema)
+        # validated and encoded off the event loop, the reviews are loaded already
+        body = await anyio.to_thread.run_sync(encode_item, item, schema)
+        cached = cache.make_cached_response(body, last_modified=cache.last_modified_of(item))
+        cache.catalog_cache.set(cache_key, cached, tags=cache.item_detail_tags(item))
+    return cache.conditional_response(request, cached)
+
+
+def load_item(db: Session, item_slug: str, schema: type) -> models.Item:
     item = utils.get_item_by_slug(db, item_slug)
-    # item.reviews for querying the reviews
-    item.reviews
+    if "reviews" in schema.model_fields:
+        # lazy loads only work here, not on the worker thread encoding the item
+        item.reviews
     return item
 
 
+def encode_item(item: models.Item, schema: type) -> bytes:
+    return schema.model_validate(item).model_dump_json().encode()
+
+
 @router.post("/{item_slug}/reviews/", response_model=schemas.ItemReviewOut)
 def create_item_comment(
     review_data: schemas.ItemReviewCreate,
@@ -170,6 +255,8 @@ def create_item_comment(
     db.refresh(new_comment)
 
     item._set_average_rating()
+    # the reviews are part of the item's responses, its Last-Modified moves even when the rating doesn't
+    item.updated_at = func.now()
     db.commit()
     db.refresh(item)
     return new_comment
@@ -178,7 +265,7 @@ def create_item_comment(
 @router.get("/{item_slug}/reviews/", response_model=Union[dict, list[schemas.ItemReviewOut]])
 def get_item_reviews(
     item_slug: str,
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     item = utils.get_item_by_slug(db, item_slug)
     reviews = item.reviews
@@ -3,11 +3,13 @@ from typing import Union
 
 import stripe
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from shop import constants, models, schemas, utils
+from shop import constants, models, schemas, serializers, utils
 from shop.smtp_emails import send_new_order_confirmation_email
-from shop.utils import get_current_user, get_db
+from shop.utils import get_async_current_user, get_async_read_db, get_current_user, get_db
 
 router = APIRouter(tags=["Related to orders"])
 
@@ -163,7 +165,7 @@ def post_order_details(
 
 
 @router.post("/stripe-webhook/")
-async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
+async def stripe_webhook(request: Request, db: AsyncSession = Depends(utils.get_async_db)):
     payload = await request.json()
     event = None
 
@@ -181,25 +183,40 @@ async def stripe_webhook(request: Request, db: Session = Depends(get_db)):
 
         if user_id is None:
             return {"error": "User ID not found"}
-        order = utils.get_order_by_order_key(db, order_key)
-        shop_order = db.query(models.ShopOrder).filter(models.ShopOrder.order_id == order.id).first()
+        order = await db.run_sync(utils.get_order_by_order_key, order_key)
+        shop_order = (
+            (await db.execute(select(models.ShopOrder).where(models.ShopOrder.order_id == order.id))).scalars().first()
+        )
         order.billing_status = True
         shop_order.billing_status = True
-        db.commit()
+        await db.commit()
 
     return {"status": "success"}
 
 
 @router.get("/orders/", response_model=list[schemas.OrderOut])
-def get_orders(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    orders = utils.get_orders(db, current_user.id)
-    return orders
+async def get_orders(
+    current_user: models.User = Depends(get_async_current_user), db: AsyncSession = Depends(get_async_read_db)
+):
+    return await db.run_sync(render_orders, current_user.id)
+
+
+def render_orders(db: Session, user_id: int):
+    orders = utils.get_orders(db, user_id)
+    return serializers.list_response(db, orders, schemas.OrderOut)
 
 
 @router.get("/orders/{order_id}", response_model=schemas.OrderOut)
-def get_order(order_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(get_current_user)):
-    order = utils.get_order_by_order_id(db, order_id)
-    return order
+async def get_order(
+    order_id: int,
+    db: AsyncSession = Depends(get_async_read_db),
+    current_user: models.User = Depends(get_async_current_user),
+):
+    return await db.run_sync(render_order, order_id)
+
+
+def render_order(db: Session, order_id: int) -> schemas.OrderOut:
+    return schemas.OrderOut.model_validate(utils.get_order_by_order_id(db, order_id))
 
 
 @router.get("/wish-list/")
@@ -1,11 +1,11 @@
 from datetime import date
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, Request
 from sqlalchemy.orm import Session
 
-from shop import models, schemas, utils
+from shop import cache, models, schemas, serializers, utils
 from shop.smtp_emails import send_status_updated_email
-from shop.utils import get_current_shop, get_db
+from shop.utils import get_current_shop, get_db, get_item_fieldset, get_read_db
 
 router = APIRouter(prefix="/shop", tags=["shop"])
 
@@ -17,20 +17,24 @@ def update_shop_details(
     shop_data_dict = shop_data.model_dump()
 
     changed = 0
+    renamed = False
     for key, value in shop_data_dict.items():
         current_value = getattr(current_shop, key)
         if value is not None:
             if value != current_value:
                 if key == "shop_name":
                     utils.check_free_shop_name(db, value)
-                    new_slug = utils.generate_unique_shop_slug(db, value)
-                    current_shop.slug = new_slug
+                    renamed = True
                     # TODO update all items and categories slugs
                 setattr(current_shop, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(
+            db, current_shop, lambda db: utils.generate_unique_shop_slug(db, current_shop.shop_name)
+        )
     db.commit()
     db.refresh(current_shop)
 
@@ -38,7 +42,7 @@ def update_shop_details(
 
 
 @router.get("/{shop_slug}", response_model=schemas.ShopOut)
-def get_shop(shop_slug: str, db: Session = Depends(get_db)):
+def get_shop(shop_slug: str, request: Request, db: Session = Depends(get_read_db)):
     """
     Endpoint to get a Shop from the database.
 
@@ -47,12 +51,16 @@ def get_shop(shop_slug: str, db: Session = Depends(get_db)):
 
     Returns:
     - schemas.Shop: The fetched Shop as a Pydantic model.
+    - 304 Not Modified: If the Shop matches the If-None-Match/If-Modified-Since validators.
 
     Raises:
     - HTTPException 404: If the Shop with the given slug does not exist.
     """
     shop = utils.get_shop_by_slug(db, shop_slug)
-    return shop
+    body = schemas.ShopOut.model_validate(shop).model_dump_json().encode()
+    return cache.conditional_response(
+        request, cache.make_cached_response(body, last_modified=cache.last_modified_of(shop))
+    )
 
 
 @router.get("-admin/orders/", response_model=list[schemas.ShopOrderOut])
@@ -134,15 +142,18 @@ def get_all_categories_for_shop_admin(
 @router.get("-admin/items/", response_model=list[schemas.ItemOut])
 def get_all_items_for_shop_admin(
     current_shop: models.Shop = Depends(get_current_shop),
+    fieldset: tuple = Depends(get_item_fieldset),
     db: Session = Depends(get_db),
 ):
     """
-    Endpoint to get all items for shop admin
+    Endpoint to get all items for shop admin, fields can be picked with `fields` and `include`
     """
-    items = db.query(models.Item).filter(models.Item.shop_id == current_shop.id).all()
+    schema = serializers.partial_schema(schemas.ItemOut, fieldset)
+    query = db.query(models.Item).filter(models.Item.shop_id == current_shop.id)
+    items = serializers.project(query, schema).all()
     if not items:
         raise HTTPException(status_code=409, detail="No items found")
-    return items
+    return serializers.list_response(db, items, schema)
 
 
 @router.get("-admin/users/", response_model=list[schemas.UserOut])
@@ -173,7 +184,7 @@ def get_user_orders_shop(
 @router.get("-admin/stats-items/")
 def get_stats_items_per_shop(
     current_shop: models.Shop = Depends(get_current_shop),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     Endpoint to get stats of items per shop
@@ -187,7 +198,7 @@ def get_total_revenue_with_filtering(
     start_date: date = Query(None, description="Filter orders by start date"),
     end_date: date = Query(None, description="Filter orders by end date"),
     current_shop: models.Shop = Depends(get_current_shop),
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
 ):
     """
     Endpoint to get total revenue with filtering by start date and end date
@@ -1,7 +1,9 @@
 from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
-from shop import schemas, utils
+from shop import cache, passwords, ratelimit, replica, schemas, utils
+from shop.keyring import key_ring
 from shop.models import User
 from shop.utils import get_db
 
@@ -18,19 +20,21 @@ def update_shop_superuser(
     shop_data_dict = shop_data.model_dump()
     shop = utils.get_shop_by_slug(db, shop_slug)
     changed = 0
+    renamed = False
     for key, value in shop_data_dict.items():
         current_value = getattr(shop, key)
         if value is not None:
             if value != current_value:
                 if key == "shop_name":
                     utils.check_free_shop_name(db, value)
-                    new_slug = utils.generate_unique_shop_slug(db, value)
-                    shop.slug = new_slug
+                    renamed = True
                 setattr(shop, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(db, shop, lambda db: utils.generate_unique_shop_slug(db, shop.shop_name))
     db.commit()
     db.refresh(shop)
 
@@ -49,18 +53,21 @@ def update_item_superuser(
     item = utils.get_item_by_slug(db, item_slug)
     shop = item.shop
     changed = 0
+    renamed = False
     for key, value in item_data_dict.items():
         current_value = getattr(item, key)
         if value is not None:
             if value != current_value:
                 if key == "name":
                     utils.check_free_item_name(db, shop.id, value)
-                    setattr(item, "slug", utils.generate_unique_item_slug(db, shop.shop_name, value))
+                    renamed = True
                 setattr(item, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(db, item, lambda db: utils.generate_unique_item_slug(db, shop.shop_name, item.name))
     db.commit()
     db.refresh(item)
 
@@ -79,18 +86,23 @@ def update_category_superuser(
     category = utils.get_category_by_slug(db, category_slug)
     shop = category.shop
     changed = 0
+    renamed = False
     for key, value in category_data_dict.items():
         current_value = getattr(category, key)
         if value is not None:
             if value != current_value:
                 if key == "name":
                     utils.check_free_category_name(db, shop.id, value)
-                    setattr(category, "slug", utils.generate_unique_category_slug(db, shop.shop_name, value))
+                    renamed = True
                 setattr(category, key, value)
                 changed += 1
     if not changed:
         raise HTTPException(status_code=422, detail="Model was not changed.")
 
+    if renamed:
+        utils.add_with_unique_slug(
+            db, category, lambda db: utils.generate_unique_category_slug(db, shop.shop_name, category.name)
+        )
     db.commit()
     db.refresh(category)
 
@@ -212,6 +224,9 @@ def delete_item_review_superuser(
     item_review_id: int, current_user: User = Depends(utils.get_super_user), db: Session = Depends(get_db)
 ):
     item_review = utils.get_item_review_by_id(db, item_review_id)
+    if item_review.item is not None:
+        # the item's responses list its reviews
+        item_review.item.updated_at = func.now()
     db.delete(item_review)
     db.commit()
     return item_review
@@ -250,3 +265,48 @@ def delete_user_superuser(
     db.delete(user)
     db.commit()
     return user
+
+
+@router.get("/stats/cache/")
+def get_cache_stats(current_user: User = Depends(utils.get_super_user)):
+    """
+    Endpoint to get hit/miss counters of the catalog, principal and verified token caches.
+    """
+    return {
+        "catalog": cache.catalog_cache.stats(),
+        "principal": cache.principal_cache.stats(),
+        "token": key_ring.verified.stats(),
+    }
+
+
+@router.get("/stats/password-hashing/")
+def get_password_hashing_stats(current_user: User = Depends(utils.get_super_user)):
+    """
+    Endpoint to get queue depth and latency of the password hashing pool.
+    """
+    return passwords.password_hasher.stats()
+
+
+@router.get("/stats/rate-limit/")
+def get_rate_limit_stats(current_user: User = Depends(utils.get_super_user)):
+    """
+    Endpoint to get the number of allowed and throttled login and signup attempts.
+    """
+    return ratelimit.rate_limiter.stats()
+
+
+@router.get("/stats/db-pool/")
+def get_db_pool_stats(current_user: User = Depends(utils.get_super_user)):
+    """
+    Endpoint to get checked out connections, overflow, timeouts and checkout wait times
+    of the sync, async and replica connection pools of this process, and where the reads went.
+    """
+    router = replica.replica_router
+    return {
+        "sync": utils.get_session_factory().kw["bind"].pool.monitor.stats(),
+        "async": utils.get_async_session_factory().kw["bind"].sync_engine.pool.monitor.stats(),
+        "replica": {
+            **router.stats(),
+            "pool": router.engine.pool.monitor.stats() if router.engine is not None else None,
+        },
+    }
@@ -3,7 +3,7 @@ from enum import Enum
 from typing import Optional
 
 from fastapi import UploadFile
-from pydantic import BaseModel, EmailStr, field_validator
+from pydantic import BaseModel, EmailStr, Field, field_validator
 
 
 class UserRoleEnum(str, Enum):
@@ -17,6 +17,13 @@ class ShopOrderStatusEnum(str, Enum):
     SENT = "Sent"
 
 
+class ItemSortEnum(str, Enum):
+    PRICE = "price"
+    PRICE_DESC = "-price"
+    RATING = "rating"
+    NEWEST = "newest"
+
+
 class UserBase(BaseModel):
     """
     Base Pydantic model for User. Includes common fields for create and update operations.
@@ -164,6 +171,14 @@ class TokenData(BaseModel):
     username: Optional[str] = None
 
 
+class TokenRefresh(BaseModel):
+    """
+    Pydantic model for exchanging a refresh token for new tokens, or revoking it on logout.
+    """
+
+    refresh_token: str
+
+
 class ShopPatch(BaseModel):
     """
     Pydantic model for partially updating shop data.
@@ -288,6 +303,33 @@ class ItemPatchAdmin(ItemPatch):
     is_approved: Optional[bool] = None
 
 
+class ItemBulkPatch(BaseModel):
+    """
+    Pydantic model for the changes of an Item, found by its slug, in a bulk update.
+    Renames change the slug and go through the update of a single Item.
+    """
+
+    slug: str
+    image: Optional[str] = None
+    title: Optional[str] = Field(None, max_length=200)
+    description: Optional[str] = None
+    price: Optional[float] = None
+    is_available: Optional[bool] = None
+    category_id: Optional[int] = None
+
+    class Config:
+        extra = "forbid"
+
+
+class ItemBulkPatchOut(BaseModel):
+    """
+    Pydantic model for sending the summary of a bulk Item update in API responses.
+    """
+
+    updated: int
+    not_found: list[str]
+
+
 class ItemReviewCreate(BaseModel):
     """
     Pydantic model for creating a new ItemReview.
@@ -336,6 +378,67 @@ class ItemOut(ItemCreate):
     reviews: Optional[list[ItemReviewOut]] = None
 
 
+class ShopFacet(BaseModel):
+    """
+    Pydantic model for the number of catalog items of a Shop.
+    """
+
+    slug: str
+    shop_name: str
+    count: int
+
+
+class CategoryFacet(BaseModel):
+    """
+    Pydantic model for the number of catalog items in Categories with the same name.
+    """
+
+    name: Optional[str] = None
+    count: int
+
+
+class RangeFacet(BaseModel):
+    """
+    Pydantic model for the number of catalog items in a price or rating range, lower bound included.
+    """
+
+    min: Optional[float] = None
+    max: Optional[float] = None
+    count: int
+
+
+class ItemFacetsOut(BaseModel):
+    """
+    Pydantic model for sending catalog facet counts in API responses.
+    """
+
+    total: int
+    shops: list[ShopFacet]
+    categories: list[CategoryFacet]
+    ratings: list[RangeFacet]
+    prices: list[RangeFacet]
+
+
+class ItemImportError(BaseModel):
+    """
+    Pydantic model for a row of a bulk item import which was not imported, line 0 for the whole file.
+    """
+
+    line: int
+    errors: list[str]
+
+
+class ItemImportOut(BaseModel):
+    """
+    Pydantic model for sending the report of a bulk item import in API responses.
+    Only the first BULK_IMPORT_MAX_ERRORS failed rows are listed in errors.
+    """
+
+    created: int
+    failed: int
+    errors: list[ItemImportError]
+
+
 class CartBase(BaseModel):
     """
     Base Pydantic model for Cart. Includes common fields for create and update operations.
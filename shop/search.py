@@ -0,0 +1,120 @@
+import re
+
+from sqlalchemy import event, func, literal_column, or_, table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Query, Session
+
+from shop.models import Item
+
+# Postgres: generated tsvector column (kept in sync by the database itself) with a GIN index
+POSTGRES_SEARCH_DDL = [
+    """
+    ALTER TABLE item ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A')
+        || setweight(to_tsvector('english', coalesce(title, '')), 'B')
+        || setweight(to_tsvector('english', coalesce(description, '')), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_item_search_vector ON item USING GIN (search_vector)",
+]
+
+# SQLite: external-content FTS5 table, kept in sync with the item table by triggers
+SQLITE_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS item_fts USING fts5(
+        name, title, description, content='item', content_rowid='id'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_insert AFTER INSERT ON item BEGIN
+        INSERT INTO item_fts(rowid, name, title, description)
+        VALUES (new.id, new.name, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_delete AFTER DELETE ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, title, description)
+        VALUES ('delete', old.id, old.name, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS item_fts_after_update AFTER UPDATE OF name, title, description ON item BEGIN
+        INSERT INTO item_fts(item_fts, rowid, name, title, description)
+        VALUES ('delete', old.id, old.name, old.title, old.description);
+        INSERT INTO item_fts(rowid, name, title, description)
+        VALUES (new.id, new.name, new.title, new.description);
+    END
+    """,
+]
+
+# bm25 column weights for name, title and description
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 1.0)
+
+item_fts = table("item_fts")
+
+
+def _install_search_index(connection: Connection):
+    dialect = connection.dialect.name
+    if dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+    elif dialect == "sqlite":
+        fts_exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'item_fts'"
+        ).first()
+        for statement in SQLITE_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+        if not fts_exists:
+            # index rows that were in the table before the FTS table was created
+            connection.exec_driver_sql("INSERT INTO item_fts(item_fts) VALUES ('rebuild')")
+
+
+# The migrations create the index, these keep scratch databases built with create_all searchable
+@event.listens_for(Item.__table__, "after_create")
+def _create_search_index_with_table(target, connection, **kw):
+    _install_search_index(connection)
+
+
+@event.listens_for(Item.__table__, "before_drop")
+def _drop_search_index_with_table(target, connection, **kw):
+    if connection.dialect.name == "sqlite":
+        connection.exec_driver_sql("DROP TABLE IF EXISTS item_fts")
+
+
+def _sqlite_match_expression(q: str) -> str:
+    # every word becomes a quoted FTS5 string, so user input can't inject query syntax
+    words = re.findall(r"\w+", q)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_items(db: Session, q: str) -> Query:
+    """
+    Query over approved and available items matching `q` in name, title or description,
+    ordered by relevance.
+    """
+    query = db.query(Item).filter(Item.is_approved == True, Item.is_available == True)
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "postgresql":
+        ts_query = func.websearch_to_tsquery("english", q)
+        search_vector = literal_column("item.search_vector")
+        return query.filter(search_vector.op("@@")(ts_query)).order_by(
+            func.ts_rank(search_vector, ts_query).desc(), Item.id
+        )
+
+    if dialect == "sqlite":
+        match_expression = _sqlite_match_expression(q)
+        if not match_expression:
+            return query.filter(False)
+        fts = literal_column("item_fts")
+        return (
+            query.join(item_fts, literal_column("item_fts.rowid") == Item.id)
+            .filter(fts.op("MATCH")(match_expression))
+            .order_by(func.bm25(fts, *SQLITE_BM25_WEIGHTS), Item.id)
+        )
+
+    # no text index available for other engines, plain substring search
+    pattern = f"%{q}%"
+    return query.filter(
+        or_(Item.name.ilike(pattern), Item.title.ilike(pattern), Item.description.ilike(pattern))
+    ).order_by(Item.id)
@@ -0,0 +1,146 @@
+from collections import defaultdict
+from functools import lru_cache
+from typing import Iterable
+
+import orjson
+from fastapi import Response
+from pydantic import BaseModel, TypeAdapter, create_model
+from sqlalchemy import orm, select
+from sqlalchemy.orm import ColumnProperty, Session, load_only, selectinload
+
+from shop import constants
+from shop.models import ItemReview
+from shop.schemas import ItemOut, ItemReviewOut
+
+# List fields of response models filled from a related table: field -> (foreign key column, schema of the rows)
+NESTED_LISTS = {
+    ItemOut: {"reviews": (ItemReview.item_id, ItemReviewOut)},
+}
+
+# Parameters bound per IN (...) clause while loading nested lists, sqlite allows 32766 at most
+NESTED_LIST_CHUNK_SIZE = 5000
+
+ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+@lru_cache(maxsize=None)
+def type_adapter(schema: type) -> TypeAdapter:
+    """
+    TypeAdapter of a list of `schema`, built once per schema.
+    """
+    return TypeAdapter(list[schema])
+
+
+@lru_cache(maxsize=None)
+def schema_columns(schema: type[BaseModel], model: type) -> tuple:
+    """
+    Columns of `model` holding the fields of `schema`, relationship fields are left out.
+    """
+    mapper = orm.class_mapper(model)
+    return tuple(
+        getattr(model, name)
+        for name in schema.model_fields
+        if name in mapper.attrs and isinstance(mapper.attrs[name], ColumnProperty)
+    )
+
+
+@lru_cache(maxsize=None)
+def partial_schema(schema: type[BaseModel], fields: tuple) -> type[BaseModel]:
+    """
+    Copy of `schema` with only the given fields, built once per field set.
+    """
+    if fields == tuple(schema.model_fields):
+        return schema
+    field_definitions = {
+        name: (field.annotation, field) for name, field in schema.model_fields.items() if name in fields
+    }
+    partial = create_model(
+        f"{schema.__name__}Fields", __config__=schema.model_config, __module__=__name__, **field_definitions
+    )
+    nested_lists = {field: nested for field, nested in NESTED_LISTS.get(schema, {}).items() if field in fields}
+    if nested_lists:
+        NESTED_LISTS[partial] = nested_lists
+    return partial
+
+
+def project(query: orm.Query, schema: type[BaseModel], *extra_columns) -> orm.Query:
+    """
+    Load only the columns of `schema` (and `extra_columns`): on the fast path as plain column rows,
+    otherwise as ORM objects with the other columns deferred and nested lists loaded with selectinload.
+    """
+    model = query.column_descriptions[0]["entity"]
+    columns = schema_columns(schema, model)
+    columns += tuple(column for column in extra_columns if column not in columns)
+    if constants.FAST_SERIALIZATION:
+        return query.with_entities(*columns)
+    nested_lists = [selectinload(getattr(model, field)) for field in NESTED_LISTS.get(schema, {})]
+    return query.options(load_only(*columns), *nested_lists)
+
+
+def _nested_lists(db: Session, schema: type[BaseModel], ids: list) -> dict:
+    """
+    Rows of every nested list field of `schema` for the given parent ids, as {field: {parent_id: [row, ...]}}.
+    """
+    nested = {}
+    for field, (foreign_key, nested_schema) in NESTED_LISTS.get(schema, {}).items():
+        if field not in schema.model_fields:
+            continue
+        columns = schema_columns(nested_schema, foreign_key.class_)
+        keys = [column.key for column in columns]
+        rows_by_parent = defaultdict(list)
+        for start in range(0, len(ids), NESTED_LIST_CHUNK_SIZE):
+            statement = (
+                select(foreign_key, *columns)
+                .where(foreign_key.in_(ids[start : start + NESTED_LIST_CHUNK_SIZE]))
+                .order_by(*foreign_key.class_.__mapper__.primary_key)
+            )
+            for parent_id, *values in db.execute(statement):
+                rows_by_parent[parent_id].append(dict(zip(keys, values)))
+        nested[field] = rows_by_parent
+    return nested
+
+
+def rows_to_dicts(db: Session, rows: Iterable, schema: type[BaseModel]) -> list[dict]:
+    """
+    Plain dicts with the fields of `schema` from column rows, nested lists are loaded with one query per field.
+    """
+    rows = list(rows)
+    keys = [name for name in schema.model_fields if rows and hasattr(rows[0], name)]
+    records = [{key: getattr(row, key) for key in keys} for row in rows]
+    nested = _nested_lists(db, schema, [record["id"] for record in records]) if records else {}
+    for field, rows_by_parent in nested.items():
+        for record in records:
+            record[field] = rows_by_parent.get(record["id"], [])
+    return records
+
+
+def load_list(db: Session, records: list, schema: type[BaseModel]) -> list:
+    """
+    What encode_list needs of `records`, loaded while the session is at hand: plain dicts with their nested lists
+    for column rows, the ORM objects themselves otherwise (`project` has loaded their nested lists already).
+    """
+    if constants.FAST_SERIALIZATION:
+        return rows_to_dicts(db, records, schema)
+    return list(records)
+
+
+def encode_list(records: list, schema: type[BaseModel]) -> bytes:
+    """
+    JSON array of records from load_list: dicts are encoded straight with orjson, ORM objects are validated
+    and encoded by pydantic. There is no database access, so it can run on a worker thread.
+    """
+    if constants.FAST_SERIALIZATION:
+        return orjson.dumps(records, option=ORJSON_OPTIONS)
+    adapter = type_adapter(schema)
+    return adapter.dump_json(adapter.validate_python(records, from_attributes=True))
+
+
+def dump_list(db: Session, records: list, schema: type[BaseModel]) -> bytes:
+    """
+    JSON array of `records` as `schema`.
+    """
+    return encode_list(load_list(db, records, schema), schema)
+
+
+def list_response(db: Session, records: list, schema: type[BaseModel]) -> Response:
+    return Response(content=dump_list(db, records, schema), media_type="application/json")
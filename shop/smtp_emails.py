@@ -1,15 +1,13 @@
-from datetime import datetime, timedelta
-
-from jose import jwt
 from sendgrid import SendGridAPIClient
 from sendgrid.helpers.mail import Mail
 
 from shop import constants
-from shop.database import SessionLocal
+from shop.auth import create_activation_token, create_newsletter_token, create_reset_password_token
 from shop.models import Order, User
+from shop.utils import get_session_factory
 
 
-def send_activation_email(user_id: int, db: SessionLocal):
+def send_activation_email(user_id: int):
     try:
         # Get your SendGrid API key from environment variables
         sendgrid_api_key = constants.SENDGRID_API_KEY
@@ -20,12 +18,11 @@ def send_activation_email(user_id: int, db: SessionLocal):
         # Create a SendGrid client
         sg = SendGridAPIClient(sendgrid_api_key)
 
-        user_email = db.query(User).filter(User.id == user_id).first().email
+        # runs after the response, when the session of the request is closed
+        with get_session_factory()() as db:
+            user_email = db.query(User).filter(User.id == user_id).first().email
         subject = "Welcome to our shop!"
-        expiration_time = datetime.utcnow() + timedelta(minutes=5)
-        token = jwt.encode(
-            {"sub": str(user_id), "exp": expiration_time}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
-        )
+        token = create_activation_token(sub=user_id)
         html_content = (
             "You have successfully registered to our shop."
             f" Please click <a href='http://{constants.HOST}/verification/?token={token}'>here</a>"
@@ -55,10 +52,7 @@ def send_reset_password_email(user_id: int, email: str):
         sg = SendGridAPIClient(sendgrid_api_key)
 
         subject = "Reset Your Password"
-        expiration_time = datetime.utcnow() + timedelta(hours=12)
-        reset_token = jwt.encode(
-            {"sub": str(user_id), "exp": expiration_time}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
-        )
+        reset_token = create_reset_password_token(sub=user_id)
         html_content = (
             f"Click <a href='http://{constants.HOST}/reset-password/verify/?token={reset_token}'>here</a>"
             " to reset your password."
@@ -86,8 +80,7 @@ def send_newsletter_activation_email(email: str):
         sg = SendGridAPIClient(sendgrid_api_key)
 
         subject = "Activate Your Subscription"
-        expiration_time = datetime.utcnow() + timedelta(hours=12)
-        token = jwt.encode({"sub": email, "exp": expiration_time}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+        token = create_newsletter_token(email=email)
         html_content = (
             f"<p>Click <a href=http://{constants.HOST}/newsletter/verify/?token={token}>here</a> to activate your"
             " subscription.</p><p>If you want to unsubscribe, click <a"
@@ -1,70 +1,225 @@
+import base64
+import json
 import os
-from collections import defaultdict
+from collections import Counter
+from datetime import datetime
+from typing import Optional
 
-from fastapi import Depends, HTTPException
-from jose import JWTError, jwt
+from fastapi import Depends, HTTPException, Query, Request
+from jose import JWTError
 from slugify import slugify
-from sqlalchemy.orm import Session
+from sqlalchemy import Integer, and_, case, cast, exists, func, or_, orm, select, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, aliased, make_transient_to_detached, sessionmaker
 
-from shop import constants
+from shop import cache, constants, replica, revocation, serializers
 from shop.auth import oauth2_scheme
-from shop.database import SessionLocal, TestingSessionLocal
-from shop.models import CartItem, Category, Item, ItemReview, NewsLetter, Order, OrderItem, Shop, ShopOrder, User
-from shop.schemas import TokenData
+from shop.cache import Principal
+from shop.database import (
+    AsyncReadSessionLocal,
+    AsyncReadTestingSessionLocal,
+    AsyncSessionLocal,
+    AsyncTestingSessionLocal,
+    ReadSessionLocal,
+    ReadTestingSessionLocal,
+    SessionLocal,
+    TestingSessionLocal,
+)
+from shop.keyring import key_ring
+from shop.models import (
+    CartItem,
+    Category,
+    Item,
+    ItemReview,
+    NewsLetter,
+    Order,
+    OrderItem,
+    Shop,
+    ShopOrder,
+    User,
+    association_table,
+)
+from shop.schemas import ItemOut, ItemSortEnum, OrderOut, TokenData
+
+
+def get_session_factory() -> sessionmaker:
+    if os.getenv("ENVIRONMENT") == "test":
+        return TestingSessionLocal
+    return SessionLocal
+
+
+def get_read_session_factory() -> sessionmaker:
+    if os.getenv("ENVIRONMENT") == "test":
+        return ReadTestingSessionLocal
+    return ReadSessionLocal
+
+
+def get_async_session_factory() -> async_sessionmaker:
+    if os.getenv("ENVIRONMENT") == "test":
+        return AsyncTestingSessionLocal
+    return AsyncSessionLocal
+
+
+def get_async_read_session_factory() -> async_sessionmaker:
+    if os.getenv("ENVIRONMENT") == "test":
+        return AsyncReadTestingSessionLocal
+    return AsyncReadSessionLocal
 
 
 # Dependency to get the database session
 def get_db():
-    if os.getenv("ENVIRONMENT") == "test":
-        db = TestingSessionLocal()
+    db = get_session_factory()()
+    try:
         yield db
+    finally:
         db.close()
-    else:
-        db = SessionLocal()
-        try:
-            yield db
-        finally:
-            db.close()
 
 
-def get_current_user(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> User:
+def request_subject(request: Request):
+    """
+    Subject of the request's bearer token, None for anonymous requests and invalid tokens.
+    """
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        return key_ring.decode(token, options={"verify_aud": False}).get("sub")
+    except JWTError:
+        return None
+
+
+# Dependency to get a session for read-only endpoints: its SELECTs run on the read replica, when there is one,
+# it doesn't lag behind and the user hasn't written recently. Anything else goes to the primary.
+def get_read_db(request: Request):
+    db = get_read_session_factory()(replica=replica.replica_router.choose(request_subject(request)))
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency to get the asyncio database session, for `async def` endpoints.
+# Sync helpers taking a Session run on it with `await db.run_sync(helper, ...)`.
+async def get_async_db():
+    async with get_async_session_factory()() as db:
+        yield db
+
+
+# Dependency to get an asyncio session for read-only endpoints, routed like get_read_db.
+async def get_async_read_db(request: Request):
+    replica_engine = await replica.replica_router.choose_async(request_subject(request))
+    replica_bind = replica_engine.sync_engine if replica_engine is not None else None
+    async with get_async_read_session_factory()(replica=replica_bind) as db:
+        yield db
+
+
+# columns of the user kept in the principal cache, the password hash stays in the database
+PRINCIPAL_USER_COLUMNS = tuple(column for column in User.__mapper__.column_attrs if column.key != "_password")
+
+
+def get_token_claims(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)) -> dict:
+    """
+    Dependency with the claims of the bearer token, checked against the revoked tokens held in memory.
+    """
+    return _token_claims(db, token)
+
+
+async def get_async_token_claims(db: AsyncSession = Depends(get_async_db), token: str = Depends(oauth2_scheme)) -> dict:
+    return await db.run_sync(_token_claims, token)
+
+
+def _token_claims(db: Session, token: str) -> dict:
     credentials_exception = HTTPException(
         status_code=401,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(
-            token,
-            constants.JWT_SECRET,
-            algorithms=[constants.ALGORITHM],
-            options={"verify_aud": False},
-        )
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-        token_data = TokenData(username=username)
+        payload = key_ring.decode(token, options={"verify_aud": False})
     except JWTError:
         raise credentials_exception
+    # refresh and emailed tokens (activation, password reset, newsletter) are no access tokens
+    if payload.get("sub") is None or payload.get("type") != "access_token":
+        raise credentials_exception
+    if revocation.is_revoked(db, payload):
+        raise HTTPException(status_code=401, detail="Token has been revoked.", headers={"WWW-Authenticate": "Bearer"})
+    return payload
 
-    user = db.query(User).filter(
-        User.id == token_data.username,
+
+def get_current_principal(db: Session = Depends(get_db), claims: dict = Depends(get_token_claims)) -> Principal:
+    """
+    Dependency resolving the token to the user and the user's approved shop with a single query,
+    the result is kept in the principal cache until the user or the shop changes.
+    """
+    return _current_principal(db, claims)
+
+
+async def get_async_current_principal(
+    db: AsyncSession = Depends(get_async_db), claims: dict = Depends(get_async_token_claims)
+) -> Principal:
+    return await db.run_sync(_current_principal, claims)
+
+
+def _current_principal(db: Session, claims: dict) -> Principal:
+    credentials_exception = HTTPException(
+        status_code=401,
+        detail="Could not validate credentials",
+        headers={"WWW-Authenticate": "Bearer"},
     )
+    token_data = TokenData(username=claims["sub"])
+
+    cache_key = cache.principal_key(token_data.username)
+    principal = cache.principal_cache.get(cache_key)
+    if principal is None:
+        row = (
+            db.query(User, Shop.id)
+            .outerjoin(Shop, and_(Shop.user_id == User.id, Shop.is_approved == True))
+            .filter(User.id == token_data.username)
+            .first()
+        )
+        if row is None:
+            raise credentials_exception
+        user, shop_id = row
+        principal = Principal(
+            user_id=user.id,
+            role=user.role,
+            is_active=user.is_active,
+            is_superuser=user.is_superuser,
+            shop_id=shop_id,
+            user={column.key: getattr(user, column.key) for column in PRINCIPAL_USER_COLUMNS},
+        )
+        cache.principal_cache.set(cache_key, principal, tags=cache.principal_tags(principal))
 
-    if user.first():
-        active_user = user.filter(User.is_active == True).first()
-        if active_user:
-            return active_user
+    if not principal.is_active:
         raise HTTPException(status_code=401, detail="Please activate your account.")
-    else:
-        raise credentials_exception
+    # writes committed by the session send the user's next reads to the primary
+    db.info["sub"] = token_data.username
+    return principal
 
 
-def get_current_shop(current_user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> Shop:
-    if current_user.role == "SHOP":
-        shop = db.query(Shop).filter(Shop.user_id == current_user.id, Shop.is_approved == True).first()
-        if shop:
-            return shop
+def get_current_user(principal: Principal = Depends(get_current_principal), db: Session = Depends(get_db)) -> User:
+    # a detached copy of the cached columns is attached to the session without a query,
+    # the password hash is loaded only when it's accessed
+    return db.merge(_principal_user(principal), load=False)
+
+
+async def get_async_current_user(
+    principal: Principal = Depends(get_async_current_principal), db: AsyncSession = Depends(get_async_db)
+) -> User:
+    return await db.merge(_principal_user(principal), load=False)
+
+
+def _principal_user(principal: Principal) -> User:
+    user = User(**principal.user)
+    make_transient_to_detached(user)
+    return user
+
+
+def get_current_shop(principal: Principal = Depends(get_current_principal), db: Session = Depends(get_db)) -> Shop:
+    if principal.role == "SHOP":
+        if principal.shop_id is not None:
+            return db.get(Shop, principal.shop_id)
         else:
             raise HTTPException(status_code=403, detail="Your shop is not approved.")
     else:
@@ -139,26 +294,94 @@ def check_free_shop_name(db: Session, shop_name: str):
     return existing_shop
 
 
-def generate_unique_category_slug(db: Session, shop_name: str, category_name: str):
-    unique_slug = f"{slugify(shop_name)}-{slugify(category_name)}"
-    counter = 1
+def _taken_slug_suffixes(db: Session, column, base_slug: str) -> tuple[bool, Optional[int]]:
+    """
+    Whether `base_slug` itself is taken, and the highest number n of the taken `base_slug-<n>` slugs
+    (None when there is none).
+    """
+    suffix = func.substr(column, len(base_slug) + 2)
+    # numeric suffixes only, "shop-item-blue" doesn't count for "shop-item"
+    numeric_suffix = and_(func.length(suffix).between(1, 9), func.ltrim(suffix, "0123456789") == "")
+    base_taken, highest = db.execute(
+        select(
+            func.max(case((column == base_slug, 1), else_=0)),
+            func.max(case((numeric_suffix, cast(suffix, Integer)))),
+        ).where(or_(column == base_slug, column.startswith(f"{base_slug}-", autoescape=True)))
+    ).one()
+    return bool(base_taken), highest
+
+
+def next_free_slug(db: Session, column, base_slug: str) -> str:
+    """
+    `base_slug` when it's free, else `base_slug-<n>` with the next number after the highest one taken,
+    in a single query. Two requests can still get the same slug, save it with `add_with_unique_slug`.
+    """
+    base_taken, highest = _taken_slug_suffixes(db, column, base_slug)
+    if not base_taken:
+        return base_slug
+    return f"{base_slug}-{(highest or 0) + 1}"
+
+
+def allocate_slugs(db: Session, column, base_slugs: list[str]) -> list[str]:
+    """
+    Unique slugs for a batch of base slugs, in the same order: one query for the whole batch,
+    plus one for every base slug which is taken already or repeated in the batch.
+    """
+    counts = Counter(base_slugs)
+    taken = set(db.scalars(select(column).where(column.in_(list(counts)))))
+    next_suffix = {}
+    for base_slug, count in counts.items():
+        if base_slug in taken or count > 1:
+            _, highest = _taken_slug_suffixes(db, column, base_slug)
+            next_suffix[base_slug] = (highest or 0) + 1
+
+    free = set(counts) - taken
+    slugs = []
+    for base_slug in base_slugs:
+        if base_slug in free:
+            # the first one of a free base slug takes it as it is
+            free.discard(base_slug)
+            slugs.append(base_slug)
+            continue
+        slugs.append(f"{base_slug}-{next_suffix[base_slug]}")
+        next_suffix[base_slug] += 1
+    return slugs
+
+
+def is_unique_violation(error: IntegrityError, column) -> bool:
+    """
+    Whether `error` comes from the unique constraint of `column` rather than from another constraint:
+    SQLite names the column in its message, Postgres the constraint (`<table>_<column>_key`).
+    """
+    message = str(error.orig)
+    table, name = column.table.name, column.name
+    return f"UNIQUE constraint failed: {table}.{name}" in message or f'"{table}_{name}_key"' in message
+
+
+def add_with_unique_slug(db: Session, instance, generate_slug, attempts: int = constants.SLUG_ATTEMPTS):
+    """
+    Add `instance` with `instance.slug = generate_slug(db)` and flush it in a savepoint. When another request
+    took the slug in the meantime, the unique constraint fails the flush and a new slug is generated.
+    The other pending changes of the session are flushed before, outside of the savepoint.
+    """
+    for attempt in range(attempts):
+        try:
+            with db.begin_nested():
+                instance.slug = generate_slug(db)
+                db.add(instance)
+                db.flush()
+            return instance.slug
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise HTTPException(status_code=409, detail="Slug is already taken, try again.")
 
-    while db.query(Category).filter(Category.slug == unique_slug).first():
-        unique_slug = f"{unique_slug}-{counter}"
-        counter += 1
 
-    return unique_slug
+def generate_unique_category_slug(db: Session, shop_name: str, category_name: str):
+    return next_free_slug(db, Category.slug, f"{slugify(shop_name)}-{slugify(category_name)}")
 
 
 def generate_unique_shop_slug(db: Session, shop_name: str):
-    counter = 1
-    unique_slug = slugify(shop_name)
-
-    while db.query(Shop).filter(Shop.slug == unique_slug).first():
-        unique_slug = f"{unique_slug}-{counter}"
-        counter += 1
-
-    return unique_slug
+    return next_free_slug(db, Shop.slug, slugify(shop_name))
 
 
 def check_free_category_name(db: Session, shop_id: int, category_name: str):
@@ -182,15 +405,12 @@ def get_category_by_slug(db: Session, category_slug: str):
     return existing_category
 
 
-def generate_unique_item_slug(db: Session, shop_name: str, item_name: str):
-    unique_slug = f"{slugify(shop_name)}-{slugify(item_name)}"
-    counter = 1
+def item_base_slug(shop_name: str, item_name: str) -> str:
+    return f"{slugify(shop_name)}-{slugify(item_name)}"
 
-    while db.query(Item).filter(Item.slug == unique_slug).first():
-        unique_slug = f"{unique_slug}-{counter}"
-        counter += 1
 
-    return unique_slug
+def generate_unique_item_slug(db: Session, shop_name: str, item_name: str):
+    return next_free_slug(db, Item.slug, item_base_slug(shop_name, item_name))
 
 
 def check_free_item_name(db: Session, shop_id: int, item_name: str):
@@ -230,6 +450,280 @@ def check_item_owner(db: Session, shop_id: int, item_slug: str):
     return existing_item
 
 
+def filter_catalog_items(
+    query: orm.Query,
+    shop: str = None,
+    category: str = None,
+    min_price: float = None,
+    max_price: float = None,
+    min_rating: float = None,
+) -> orm.Query:
+    """
+    Apply the public catalog filters (approved and available items, optionally narrowed down
+    by shop slug, category name, price and rating) to a query over Item.
+
+    An unknown shop slug, or a category without matching items, falls back to the broader catalog.
+    Those checks are uncorrelated EXISTS guards, so the whole filter stays a single SELECT.
+    """
+    query = query.filter(Item.is_approved == True, Item.is_available == True)
+
+    if min_price is not None:
+        query = query.filter(Item.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Item.price <= max_price)
+    if min_rating is not None:
+        query = query.filter(Item.average_rating >= min_rating)
+
+    if shop:
+        other_shop = aliased(Shop)
+        query = query.outerjoin(Item.shop).filter(
+            or_(Shop.slug == shop, ~exists().where(other_shop.slug == shop)),
+        )
+
+    if category:
+        other_item = aliased(Item)
+        other_category = aliased(Category)
+        matching_items = (
+            select(other_item.id)
+            .join(other_category, other_item.category_id == other_category.id)
+            .where(
+                other_category.name == category,
+                other_item.is_approved == True,
+                other_item.is_available == True,
+            )
+        )
+        if shop:
+            other_shop = aliased(Shop)
+            matching_items = matching_items.join(other_shop, other_item.shop_id == other_shop.id).where(
+                other_shop.slug == shop
+            )
+        query = query.outerjoin(Item.category).filter(
+            or_(Category.name == category, ~exists(matching_items)),
+        )
+
+    return query
+
+
+def get_catalog_filters(
+    shop: str = Query(None, description="Filter items by shop slug"),
+    category: str = Query(None, description="Filter items by category name"),
+    min_price: float = Query(None, ge=0, description="Filter items by minimal price"),
+    max_price: float = Query(None, ge=0, description="Filter items by maximal price"),
+    min_rating: float = Query(None, ge=0, le=5, description="Filter items by minimal average rating"),
+) -> dict:
+    """
+    Dependency with the public catalog filters shared by the items list and its facets.
+    """
+    if min_price is not None and max_price is not None and min_price > max_price:
+        raise HTTPException(status_code=422, detail="Minimal price cannot be greater than maximal price.")
+    return {
+        "shop": shop,
+        "category": category,
+        "min_price": min_price,
+        "max_price": max_price,
+        "min_rating": min_rating,
+    }
+
+
+# fields of item responses which can be picked with ?fields=, and related lists which can be added with ?include=
+ITEM_FIELDS = tuple(name for name in ItemOut.model_fields if name not in serializers.NESTED_LISTS[ItemOut])
+ITEM_INCLUDES = tuple(serializers.NESTED_LISTS[ItemOut])
+
+
+def get_item_fieldset(
+    fields: str = Query(None, description=f"Comma separated fields to return, any of: {', '.join(ITEM_FIELDS)}"),
+    include: str = Query(
+        None, description=f"Comma separated related data to return, any of: {', '.join(ITEM_INCLUDES)}"
+    ),
+) -> tuple:
+    """
+    Dependency with the fields of item responses, in the order of schemas.ItemOut.
+    Without `fields` every field is returned, related data only when asked with `include`
+    (or when neither of them is given, which is the full item).
+    """
+    requested_fields = {name.strip() for name in fields.split(",") if name.strip()} if fields else set()
+    requested_includes = {name.strip() for name in include.split(",") if name.strip()} if include else set()
+    unknown = sorted(requested_fields - set(ITEM_FIELDS)) + sorted(requested_includes - set(ITEM_INCLUDES))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}.")
+
+    if not requested_fields and not requested_includes:
+        return tuple(ItemOut.model_fields)
+    # the id is always returned, so the items can be told apart
+    selected = (requested_fields | {"id"}) if requested_fields else set(ITEM_FIELDS)
+    return tuple(name for name in ItemOut.model_fields if name in selected or name in requested_includes)
+
+
+# sort -> (sort key columns ending with the id tie-breaker, descending),
+# items without a value of the sort column (no price, no rating) come last in both directions
+ITEM_SORT_KEYS = {
+    None: ((Item.id,), False),
+    ItemSortEnum.PRICE: ((Item.price, Item.id), False),
+    ItemSortEnum.PRICE_DESC: ((Item.price, Item.id), True),
+    ItemSortEnum.RATING: ((Item.average_rating, Item.id), True),
+    ItemSortEnum.NEWEST: ((Item.created_at, Item.id), True),
+}
+
+
+def encode_items_cursor(item: Item, sort: ItemSortEnum = None) -> str:
+    if sort is None:
+        return str(item.id)
+    columns, _ = ITEM_SORT_KEYS[sort]
+    values = [getattr(item, column.key) for column in columns]
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_items_cursor(cursor: str, sort: ItemSortEnum = None) -> list:
+    try:
+        if sort is None:
+            return [int(cursor)]
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        columns, _ = ITEM_SORT_KEYS[sort]
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError("Cursor does not match the sort order.")
+        if sort == ItemSortEnum.NEWEST and values[0] is not None:
+            values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def paginate_items(
+    query: orm.Query, sort: ItemSortEnum = None, after: str = None, limit: int = constants.ITEMS_PAGE_SIZE
+):
+    """
+    Keyset pagination over the sort key (the sort column and Item.id), so every page
+    is a range scan of the matching catalog index.
+    Returns the page and the cursor of the next page (None for the last one).
+    """
+    columns, descending = ITEM_SORT_KEYS[sort]
+    if after is not None:
+        query = query.filter(_after_cursor(columns, descending, decode_items_cursor(after, sort)))
+
+    order_by = [column.desc() if descending else column for column in columns]
+    if len(columns) > 1:
+        order_by[0] = order_by[0].nulls_last()
+    items = query.order_by(*order_by).limit(limit + 1).all()
+    if len(items) > limit:
+        return items[:limit], encode_items_cursor(items[limit - 1], sort)
+    return items, None
+
+
+def _after_cursor(columns: tuple, descending: bool, last_seen: list):
+    # the rows after the cursor in the order of paginate_items
+    if len(columns) == 1:
+        return columns[0] < last_seen[0] if descending else columns[0] > last_seen[0]
+    column, id_column = columns
+    value, last_id = last_seen
+    if value is None:
+        # only rows without a value are left, ordered by id
+        return and_(column.is_(None), id_column < last_id if descending else id_column > last_id)
+    if isinstance(value, datetime):
+        # compared with the value as it's stored in the cursor's row, SQLite keeps the server default as text
+        # which doesn't compare equal to the bound datetime; the bound value is used when the row is gone
+        value = func.coalesce(select(column).where(id_column == last_id).scalar_subquery(), value)
+    sort_key, last_key = tuple_(column, id_column), tuple_(value, last_id)
+    return or_(sort_key < last_key if descending else sort_key > last_key, column.is_(None))
+
+
+def _bucket(column, boundaries: tuple):
+    # index of the bucket the value falls into: 0 below the first boundary, len(boundaries) above the last one,
+    # NULL for items without a value (unrated items), which are in no range
+    return case(
+        (column.is_(None), None),
+        *[(column < boundary, index) for index, boundary in enumerate(boundaries)],
+        else_=len(boundaries),
+    )
+
+
+def _range_facets(rows, boundaries: tuple) -> list[dict]:
+    counts = dict(rows)
+    bounds = (None, *boundaries, None)
+    return [
+        {"min": bounds[index], "max": bounds[index + 1], "count": counts[index]}
+        for index in range(len(boundaries) + 1)
+        if counts.get(index)
+    ]
+
+
+def get_catalog_facets(db: Session, **filters) -> dict:
+    """
+    Item counts per shop, category name, rating range and price range for the catalog filters.
+    Every facet is a GROUP BY over the filtered items. Items without a rating (or price) are counted
+    in the total but in none of the ranges.
+    """
+    filtered = filter_catalog_items(
+        db.query(Item.id, Item.shop_id, Item.category_id, Item.price, Item.average_rating), **filters
+    ).subquery()
+
+    shops = (
+        db.query(Shop.slug, Shop.shop_name, func.count(filtered.c.id))
+        .join(filtered, filtered.c.shop_id == Shop.id)
+        .group_by(Shop.id, Shop.slug, Shop.shop_name)
+        .order_by(func.count(filtered.c.id).desc(), Shop.slug)
+        .all()
+    )
+    categories = (
+        db.query(Category.name, func.count(filtered.c.id))
+        .select_from(filtered)
+        .outerjoin(Category, filtered.c.category_id == Category.id)
+        .group_by(Category.name)
+        .order_by(func.count(filtered.c.id).desc(), Category.name)
+        .all()
+    )
+    rating_bucket = _bucket(filtered.c.average_rating, constants.RATING_FACET_BOUNDARIES)
+    ratings = db.query(rating_bucket, func.count(filtered.c.id)).group_by(rating_bucket).all()
+    price_bucket = _bucket(filtered.c.price, constants.PRICE_FACET_BOUNDARIES)
+    prices = db.query(price_bucket, func.count(filtered.c.id)).group_by(price_bucket).all()
+
+    return {
+        "total": sum(count for _, count in ratings),
+        "shops": [{"slug": slug, "shop_name": shop_name, "count": count} for slug, shop_name, count in shops],
+        "categories": [{"name": name, "count": count} for name, count in categories],
+        "ratings": _range_facets(ratings, constants.RATING_FACET_BOUNDARIES),
+        "prices": _range_facets(prices, constants.PRICE_FACET_BOUNDARIES),
+    }
+
+
+CATALOG_EXPORT_COLUMNS = (
+    Item.id,
+    Item.slug,
+    Item.shop_id,
+    Item.category_id,
+    Item.name,
+    Item.title,
+    Item.description,
+    Item.image,
+    Item.price,
+    Item.average_rating,
+    Item.created_at,
+    Item.updated_at,
+)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def iter_catalog_export(session_factory: sessionmaker, batch_size: int = constants.EXPORT_BATCH_SIZE):
+    """
+    Generate the approved and available catalog as NDJSON chunks, one chunk per fetched batch of rows.
+    """
+    keys = [column.key for column in CATALOG_EXPORT_COLUMNS]
+    statement = (
+        select(*CATALOG_EXPORT_COLUMNS)
+        .where(Item.is_approved == True, Item.is_available == True)
+        .order_by(Item.id)
+        .execution_options(yield_per=batch_size)
+    )
+    with session_factory() as db:
+        for rows in db.execute(statement).partitions():
+            yield "".join(json.dumps(dict(zip(keys, row)), default=_json_default) + "\n" for row in rows)
+
+
 def get_cart_item(db: Session, user_id: int, item_id: int):
     existing_cart_item = (
         db.query(CartItem)
@@ -257,7 +751,8 @@ def get_cart_items(db: Session, user_id: int):
 
 
 def get_orders(db: Session, user_id: int):
-    existing_orders = db.query(Order).filter(Order.user_id == user_id, Order.billing_status == True).all()
+    query = db.query(Order).filter(Order.user_id == user_id, Order.billing_status == True)
+    existing_orders = serializers.project(query, OrderOut).all()
     if not existing_orders:
         raise HTTPException(status_code=409, detail="You have no orders yet.")
     return existing_orders
@@ -321,55 +816,53 @@ def get_shop_orders_by_user_id_for_shop(db: Session, user_id: int, shop_id: int)
 
 
 def get_all_users_ordered_in_shop(db: Session, shop_id: int):
-    shop_orders = (
-        db.query(ShopOrder)
+    users_per_shop = (
+        db.query(User)
         .filter(
-            ShopOrder.shop_id == shop_id,
-            ShopOrder.billing_status == True,
+            User.id.in_(select(ShopOrder.user_id).where(ShopOrder.shop_id == shop_id, ShopOrder.billing_status == True))
         )
         .all()
     )
-    users_per_shop = set()
-    for order in shop_orders:
-        user = db.query(User).filter(User.id == order.user_id).first()
-        users_per_shop.add(user)
     if not users_per_shop:
         raise HTTPException(status_code=409, detail="No users have ordered in your shop.")
     return users_per_shop
 
 
 def get_stats_for_each_item(db: Session, shop_id: int):
-    items_per_shop = (
-        db.query(Item)
-        .filter(
-            Item.shop_id == shop_id,
-        )
-        .all()
+    # counted in the same query, not by loading the wish lists and reviews of every item
+    wish_list_count = (
+        select(func.count())
+        .select_from(association_table)
+        .where(association_table.c.item_id == Item.id)
+        .scalar_subquery()
     )
-    items_ids = [item.id for item in items_per_shop]
-
-    item_price_quantity_dict = defaultdict(dict)
-
-    order_items = (
-        db.query(OrderItem)
-        .filter(
-            OrderItem.item_id.in_(items_ids),
+    reviews_count = select(func.count(ItemReview.id)).where(ItemReview.item_id == Item.id).scalar_subquery()
+    rows = (
+        db.query(
+            Item.id,
+            func.sum(OrderItem.price),
+            func.sum(OrderItem.quantity),
+            wish_list_count,
+            reviews_count,
+            Item.average_rating,
         )
+        .join(OrderItem, OrderItem.item_id == Item.id)
+        .filter(Item.shop_id == shop_id)
+        .group_by(Item.id, Item.average_rating)
+        .order_by(func.min(OrderItem.id))
         .all()
     )
 
-    for order_item in order_items:
-        item = db.query(Item).filter(Item.id == order_item.item_id).first()
-        if order_item.item_id not in item_price_quantity_dict:
-            item_price_quantity_dict[order_item.item_id]["price"] = order_item.price
-            item_price_quantity_dict[order_item.item_id]["quantity"] = order_item.quantity
-        else:
-            item_price_quantity_dict[order_item.item_id]["price"] += order_item.price
-            item_price_quantity_dict[order_item.item_id]["quantity"] += order_item.quantity
-
-        item_price_quantity_dict[order_item.item_id]["wish_list_count"] = len(item.users)
-        item_price_quantity_dict[order_item.item_id]["reviews_count"] = len(item.reviews)
-        item_price_quantity_dict[order_item.item_id]["average_rating"] = item.average_rating
+    item_price_quantity_dict = {
+        item_id: {
+            "price": price,
+            "quantity": quantity,
+            "wish_list_count": wish_lists,
+            "reviews_count": reviews,
+            "average_rating": average_rating,
+        }
+        for item_id, price, quantity, wish_lists, reviews, average_rating in rows
+    }
 
     if not item_price_quantity_dict:
         raise HTTPException(status_code=409, detail="No items have been sold in your shop.")
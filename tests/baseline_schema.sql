@@ -0,0 +1,173 @@
+-- SQLite schema which create_all built from the models of the first release, before there were migrations
+CREATE TABLE users (
+    id INTEGER NOT NULL,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    username VARCHAR(50),
+    email VARCHAR(100),
+    password VARCHAR(128) NOT NULL,
+    role VARCHAR(8),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    modified_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    last_login DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    is_staff BOOLEAN,
+    is_active BOOLEAN,
+    is_superuser BOOLEAN,
+    PRIMARY KEY (id),
+    UNIQUE (username),
+    UNIQUE (email)
+);
+CREATE INDEX ix_users_id ON users (id);
+CREATE TABLE newsletter (
+    id INTEGER NOT NULL,
+    email VARCHAR(100),
+    is_active BOOLEAN,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (email)
+);
+CREATE INDEX ix_newsletter_id ON newsletter (id);
+CREATE TABLE user_profiles (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    profile_picture VARCHAR(255),
+    phone_number VARCHAR(14),
+    dob DATETIME,
+    address VARCHAR(250),
+    country VARCHAR(16),
+    city VARCHAR(16),
+    pin_code VARCHAR(15),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    modified_at DATETIME DEFAULT CURRENT_TIMESTAMP NOT NULL,
+    PRIMARY KEY (id),
+    UNIQUE (user_id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_user_profiles_id ON user_profiles (id);
+CREATE TABLE shop (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    shop_name VARCHAR(50),
+    docs VARCHAR,
+    avatar VARCHAR(255),
+    cover_photo VARCHAR(255),
+    description TEXT,
+    slug VARCHAR,
+    is_approved BOOLEAN,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    modified_at DATETIME,
+    PRIMARY KEY (id),
+    UNIQUE (user_id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    UNIQUE (slug)
+);
+CREATE INDEX ix_shop_id ON shop (id);
+CREATE UNIQUE INDEX ix_shop_shop_name ON shop (shop_name);
+CREATE TABLE "order" (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    first_name VARCHAR(50),
+    last_name VARCHAR(50),
+    phone_number VARCHAR(14),
+    address VARCHAR(250),
+    country VARCHAR(16),
+    city VARCHAR(16),
+    pin_code VARCHAR(15),
+    billing_status BOOLEAN,
+    order_key VARCHAR(200),
+    total_paid FLOAT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_order_id ON "order" (id);
+CREATE TABLE category (
+    id INTEGER NOT NULL,
+    shop_id INTEGER,
+    name VARCHAR(100),
+    slug VARCHAR,
+    is_available BOOLEAN,
+    PRIMARY KEY (id),
+    FOREIGN KEY(shop_id) REFERENCES shop (id),
+    UNIQUE (slug)
+);
+CREATE INDEX ix_category_id ON category (id);
+CREATE TABLE shop_order (
+    id INTEGER NOT NULL,
+    shop_id INTEGER,
+    order_id INTEGER,
+    user_id INTEGER,
+    billing_status BOOLEAN,
+    total_paid FLOAT,
+    status VARCHAR(10),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id),
+    FOREIGN KEY(shop_id) REFERENCES shop (id),
+    FOREIGN KEY(order_id) REFERENCES "order" (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_shop_order_id ON shop_order (id);
+CREATE TABLE item (
+    id INTEGER NOT NULL,
+    shop_id INTEGER,
+    category_id INTEGER,
+    name VARCHAR(55),
+    image VARCHAR,
+    title VARCHAR(200),
+    description TEXT,
+    price FLOAT,
+    average_rating FLOAT,
+    slug VARCHAR,
+    is_approved BOOLEAN,
+    is_available BOOLEAN,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(shop_id) REFERENCES shop (id),
+    FOREIGN KEY(category_id) REFERENCES category (id),
+    UNIQUE (slug)
+);
+CREATE INDEX ix_item_id ON item (id);
+CREATE TABLE wish_list (
+    user_id INTEGER NOT NULL,
+    item_id INTEGER NOT NULL,
+    PRIMARY KEY (user_id, item_id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(item_id) REFERENCES item (id)
+);
+CREATE TABLE cart (
+    id INTEGER NOT NULL,
+    user_id INTEGER,
+    item_id INTEGER,
+    quantity INTEGER,
+    price FLOAT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    updated_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(user_id) REFERENCES users (id),
+    FOREIGN KEY(item_id) REFERENCES item (id)
+);
+CREATE INDEX ix_cart_id ON cart (id);
+CREATE TABLE order_item (
+    id INTEGER NOT NULL,
+    order_id INTEGER,
+    item_id INTEGER,
+    price FLOAT,
+    quantity INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(order_id) REFERENCES "order" (id),
+    FOREIGN KEY(item_id) REFERENCES item (id)
+);
+CREATE INDEX ix_order_item_id ON order_item (id);
+CREATE TABLE item_review (
+    id INTEGER NOT NULL,
+    item_id INTEGER,
+    user_id INTEGER,
+    stars INTEGER,
+    comment TEXT,
+    PRIMARY KEY (id),
+    FOREIGN KEY(item_id) REFERENCES item (id),
+    FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_item_review_id ON item_review (id);
@@ -1,14 +1,23 @@
+from collections import Counter
+from contextlib import contextmanager
 from unittest.mock import patch
 
 import pytest
 from faker import Faker
 from fastapi import HTTPException
 from fastapi.testclient import TestClient
+from sqlalchemy import event
 
 from shop.auth import create_access_token
-from shop.database import TestingSessionLocal
+from shop.database import TestingSessionLocal, async_test_engine, test_engine
 from shop.main import app
+from shop.migrate import upgrade
 from shop.models import Item, NewsLetter, Shop, ShopOrder, User
+from shop.querystats import statement_shape
+from tests.factories import ShopFactory
+
+# the test database gets the schema from the migrations, as the real one does
+upgrade(test_engine)
 
 client = TestClient(app)
 
@@ -85,6 +94,16 @@ def ger_user_by_id_approve(user_id: int):
     return user
 
 
+def make_user_superuser(user_id: int):
+    db = TestingSessionLocal()
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user:
+        raise ValueError("User not found.")
+    user.is_superuser = True
+    db.commit()
+    return user
+
+
 def delete_user(response_json):
     db = TestingSessionLocal()
     user_id = response_json.json().get("id")
@@ -104,6 +123,48 @@ def create_user(data):
     return response
 
 
+@contextmanager
+def count_queries():
+    """
+    Collect the SQL statements sent to the test database inside the block.
+    """
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    # the async endpoints run their statements on the engine under the asyncio one
+    engines = [test_engine, async_test_engine.sync_engine]
+    for engine in engines:
+        event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        for engine in engines:
+            event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+
+@pytest.fixture
+def query_budget():
+    """
+    `with query_budget(n):` fails the test when the block sends more than n statements to the test database,
+    listing the repeated ones.
+    """
+
+    @contextmanager
+    def budget(max_queries: int):
+        with count_queries() as statements:
+            yield statements
+        if len(statements) > max_queries:
+            shapes = Counter(statement_shape(statement) for statement in statements)
+            pytest.fail(
+                f"{len(statements)} statements sent, the budget is {max_queries}:\n"
+                + "\n".join(f"{count}x {shape}" for shape, count in shapes.most_common())
+            )
+
+    return budget
+
+
 def get_headers(user_id: int):
     token = create_access_token(sub=str(user_id))
     return {"Authorization": f"Bearer {token}"}
@@ -114,6 +175,26 @@ def fake():
     return Faker()
 
 
+@pytest.fixture
+def shop_data():
+    """
+    An approved shop with a category, an item and a cart item (see ShopFactory), deleted after the test.
+    """
+    data = ShopFactory.create()
+    yield data
+    delete_user(data["new_shop"])
+
+
+@pytest.fixture
+def other_shop_data():
+    """
+    A second shop like shop_data, for the tests of what one shop can't see or change of another.
+    """
+    data = ShopFactory.create()
+    yield data
+    delete_user(data["new_shop"])
+
+
 @pytest.fixture
 def random_user_data(fake):
     username = fake.user_name()
@@ -0,0 +1,161 @@
+import csv
+import io
+import json
+
+from sqlalchemy import text
+
+from shop import bulk
+from shop.database import TestingSessionLocal
+from shop.querystats import collect
+from tests.conftest import client, get_amount_of_items_per_shop, get_headers, get_shop_by_user_id
+
+FIELDS = ["category_id", "name", "image", "title", "description", "price"]
+
+
+def item_row(category_id: int, name: str, **fields) -> dict:
+    row = {
+        "category_id": category_id,
+        "name": name,
+        "image": "/image.jpg",
+        "title": "title",
+        "description": "description",
+        "price": 9.5,
+    }
+    return {**row, **fields}
+
+
+def as_csv(rows: list[dict]) -> bytes:
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+    return output.getvalue().encode()
+
+
+def upload(user_id: int, filename: str, content: bytes, content_type: str = "application/octet-stream"):
+    return client.post("/item/bulk", headers=get_headers(user_id), files={"file": (filename, content, content_type)})
+
+
+def test_import_csv_with_errors_per_row(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    category_id = shop_data["category_id"]
+    rows = [
+        item_row(category_id, "bulk-1"),
+        item_row(category_id, "bulk-2", price="not a price"),
+        item_row(category_id + 1000, "bulk-3"),
+        item_row(category_id, "bulk-1"),
+        item_row(category_id, "fixture-item"),
+        item_row(category_id, "x" * 56),
+        item_row(category_id, "bulk-4"),
+    ]
+    response = upload(user_id, "items.csv", as_csv(rows), "text/csv")
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 2
+    assert report["failed"] == 5
+    errors = {error["line"]: error["errors"] for error in report["errors"]}
+    assert list(errors) == [3, 4, 5, 6, 7]
+    assert errors[3][0].startswith("price: ")
+    assert errors[4] == ["category_id: Category not found."]
+    assert errors[5] == ["name: The file has another item with the name 'bulk-1'."]
+    assert errors[6] == ["name: You already have item with the name 'fixture-item'."]
+    assert errors[7] == ["name: At most 55 characters."]
+
+    shop = get_shop_by_user_id(user_id)
+    assert get_amount_of_items_per_shop(shop.id) == 3
+    assert client.get(f"/item/{shop.slug}-bulk-4/").json()["price"] == 9.5
+
+
+def test_import_ndjson(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    category_id = shop_data["category_id"]
+    lines = [
+        json.dumps(item_row(category_id, "Bulk Shirt")),
+        "",
+        json.dumps(item_row(category_id, "bulk shirt")),
+        "{not json",
+        "[1, 2]",
+        json.dumps(item_row(category_id, "bulk-extra", colour="blue")),
+    ]
+    response = upload(user_id, "items.ndjson", "\n".join(lines).encode())
+    assert response.status_code == 200
+    report = response.json()
+    assert report["created"] == 2
+    assert [(error["line"], error["errors"]) for error in report["errors"]] == [
+        (4, ["Invalid JSON."]),
+        (5, ["Expected a JSON object."]),
+        (6, ["colour: Extra inputs are not permitted"]),
+    ]
+
+    # both names have the same base slug
+    slug = get_shop_by_user_id(user_id).slug
+    assert client.get(f"/item/{slug}-bulk-shirt/").json()["name"] == "Bulk Shirt"
+    assert client.get(f"/item/{slug}-bulk-shirt-1/").json()["name"] == "bulk shirt"
+
+
+def test_import_unknown_format(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    response = upload(user_id, "items.xlsx", b"...")
+    assert response.status_code == 415
+
+
+def test_import_statements_per_batch(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    category_id = shop_data["category_id"]
+    rows = [item_row(category_id, f"batch-{number}") for number in range(40)]
+
+    db = TestingSessionLocal()
+    try:
+        item_import = bulk.ItemImport(db, get_shop_by_user_id(user_id), batch_size=10)
+        with collect() as stats:
+            item_import.run(bulk.read_csv(io.BytesIO(as_csv(rows))))
+    finally:
+        db.close()
+
+    assert item_import.report().created == 40
+    # per batch: the taken names, the taken slugs and the insert, whatever the number of rows
+    assert stats.shapes.most_common(1)[0][1] == 4
+    assert stats.count <= 4 * 4 + 2
+
+
+def test_import_reports_other_constraint_failures_per_row(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    category_id = shop_data["category_id"]
+    # a constraint which isn't the unique slug fails the insert of one row
+    with TestingSessionLocal() as db:
+        db.execute(
+            text(
+                "CREATE TRIGGER reject_item BEFORE INSERT ON item WHEN NEW.name = 'rejected' "
+                "BEGIN SELECT RAISE(ABORT, 'rejected by the test'); END"
+            )
+        )
+        db.commit()
+    try:
+        rows = [
+            item_row(category_id, "accepted-1"),
+            item_row(category_id, "rejected"),
+            item_row(category_id, "accepted-2"),
+        ]
+        response = upload(user_id, "items.csv", as_csv(rows), "text/csv")
+    finally:
+        with TestingSessionLocal() as db:
+            db.execute(text("DROP TRIGGER reject_item"))
+            db.commit()
+
+    report = response.json()
+    assert report["created"] == 2
+    assert report["errors"] == [{"line": 3, "errors": ["The item could not be saved: rejected by the test"]}]
+    assert get_amount_of_items_per_shop(get_shop_by_user_id(user_id).id) == 3
+
+
+def test_import_invalidates_the_catalog(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    shop_slug = get_shop_by_user_id(user_id).slug
+    assert [item["name"] for item in client.get(f"/items/?shop={shop_slug}").json()] == ["fixture-item"]
+
+    response = upload(user_id, "items.csv", as_csv([item_row(shop_data["category_id"], "cached")]))
+    assert response.json()["created"] == 1
+    assert sorted(item["name"] for item in client.get(f"/items/?shop={shop_slug}").json()) == [
+        "cached",
+        "fixture-item",
+    ]
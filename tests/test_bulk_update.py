@@ -0,0 +1,96 @@
+from shop import bulk, schemas
+from shop.database import TestingSessionLocal
+from shop.querystats import collect
+from tests.conftest import client, get_headers, get_shop_by_user_id
+
+
+def bulk_patch(user_id: int, changes: list[dict]):
+    return client.patch("/item/bulk", headers=get_headers(user_id), json=changes)
+
+
+def add_items(user_id: int, category_id: int, names: list[str]) -> list[str]:
+    slugs = []
+    for name in names:
+        response = client.post(
+            "/item/",
+            headers=get_headers(user_id),
+            json={
+                "category_id": category_id,
+                "name": name,
+                "image": "/image.jpg",
+                "title": "title",
+                "description": "description",
+                "price": 10,
+            },
+        )
+        slugs.append(response.json()["slug"])
+    return slugs
+
+
+def test_bulk_update(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    slug = shop_data["item_slug"]
+    response = bulk_patch(
+        user_id,
+        [
+            {"slug": slug, "price": 15},
+            {"slug": "missing-item", "price": 1},
+            {"slug": slug, "is_available": False},
+        ],
+    )
+    assert response.status_code == 200
+    assert response.json() == {"updated": 1, "not_found": ["missing-item"]}
+
+    item = client.get(f"/item/{slug}/").json()
+    assert item["price"] == 15
+    assert item["is_available"] is False
+
+
+def test_bulk_update_is_scoped_to_the_shop(shop_data, other_shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    other_slug = other_shop_data["item_slug"]
+    response = bulk_patch(user_id, [{"slug": shop_data["item_slug"], "price": 3}, {"slug": other_slug, "price": 3}])
+    assert response.json() == {"updated": 1, "not_found": [other_slug]}
+    assert client.get(f"/item/{other_slug}/").json()["price"] != 3
+
+    response = bulk_patch(user_id, [{"slug": shop_data["item_slug"], "category_id": other_shop_data["category_id"]}])
+    assert response.status_code == 409
+
+
+def test_bulk_update_rejects_empty_and_unknown_changes(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    assert bulk_patch(user_id, [{"slug": shop_data["item_slug"]}]).status_code == 422
+    assert bulk_patch(user_id, [{"slug": shop_data["item_slug"], "name": "renamed"}]).status_code == 422
+    assert bulk_patch(user_id, []).status_code == 422
+
+
+def test_bulk_update_invalidates_the_catalog(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    slug = shop_data["item_slug"]
+    shop_slug = get_shop_by_user_id(user_id).slug
+    assert [item["name"] for item in client.get(f"/items/?shop={shop_slug}").json()] == ["fixture-item"]
+    assert client.get(f"/item/{slug}/").json()["price"] == 10
+
+    bulk_patch(user_id, [{"slug": slug, "price": 20}])
+    assert client.get(f"/item/{slug}/").json()["price"] == 20
+
+    bulk_patch(user_id, [{"slug": slug, "is_available": False}])
+    assert client.get(f"/items/?shop={shop_slug}").json() == []
+
+
+def test_bulk_update_statements_per_batch(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    slugs = add_items(user_id, shop_data["category_id"], [f"batch-{number}" for number in range(12)])
+    changes = [schemas.ItemBulkPatch(slug=slug, price=number) for number, slug in enumerate(slugs)]
+
+    db = TestingSessionLocal()
+    try:
+        with collect() as stats:
+            summary = bulk.update_items(db, get_shop_by_user_id(user_id), changes, batch_size=5)
+    finally:
+        db.close()
+
+    assert summary.updated == 12
+    # an UPDATE per batch and the commit, whatever the number of items
+    assert stats.count <= 3 + 2
+    assert [client.get(f"/item/{slug}/").json()["price"] for slug in slugs] == list(range(12))
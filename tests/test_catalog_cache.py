@@ -0,0 +1,216 @@
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from unittest.mock import patch
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from shop.cache import TTLCache, catalog_cache
+from shop.database import TestingSessionLocal
+from shop.models import Item
+from tests.conftest import client, delete_user, get_headers, get_shop_by_user_id, make_user_superuser
+from tests.factories import ShopFactory
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_ttl_cache_expires_entries():
+    cache = TTLCache(maxsize=10, ttl=60)
+    with patch("shop.cache.time.monotonic", return_value=1000.0):
+        cache.set("a", 1)
+    with patch("shop.cache.time.monotonic", return_value=1059.0):
+        assert cache.get("a") == 1
+    with patch("shop.cache.time.monotonic", return_value=1061.0):
+        assert cache.get("a") is None
+
+
+def test_ttl_cache_invalidates_by_tag():
+    cache = TTLCache(maxsize=10, ttl=60)
+    cache.set("a", 1, tags=[("item", 1)])
+    cache.set("b", 2, tags=[("item", 1), ("item", 2)])
+    cache.set("c", 3, tags=[("item", 2)])
+    cache.invalidate(("item", 1))
+    assert cache.get("a") is None
+    assert cache.get("b") is None
+    assert cache.get("c") == 3
+
+
+def test_item_detail_served_from_cache_and_invalidated_on_update(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    item_slug = user_data_dict["item_slug"]
+    user_id = new_shop.json()["id"]
+
+    first = client.get(f"/item/{item_slug}/")
+    hits = catalog_cache.hits
+    second = client.get(f"/item/{item_slug}/")
+    assert second.json() == first.json()
+    assert catalog_cache.hits == hits + 1
+
+    data = {"title": fake.text()}
+    response_patch = client.patch(f"/item/{item_slug}/", headers=get_headers(user_id), json=data)
+    assert response_patch.status_code == 200
+    assert client.get(f"/item/{item_slug}/").json()["title"] == data["title"]
+    delete_user(new_shop)
+
+
+def test_item_list_invalidated_on_new_item(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    category_id = user_data_dict["category_id"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+
+    assert len(client.get(f"/items/?shop={shop.slug}").json()) == 1
+    data = {
+        "name": fake.name(),
+        "image": fake.image_url(),
+        "title": fake.text(),
+        "description": fake.text(),
+        "price": fake.pyint(),
+        "category_id": category_id,
+    }
+    assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+    assert len(client.get(f"/items/?shop={shop.slug}").json()) == 2
+
+    response_delete = client.delete(f"/item/{user_data_dict['item_slug']}/", headers=get_headers(user_id))
+    assert response_delete.status_code == 200
+    assert len(client.get(f"/items/?shop={shop.slug}").json()) == 1
+    delete_user(new_shop)
+
+
+def test_cache_stats_superuser_only():
+    user_data_dict = ShopFactory.create(role="CUSTOMER")
+    new_user = user_data_dict["new_user"]
+    user_id = new_user.json()["id"]
+
+    response = client.get("/superuser/stats/cache/", headers=get_headers(user_id))
+    assert response.status_code == 403
+
+    make_user_superuser(user_id)
+    response = client.get("/superuser/stats/cache/", headers=get_headers(user_id))
+    assert response.status_code == 200
+    assert {"hits", "misses", "hit_rate", "size"} <= response.json()["catalog"].keys()
+    delete_user(new_user)
+
+
+def test_item_detail_conditional_get(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    item_slug = user_data_dict["item_slug"]
+    user_id = new_shop.json()["id"]
+
+    response = client.get(f"/item/{item_slug}/")
+    etag = response.headers["ETag"]
+    last_modified = response.headers["Last-Modified"]
+
+    response_not_modified = client.get(f"/item/{item_slug}/", headers={"If-None-Match": etag})
+    assert response_not_modified.status_code == 304
+    assert response_not_modified.content == b""
+    assert response_not_modified.headers["ETag"] == etag
+    assert client.get(f"/item/{item_slug}/", headers={"If-Modified-Since": last_modified}).status_code == 304
+
+    data = {"title": fake.text()}
+    assert client.patch(f"/item/{item_slug}/", headers=get_headers(user_id), json=data).status_code == 200
+    response_modified = client.get(f"/item/{item_slug}/", headers={"If-None-Match": etag})
+    assert response_modified.status_code == 200
+    assert response_modified.headers["ETag"] != etag
+    delete_user(new_shop)
+
+
+def test_item_list_and_shop_conditional_get():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+
+    etag = client.get(f"/items/?shop={shop.slug}").headers["ETag"]
+    assert client.get(f"/items/?shop={shop.slug}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/items/?shop={shop.slug}", headers={"If-None-Match": '"other"'}).status_code == 200
+
+    response = client.get(f"/shop/{shop.slug}")
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert client.get(f"/shop/{shop.slug}", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get(f"/shop/{shop.slug}", headers={"If-None-Match": f'W/{etag}, "other"'}).status_code == 304
+    delete_user(new_shop)
+
+
+def test_item_list_has_no_last_modified(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    data = {
+        "name": fake.name(),
+        "image": fake.image_url(),
+        "title": fake.text(),
+        "description": fake.text(),
+        "price": 10,
+        "category_id": user_data_dict["category_id"],
+    }
+    new_item = client.post("/item/", headers=get_headers(user_id), json=data)
+    response = client.get(f"/items/?shop={shop.slug}")
+    assert len(response.json()) == 2
+    assert "Last-Modified" not in response.headers
+
+    # the newest item leaves the list, the list is older than it was but it changed
+    client.patch(f"/item/{new_item.json()['slug']}/", headers=get_headers(user_id), json={"is_available": False})
+    since = format_datetime(datetime.now(timezone.utc), usegmt=True)
+    response = client.get(f"/items/?shop={shop.slug}", headers={"If-Modified-Since": since})
+    assert response.status_code == 200
+    assert len(response.json()) == 1
+    delete_user(new_shop)
+
+
+def test_new_review_modifies_the_item():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    item_slug = user_data_dict["item_slug"]
+    user_id = new_shop.json()["id"]
+    # an item rated 4 and last modified an hour ago, so the review is in a later second and keeps the rating
+    with TestingSessionLocal() as db:
+        db.query(Item).filter(Item.slug == item_slug).update(
+            {Item.average_rating: 4.0, Item.updated_at: datetime.now(timezone.utc) - timedelta(hours=1)}
+        )
+        db.commit()
+
+    response = client.get(f"/item/{item_slug}/?include=reviews")
+    assert response.json()["reviews"] == []
+    last_modified = response.headers["Last-Modified"]
+
+    with patch("shop.utils.check_if_user_bought_item"):
+        review = {"stars": 4, "comment": "same rating"}
+        assert client.post(f"/item/{item_slug}/reviews/", headers=get_headers(user_id), json=review).status_code == 200
+    response = client.get(f"/item/{item_slug}/?include=reviews", headers={"If-Modified-Since": last_modified})
+    assert response.status_code == 200
+    assert response.json()["average_rating"] == 4.0
+    assert [review["comment"] for review in response.json()["reviews"]] == ["same rating"]
+    delete_user(new_shop)
+
+
+def test_savepoint_rollback_keeps_the_changes_to_invalidate():
+    user_data_dict = ShopFactory.create()
+    item_slug = user_data_dict["item_slug"]
+    with TestingSessionLocal() as db:
+        item = db.query(Item).filter(Item.slug == item_slug).one()
+        item.price = 99
+        db.flush()
+        with pytest.raises(IntegrityError):
+            with db.begin_nested():
+                db.add(Item(shop_id=item.shop_id, name=item.name, slug=item_slug))
+                db.flush()
+        assert ("item", item.id) in db.info["cache_tags"][id(catalog_cache)]
+        db.rollback()
+        assert "cache_tags" not in db.info
+    delete_user(user_data_dict["new_shop"])
@@ -0,0 +1,80 @@
+import logging
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from shop.database import async_url
+from shop.pooling import MonitoredQueuePool, monitor_pool
+from tests.conftest import client, delete_user, get_headers, make_user_superuser
+from tests.factories import ShopFactory
+
+
+@pytest.fixture
+def small_engine(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'pool.db'}",
+        poolclass=MonitoredQueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=0.05,
+    )
+    yield engine
+    engine.dispose()
+
+
+def test_pool_monitor_counts_checkouts_and_exhaustion(small_engine, caplog):
+    monitor = monitor_pool(small_engine, "small")
+    with caplog.at_level(logging.INFO, logger="shop.pooling"):
+        with small_engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            assert monitor.exhausted
+            with pytest.raises(PoolTimeoutError):
+                small_engine.connect()
+        assert not monitor.exhausted
+
+    stats = monitor.stats()
+    assert stats["checkouts"] == 1
+    assert stats["timeouts"] == 1
+    assert stats["exhaustions"] == 1
+    assert stats["connects"] == 1
+    assert stats["checked_out"] == 0
+    assert sum(stats["wait_histogram"].values()) == 1
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("exhausted, requests wait" in message for message in messages)
+    assert any("no connection after" in message for message in messages)
+    assert any("free connections again" in message for message in messages)
+
+
+def test_pool_monitor_survives_dispose(small_engine):
+    monitor = monitor_pool(small_engine, "small")
+    with small_engine.connect():
+        pass
+    small_engine.dispose()
+    with small_engine.connect():
+        pass
+    assert small_engine.pool.monitor is monitor
+    assert monitor.stats()["checkouts"] == 2
+
+
+def test_async_url():
+    assert str(async_url("postgresql://user@host/db")) == "postgresql+asyncpg://user@host/db"
+    assert str(async_url("postgresql+psycopg2://user@host/db")) == "postgresql+asyncpg://user@host/db"
+    assert str(async_url("sqlite:///./test.db")) == "sqlite+aiosqlite:///./test.db"
+
+
+def test_db_pool_stats_superuser_only():
+    user_data_dict = ShopFactory.create(role="CUSTOMER")
+    new_user = user_data_dict["new_user"]
+    user_id = new_user.json()["id"]
+
+    response = client.get("/superuser/stats/db-pool/", headers=get_headers(user_id))
+    assert response.status_code == 403
+
+    make_user_superuser(user_id)
+    response = client.get("/superuser/stats/db-pool/", headers=get_headers(user_id))
+    assert response.status_code == 200
+    assert response.json().keys() == {"sync", "async", "replica"}
+    assert response.json()["replica"]["enabled"] is False
+    assert response.json()["sync"]["checkouts"] > 0
+    delete_user(new_user)
@@ -1,3 +1,9 @@
+import json
+
+from shop.database import TestingSessionLocal
+from shop.models import Item
+from shop.schemas import ItemSortEnum
+from shop.utils import paginate_items
 from tests.conftest import (
     client,
     delete_user,
@@ -377,3 +383,266 @@ def test_get_items_by_shop_not_exists_category_exists():
     assert response.status_code == 200
     assert len(response.json()) == get_amount_of_all_items()
     delete_user(new_shop)
+
+
+def test_get_items_keyset_pagination(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    category_id = user_data_dict["category_id"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    for _ in range(2):
+        data = {
+            "name": fake.name(),
+            "image": fake.image_url(),
+            "title": fake.text(),
+            "description": fake.text(),
+            "price": fake.pyint(),
+            "category_id": category_id,
+        }
+        assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+
+    first_page = client.get(f"/items/?shop={shop.slug}&limit=2")
+    assert first_page.status_code == 200
+    assert len(first_page.json()) == 2
+    next_cursor = first_page.headers["X-Next-Cursor"]
+    assert next_cursor == str(first_page.json()[-1]["id"])
+
+    last_page = client.get(f"/items/?shop={shop.slug}&limit=2&after={next_cursor}")
+    assert last_page.status_code == 200
+    assert len(last_page.json()) == 1
+    assert "X-Next-Cursor" not in last_page.headers
+    delete_user(new_shop)
+
+
+def test_search_items(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    category_id = user_data_dict["category_id"]
+    user_id = new_shop.json()["id"]
+    data = {
+        "name": "Searchable kettle",
+        "image": fake.image_url(),
+        "title": fake.text(),
+        "description": "Stainless zyxquartz kettle",
+        "price": fake.pyint(),
+        "category_id": category_id,
+    }
+    new_item = client.post("/item/", headers=get_headers(user_id), json=data)
+    assert new_item.status_code == 200
+
+    response = client.get("/items/search?q=zyxquartz")
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [new_item.json()["id"]]
+
+    # the index follows renames
+    new_description = {"description": "Stainless kettle"}
+    response_patch = client.patch(
+        f"/item/{new_item.json()['slug']}", headers=get_headers(user_id), json=new_description
+    )
+    assert response_patch.status_code == 200
+    assert client.get("/items/search?q=zyxquartz").json() == []
+    delete_user(new_shop)
+
+
+def test_get_item_facets(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    category_id = user_data_dict["category_id"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    data = {
+        "name": fake.name(),
+        "image": fake.image_url(),
+        "title": fake.text(),
+        "description": fake.text(),
+        "price": 300,
+        "category_id": category_id,
+    }
+    assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+
+    response = client.get(f"/items/facets?shop={shop.slug}")
+    assert response.status_code == 200
+    assert response.json() == {
+        "total": 2,
+        "shops": [{"slug": shop.slug, "shop_name": shop.shop_name, "count": 2}],
+        "categories": [{"name": "fixture-category", "count": 2}],
+        "ratings": [{"min": None, "max": 1.0, "count": 2}],
+        "prices": [{"min": 10.0, "max": 25.0, "count": 1}, {"min": 250.0, "max": 500.0, "count": 1}],
+    }
+    delete_user(new_shop)
+
+
+def test_item_facets_leave_unrated_items_out_of_the_rating_ranges(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    data = {
+        "name": fake.name(),
+        "image": fake.image_url(),
+        "title": fake.text(),
+        "description": fake.text(),
+        "price": 300,
+        "category_id": user_data_dict["category_id"],
+    }
+    assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+    with TestingSessionLocal() as db:
+        db.query(Item).filter(Item.id == user_data_dict["item_id"]).update({Item.average_rating: None})
+        db.commit()
+
+    response = client.get(f"/items/facets?shop={shop.slug}")
+    assert response.status_code == 200
+    assert response.json()["total"] == 2
+    assert response.json()["ratings"] == [{"min": None, "max": 1.0, "count": 1}]
+    delete_user(new_shop)
+
+
+def test_get_items_sorted_and_filtered_by_price(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    category_id = user_data_dict["category_id"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    for price in (50, 30):
+        data = {
+            "name": fake.name(),
+            "image": fake.image_url(),
+            "title": fake.text(),
+            "description": fake.text(),
+            "price": price,
+            "category_id": category_id,
+        }
+        assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+
+    first_page = client.get(f"/items/?shop={shop.slug}&sort=price&limit=2")
+    assert [item["price"] for item in first_page.json()] == [10, 30]
+    last_page = client.get(f"/items/?shop={shop.slug}&sort=price&limit=2&after={first_page.headers['X-Next-Cursor']}")
+    assert [item["price"] for item in last_page.json()] == [50]
+
+    first_page = client.get(f"/items/?shop={shop.slug}&sort=-price&limit=2")
+    assert [item["price"] for item in first_page.json()] == [50, 30]
+    last_page = client.get(f"/items/?shop={shop.slug}&sort=-price&limit=2&after={first_page.headers['X-Next-Cursor']}")
+    assert [item["price"] for item in last_page.json()] == [10]
+
+    response = client.get(f"/items/?shop={shop.slug}&min_price=20&max_price=40")
+    assert [item["price"] for item in response.json()] == [30]
+    assert client.get(f"/items/facets?shop={shop.slug}&min_price=20").json()["total"] == 2
+
+    assert client.get(f"/items/?shop={shop.slug}&sort=price&after=broken").status_code == 400
+    assert client.get(f"/items/?min_price=40&max_price=20").status_code == 422
+    delete_user(new_shop)
+
+
+def test_get_newest_items_follows_the_cursor(fake):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    shop = get_shop_by_user_id(user_id)
+    for _ in range(2):
+        data = {
+            "name": fake.name(),
+            "image": fake.image_url(),
+            "title": fake.text(),
+            "description": fake.text(),
+            "price": fake.pyint(),
+            "category_id": user_data_dict["category_id"],
+        }
+        assert client.post("/item/", headers=get_headers(user_id), json=data).status_code == 200
+
+    # the items are created within the same second, the id breaks the ties
+    first_page = client.get(f"/items/?shop={shop.slug}&sort=newest&limit=2")
+    last_page = client.get(f"/items/?shop={shop.slug}&sort=newest&limit=2&after={first_page.headers['X-Next-Cursor']}")
+    assert [item["id"] for item in last_page.json()] == [user_data_dict["item_id"]]
+    assert "X-Next-Cursor" not in last_page.headers
+    ids = [item["id"] for item in first_page.json() + last_page.json()]
+    assert ids == sorted(ids, reverse=True)
+    delete_user(new_shop)
+
+
+def test_sorted_pages_keep_the_items_without_a_value():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    with TestingSessionLocal() as db:
+        for number, (price, rating) in enumerate([(None, None), (5, 4.5), (None, 2.0), (8, None)]):
+            item = Item(
+                shop_id=user_data_dict["shop_id"],
+                category_id=user_data_dict["category_id"],
+                name=f"unvalued-item-{number}",
+                image="/image.jpg",
+                title="title",
+                description="description",
+                price=price,
+                slug=f"unvalued-item-{user_data_dict['shop_id']}-{number}",
+            )
+            db.add(item)
+            db.flush()
+            # the column default would replace a None given to the constructor
+            db.query(Item).filter(Item.id == item.id).update({Item.average_rating: rating})
+        db.commit()
+
+        query = db.query(Item).filter(Item.shop_id == user_data_dict["shop_id"], Item.slug.like("unvalued-item-%"))
+        for sort, column, descending in (
+            (ItemSortEnum.PRICE, "price", False),
+            (ItemSortEnum.PRICE_DESC, "price", True),
+            (ItemSortEnum.RATING, "average_rating", True),
+        ):
+            items, next_cursor = paginate_items(query, sort=sort, limit=1)
+            while next_cursor is not None:
+                page, next_cursor = paginate_items(query, sort=sort, after=next_cursor, limit=1)
+                items += page
+            assert len(items) == 4
+            # the items without a value come last, by id in the direction of the sort
+            values = [getattr(item, column) for item in items]
+            assert values[2:] == [None, None] and None not in values[:2]
+            assert (items[2].id > items[3].id) == descending
+    delete_user(new_shop)
+
+
+def test_export_items_ndjson():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+
+    response = client.get("/items/export.ndjson")
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert len(lines) == get_amount_of_all_items()
+    exported = {line["slug"]: line for line in lines}
+    assert exported[user_data_dict["item_slug"]]["name"] == "fixture-item"
+    assert exported[user_data_dict["item_slug"]]["price"] == 10.0
+    delete_user(new_shop)
+
+
+def test_get_items_sparse_fieldset():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    item_slug = user_data_dict["item_slug"]
+
+    response = client.get("/items/", params={"fields": "slug,name,price", "limit": 500})
+    assert response.status_code == 200
+    item = next(item for item in response.json() if item["slug"] == item_slug)
+    assert item == {"id": item["id"], "name": "fixture-item", "slug": item_slug, "price": 10.0}
+
+    response = client.get(f"/item/{item_slug}/", params={"fields": "name", "include": "reviews"})
+    assert response.status_code == 200
+    assert response.json() == {"id": item["id"], "name": "fixture-item", "reviews": []}
+
+    response = client.get(f"/item/{item_slug}/")
+    assert "reviews" in response.json()
+    assert "description" in response.json()
+
+    headers = get_headers(new_shop.json()["id"])
+    response = client.get("/shop-admin/items/", params={"fields": "slug"}, headers=headers)
+    assert response.status_code == 200
+    assert response.json() == [{"id": item["id"], "slug": item_slug}]
+    delete_user(new_shop)
+
+
+def test_get_items_unknown_field():
+    response = client.get("/items/", params={"fields": "slug,password"})
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Unknown fields: password."}
+
+    response = client.get("/items/", params={"include": "shop"})
+    assert response.status_code == 400
@@ -0,0 +1,84 @@
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+from shop.keyring import KeyRing
+
+
+def test_key_ring_signs_with_active_key_and_verifies_with_all():
+    old_ring = KeyRing({"2024-01": "old-secret"}, "2024-01")
+    old_token = old_ring.encode({"sub": "1"})
+    assert jwt.get_unverified_header(old_token)["kid"] == "2024-01"
+
+    rotated_ring = KeyRing({"2024-01": "old-secret", "2024-06": "new-secret"}, "2024-06")
+    new_token = rotated_ring.encode({"sub": "2"})
+    assert jwt.get_unverified_header(new_token)["kid"] == "2024-06"
+    assert rotated_ring.decode(old_token)["sub"] == "1"
+    assert rotated_ring.decode(new_token)["sub"] == "2"
+
+    with pytest.raises(JWTError):
+        old_ring.decode(new_token)
+
+
+def test_key_ring_accepts_tokens_without_kid():
+    key_ring = KeyRing({"a": "first-secret", "b": "second-secret"}, "b")
+    assert key_ring.decode(jwt.encode({"sub": "1"}, "first-secret", algorithm="HS256"))["sub"] == "1"
+    with pytest.raises(JWTError):
+        key_ring.decode(jwt.encode({"sub": "1"}, "unknown-secret", algorithm="HS256"))
+
+    expired = jwt.encode({"sub": "1", "exp": datetime.utcnow() - timedelta(minutes=1)}, "second-secret")
+    with pytest.raises(ExpiredSignatureError):
+        key_ring.decode(expired)
+
+
+def test_key_ring_reloads_changed_key_file(tmp_path):
+    key_file = tmp_path / "jwt-keys.json"
+    key_file.write_text(json.dumps({"active": "a", "keys": {"a": "first-secret"}}))
+    key_ring = KeyRing.from_file(str(key_file))
+
+    # another replica already signs with the rotated key
+    key_file.write_text(json.dumps({"active": "b", "keys": {"a": "first-secret", "b": "second-secret"}}))
+    os.utime(key_file, (0, 0))
+    token = KeyRing({"b": "second-secret"}, "b").encode({"sub": "1"})
+    with patch("shop.keyring.KEY_FILE_RELOAD_INTERVAL", 0):
+        assert key_ring.decode(token)["sub"] == "1"
+    assert key_ring.active_kid == "b"
+
+
+def test_key_ring_requires_active_key():
+    with pytest.raises(ValueError):
+        KeyRing({"a": "first-secret"}, "b")
+
+
+def test_key_ring_caches_verified_claims_until_exp():
+    key_ring = KeyRing({"a": "first-secret"}, "a")
+    token = key_ring.encode({"sub": "1", "exp": datetime.utcnow() + timedelta(minutes=5)})
+
+    with patch("shop.keyring.jwt.decode", wraps=jwt.decode) as decode:
+        assert key_ring.decode(token)["sub"] == "1"
+        claims = key_ring.decode(token)
+        claims["sub"] = "2"
+        assert key_ring.decode(token)["sub"] == "1"
+    assert decode.call_count == 1
+    assert key_ring.verified.stats()["hits"] == 2
+
+    # the entry expires together with the token
+    with patch("shop.cache.time.monotonic", return_value=time.monotonic() + 301):
+        with patch("shop.keyring.jwt.decode", wraps=jwt.decode) as decode:
+            key_ring.decode(token)
+    assert decode.call_count == 1
+
+
+def test_key_ring_does_not_cache_invalid_tokens():
+    key_ring = KeyRing({"a": "first-secret"}, "a")
+    forged = KeyRing({"a": "other-secret"}, "a").encode({"sub": "1"})
+    for _ in range(2):
+        with pytest.raises(JWTError):
+            key_ring.decode(forged)
+    assert key_ring.verified.stats()["size"] == 0
@@ -1,9 +1,29 @@
+import asyncio
+import threading
+import time
 from datetime import datetime, timedelta
-
-from conftest import client, create_user, delete_user, get_user_by_id_and_assign_inactive
+from unittest.mock import patch
+
+import httpx
+import pytest
+from conftest import (
+    client,
+    create_user,
+    delete_user,
+    ger_user_by_id_approve,
+    get_headers,
+    get_user_by_id_and_assign_inactive,
+    make_user_superuser,
+)
+from fastapi import HTTPException
 from jose import jwt
 
 from shop import constants
+from shop.auth import create_activation_token, create_newsletter_token, create_reset_password_token
+from shop.main import app
+from shop.passwords import PasswordHasher, password_hasher
+from shop.revocation import RevocationList, revocation_list
+from shop.smtp_emails import send_activation_email
 from tests.factories import ShopFactory
 
 
@@ -103,7 +123,9 @@ def test_email_verification_success():
     assert new_user.status_code == 200
     user_id = new_user.json()["id"]
     get_user_by_id_and_assign_inactive(user_id)
-    token = jwt.encode({"sub": str(user_id)}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": str(user_id), "type": "activation_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     response = client.get(f"/verification/?token={token}")
     delete_user(new_user)
     assert response.status_code == 200
@@ -114,7 +136,9 @@ def test_email_verification_invalid_token():
     new_user = user_data_dict["new_user"]
     assert new_user.status_code == 200
     user_id = new_user.json()["id"]
-    token = jwt.encode({"sub": str(user_id)}, "INCORRECT_SECRET", algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": str(user_id), "type": "activation_token"}, "INCORRECT_SECRET", algorithm=constants.ALGORITHM
+    )
     response = client.get(f"/verification/?token={token}")
     delete_user(new_user)
     assert response.status_code == 401
@@ -130,14 +154,18 @@ def test_email_verification_expired_token():
     # Generate token with a future expiration time for the first verification
     future_expiration = datetime.utcnow() + timedelta(hours=1)
     token = jwt.encode(
-        {"sub": str(user_id), "exp": future_expiration}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+        {"sub": str(user_id), "type": "activation_token", "exp": future_expiration},
+        constants.JWT_SECRET,
+        algorithm=constants.ALGORITHM,
     )
     response = client.get(f"/verification/?token={token}")
     assert response.status_code == 200
     # Generate token with a past expiration time for the second verification
     past_expiration = datetime.utcnow() - timedelta(hours=1)
     exp_token = jwt.encode(
-        {"sub": str(user_id), "exp": past_expiration}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+        {"sub": str(user_id), "type": "activation_token", "exp": past_expiration},
+        constants.JWT_SECRET,
+        algorithm=constants.ALGORITHM,
     )
     response = client.get(f"/verification/?token={exp_token}")
     delete_user(new_user)
@@ -150,7 +178,9 @@ def test_reset_password_success():
     new_user = user_data_dict["new_user"]
     assert new_user.status_code == 200
     user_id = new_user.json()["id"]
-    token = jwt.encode({"sub": str(user_id)}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": str(user_id), "type": "reset_password_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     data = {"new_password": "qwertyqwerty"}
     response = client.post(f"/reset-password/verify/?token={token}", json=data)
     assert response.status_code == 200
@@ -163,7 +193,9 @@ def test_reset_password_invalid_token():
     new_user = user_data_dict["new_user"]
     assert new_user.status_code == 200
     user_id = new_user.json()["id"]
-    token = jwt.encode({"sub": str(user_id)}, "INCORRECT_SECRET", algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": str(user_id), "type": "reset_password_token"}, "INCORRECT_SECRET", algorithm=constants.ALGORITHM
+    )
     data = {"new_password": "qwertyqwerty"}
     response = client.post(f"/reset-password/verify/?token={token}", json=data)
     assert response.status_code == 401
@@ -172,7 +204,9 @@ def test_reset_password_invalid_token():
 
 
 def test_reset_password_user_not_found():
-    token = jwt.encode({"sub": str(9999)}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": str(9999), "type": "reset_password_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     data = {"new_password": "qwertyqwerty"}
     response = client.post(f"/reset-password/verify/?token={token}", json=data)
     assert response.status_code == 404
@@ -187,7 +221,9 @@ def test_reset_password_expired_token():
     # Generate token with a future expiration time for the first verification
     future_expiration = datetime.utcnow() + timedelta(hours=1)
     token = jwt.encode(
-        {"sub": str(user_id), "exp": future_expiration}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+        {"sub": str(user_id), "type": "reset_password_token", "exp": future_expiration},
+        constants.JWT_SECRET,
+        algorithm=constants.ALGORITHM,
     )
     data = {"new_password": "qwertyqwerty"}
     response = client.post(f"/reset-password/verify/?token={token}", json=data)
@@ -195,9 +231,174 @@ def test_reset_password_expired_token():
     # Generate token with a past expiration time for the second verification
     past_expiration = datetime.utcnow() - timedelta(hours=1)
     exp_token = jwt.encode(
-        {"sub": str(user_id), "exp": past_expiration}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+        {"sub": str(user_id), "type": "reset_password_token", "exp": past_expiration},
+        constants.JWT_SECRET,
+        algorithm=constants.ALGORITHM,
     )
     response = client.post(f"/reset-password/verify/?token={exp_token}", json=data)
     assert response.status_code == 401
     assert response.json() == {"detail": "Token has expired."}
     delete_user(new_user)
+
+
+def test_password_hasher_refuses_jobs_above_max_pending():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+    running = hasher.submit(release.wait)
+    with pytest.raises(HTTPException) as exc_info:
+        hasher.submit(release.wait)
+    assert exc_info.value.status_code == 503
+    release.set()
+    assert running.result() is True
+    assert hasher.submit(lambda: "done").result() == "done"
+    stats = hasher.stats()
+    assert stats["completed"] == 2
+    assert stats["rejected"] == 1
+    assert stats["pending"] == 0
+
+
+def test_password_hashing_stats(random_user_data):
+    new_user = create_user(random_user_data)
+    completed = password_hasher.stats()["completed"]
+    data = {"username": random_user_data["email"], "password": random_user_data["password"]}
+    assert client.post("/login", data=data).status_code == 200
+    assert password_hasher.stats()["completed"] == completed + 1
+
+    ger_user_by_id_approve(new_user.json()["id"])
+    headers = get_headers(new_user.json()["id"])
+    assert client.get("/superuser/stats/password-hashing/", headers=headers).status_code == 403
+    make_user_superuser(new_user.json()["id"])
+    response = client.get("/superuser/stats/password-hashing/", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["completed"] >= completed + 1
+    delete_user(new_user)
+
+
+def login_tokens(user_data: dict) -> dict:
+    data = {"username": user_data["email"], "password": user_data["password"]}
+    response = client.post("/login", data=data)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_refresh_token_rotation(random_user_data):
+    new_user = create_user(random_user_data)
+    ger_user_by_id_approve(new_user.json()["id"])
+    tokens = login_tokens(random_user_data)
+
+    # refresh tokens are no access tokens
+    headers = {"Authorization": f"Bearer {tokens['refresh_token']}"}
+    assert client.get("/user/me", headers=headers).status_code == 401
+
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    new_tokens = response.json()
+    headers = {"Authorization": f"Bearer {new_tokens['access_token']}"}
+    assert client.get("/user/me", headers=headers).status_code == 200
+
+    # a refresh token can be used once
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked."}
+    delete_user(new_user)
+
+
+def test_concurrent_refreshes_with_the_same_token(random_user_data):
+    new_user = create_user(random_user_data)
+    ger_user_by_id_approve(new_user.json()["id"])
+    tokens = login_tokens(random_user_data)
+
+    # both requests pass the revocation check before either of them has revoked the token
+    with patch("shop.auth.revocation.is_revoked", return_value=False):
+        responses = [client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]}) for _ in range(2)]
+    assert [response.status_code for response in responses] == [200, 401]
+    assert responses[1].json() == {"detail": "Token has been revoked."}
+    delete_user(new_user)
+
+
+def test_tokens_are_only_accepted_for_their_purpose(random_user_data):
+    new_user = create_user(random_user_data)
+    user_id = new_user.json()["id"]
+    ger_user_by_id_approve(user_id)
+    tokens = login_tokens(random_user_data)
+    access, refresh = tokens["access_token"], tokens["refresh_token"]
+    activation = create_activation_token(sub=user_id)
+    reset = create_reset_password_token(sub=user_id)
+    newsletter = create_newsletter_token(email=random_user_data["email"])
+
+    # emailed tokens are no access tokens
+    for token in (activation, reset, newsletter):
+        assert client.get("/user/me", headers={"Authorization": f"Bearer {token}"}).status_code == 401
+    assert client.get("/user/me", headers={"Authorization": f"Bearer {access}"}).status_code == 200
+
+    invalid = {"detail": "Invalid token."}
+    for token in (access, refresh, reset, newsletter):
+        response = client.get(f"/verification/?token={token}")
+        assert (response.status_code, response.json()) == (401, invalid)
+    for token in (access, refresh, activation, newsletter):
+        response = client.get(f"/reset-password/verify/?token={token}")
+        assert (response.status_code, response.json()) == (401, invalid)
+        response = client.post(f"/reset-password/verify/?token={token}", json={"new_password": "qwertyqwerty"})
+        assert (response.status_code, response.json()) == (401, invalid)
+    for token in (access, refresh, activation, reset):
+        response = client.get(f"/newsletter/verify/?token={token}")
+        assert (response.status_code, response.json()) == (401, invalid)
+        response = client.get(f"/newsletter/unsubscribe/?token={token}")
+        assert (response.status_code, response.json()) == (401, invalid)
+
+    assert client.get(f"/verification/?token={activation}").status_code == 200
+    assert client.get(f"/reset-password/verify/?token={reset}").status_code == 200
+    delete_user(new_user)
+
+
+def test_logout_revokes_tokens(random_user_data):
+    new_user = create_user(random_user_data)
+    ger_user_by_id_approve(new_user.json()["id"])
+    tokens = login_tokens(random_user_data)
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    response = client.post("/logout", headers=headers, json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 200
+    response = client.get("/user/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Token has been revoked."}
+    response = client.post("/token/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert response.status_code == 401
+
+    # other processes load the revoked tokens from the database
+    revocation_list.clear()
+    assert client.get("/user/me", headers=headers).status_code == 401
+    delete_user(new_user)
+
+
+def test_revocation_list_drops_expired_tokens():
+    revoked = RevocationList(sync_interval=60)
+    revoked.add("expired", time.time() - 1)
+    revoked.add("valid", time.time() + 60)
+    assert not revoked.is_revoked("expired")
+    assert revoked.is_revoked("valid")
+    assert revoked.stats()["size"] == 1
+
+
+def test_concurrent_logins_on_async_sessions(random_user_data):
+    new_user = create_user(random_user_data)
+    data = {"username": random_user_data["email"], "password": random_user_data["password"]}
+
+    async def login_concurrently(count: int):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as async_client:
+            return await asyncio.gather(*(async_client.post("/login", data=data) for _ in range(count)))
+
+    responses = asyncio.run(login_concurrently(5))
+    assert [response.status_code for response in responses] == [200] * 5
+    delete_user(new_user)
+
+
+def test_activation_email_opens_its_own_session(random_user_data):
+    new_user = create_user(random_user_data)
+    with patch.object(constants, "SENDGRID_API_KEY", "key"), patch("shop.smtp_emails.SendGridAPIClient"), patch(
+        "shop.smtp_emails.Mail"
+    ) as mail:
+        send_activation_email(new_user.json()["id"])
+    assert mail.call_args.kwargs["to_emails"] == random_user_data["email"]
+    delete_user(new_user)
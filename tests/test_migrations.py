@@ -0,0 +1,92 @@
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import Session
+
+from shop import migrate, models
+from shop.database import test_engine
+from shop.search import _install_search_index, search_items
+
+BASELINE_SCHEMA = Path(__file__).parent / "baseline_schema.sql"
+BASELINE_ITEM = (
+    "INSERT INTO item (name, title, description, slug, is_approved, is_available) "
+    "VALUES ('Baseline Lamp', 'Desk lamp', 'A lamp', 'baseline-lamp', 1, 1)"
+)
+
+
+@pytest.fixture
+def scratch_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'migrations.db'}")
+    yield engine
+    engine.dispose()
+
+
+def create_baseline_schema(engine):
+    connection = engine.raw_connection()
+    try:
+        connection.driver_connection.executescript(BASELINE_SCHEMA.read_text())
+    finally:
+        connection.close()
+
+
+def assert_schema_matches_the_models(engine):
+    with engine.connect() as connection:
+        context = MigrationContext.configure(connection, opts={"include_name": migrate.include_name})
+        assert compare_metadata(context, models.Base.metadata) == []
+
+
+def test_migrations_match_the_models():
+    assert_schema_matches_the_models(test_engine)
+
+
+def test_schema_version_check(scratch_engine):
+    with pytest.raises(RuntimeError, match="no schema"):
+        migrate.check_schema_version(scratch_engine)
+
+    migrate.upgrade(scratch_engine)
+    migrate.check_schema_version(scratch_engine)
+
+    # code rolled back behind the database
+    with scratch_engine.begin() as connection:
+        connection.execute(text("UPDATE alembic_version SET version_num = 'ffffffffffff'"))
+    migrate.check_schema_version(scratch_engine)
+
+
+def test_schema_built_by_the_first_release_is_upgraded(scratch_engine):
+    create_baseline_schema(scratch_engine)
+    with scratch_engine.begin() as connection:
+        connection.execute(text(BASELINE_ITEM))
+
+    migrate.upgrade(scratch_engine)
+    with scratch_engine.connect() as connection:
+        assert migrate.current_revision(connection) == migrate.head_revision()
+    assert_schema_matches_the_models(scratch_engine)
+    with Session(scratch_engine) as db:
+        assert [item.name for item in search_items(db, "lamp")] == ["Baseline Lamp"]
+
+
+def test_schema_built_before_the_migrations_is_upgraded(scratch_engine):
+    # later releases added the revoked tokens with create_all and the search index when the app started
+    create_baseline_schema(scratch_engine)
+    models.RevokedToken.__table__.create(scratch_engine)
+    with scratch_engine.begin() as connection:
+        _install_search_index(connection)
+        connection.execute(text(BASELINE_ITEM))
+
+    migrate.upgrade(scratch_engine)
+    assert_schema_matches_the_models(scratch_engine)
+    with Session(scratch_engine) as db:
+        assert [item.name for item in search_items(db, "lamp")] == ["Baseline Lamp"]
+
+
+def test_downgrade_to_an_empty_database(scratch_engine):
+    migrate.upgrade(scratch_engine)
+    config = migrate.alembic_config()
+    with scratch_engine.connect() as connection:
+        config.attributes["connection"] = connection
+        command.downgrade(config, "base")
+    assert inspect(scratch_engine).get_table_names() == ["alembic_version"]
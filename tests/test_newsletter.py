@@ -53,7 +53,9 @@ def test_newsletter_verify_success(fake):
     with patch("shop.routers.signup.BackgroundTasks.add_task"):
         response_1 = client.post("/newsletter/signup/", json={"email": fake_mail})
     assert response_1.status_code == 200
-    token = jwt.encode({"sub": fake_mail}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": fake_mail, "type": "newsletter_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     response_2 = client.get(f"/newsletter/verify/?token={token}")
     assert response_2.status_code == 200
     assert response_2.json() == {"detail": "Email is successfully verified."}
@@ -65,7 +67,9 @@ def test_newsletter_verify_already_activated(fake):
         response_1 = client.post("/newsletter/signup/", json={"email": fake_mail})
     assert response_1.status_code == 200
     get_newsletter_and_activate(fake_mail)
-    token = jwt.encode({"sub": fake_mail}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": fake_mail, "type": "newsletter_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     response_2 = client.get(f"/newsletter/verify/?token={token}")
     assert response_2.status_code == 409
     assert response_2.json() == {"detail": "Your email already activated."}
@@ -77,7 +81,9 @@ def test_newsletter_unsubscribe_success(fake):
         response_1 = client.post("/newsletter/signup/", json={"email": fake_mail})
     assert response_1.status_code == 200
     get_newsletter_and_activate(fake_mail)
-    token = jwt.encode({"sub": fake_mail}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": fake_mail, "type": "newsletter_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     response_2 = client.get(f"/newsletter/unsubscribe/?token={token}")
     assert response_2.status_code == 200
     assert response_2.json() == {"detail": "You are successfully unsubscribed."}
@@ -88,7 +94,9 @@ def test_newsletter_unsubscribe_already_unsubscribed(fake):
     with patch("shop.routers.signup.BackgroundTasks.add_task"):
         response_1 = client.post("/newsletter/signup/", json={"email": fake_mail})
     assert response_1.status_code == 200
-    token = jwt.encode({"sub": fake_mail}, constants.JWT_SECRET, algorithm=constants.ALGORITHM)
+    token = jwt.encode(
+        {"sub": fake_mail, "type": "newsletter_token"}, constants.JWT_SECRET, algorithm=constants.ALGORITHM
+    )
     response_2 = client.get(f"/newsletter/unsubscribe/?token={token}")
     assert response_2.status_code == 409
     assert response_2.json() == {"detail": "You are not subscribed for a newsletter."}
@@ -0,0 +1,84 @@
+from shop.cache import principal_cache
+from shop.database import TestingSessionLocal
+from shop.models import Shop, User
+from tests.conftest import (
+    client,
+    count_queries,
+    delete_user,
+    get_headers,
+    get_user_by_id_and_assign_inactive,
+)
+from tests.factories import ShopFactory
+
+
+def test_authenticated_request_uses_cached_principal():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    headers = get_headers(new_shop.json()["id"])
+    principal_cache.clear()
+
+    with count_queries() as statements:
+        response = client.get("/user/me", headers=headers)
+    assert response.status_code == 200
+    assert len(statements) == 1
+
+    with count_queries() as statements:
+        response = client.get("/user/me", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["email"] == new_shop.json()["email"]
+    assert statements == []
+
+    # shop admins only load their shop
+    with count_queries() as statements:
+        response = client.get("/shop-admin/categories/", headers=headers)
+    assert response.status_code == 200
+    assert not any("FROM users" in statement for statement in statements)
+    delete_user(new_shop)
+
+
+def test_principal_cache_invalidated_on_deactivation():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    headers = get_headers(user_id)
+    assert client.get("/user/me", headers=headers).status_code == 200
+
+    get_user_by_id_and_assign_inactive(user_id)
+    response = client.get("/user/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Please activate your account."}
+    delete_user(new_shop)
+
+
+def test_principal_cache_invalidated_on_role_and_shop_changes():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    headers = get_headers(user_id)
+    assert client.get("/shop-admin/categories/", headers=headers).status_code == 200
+
+    with TestingSessionLocal() as db:
+        db.query(Shop).filter(Shop.user_id == user_id).first().is_approved = False
+        db.commit()
+    response = client.get("/shop-admin/categories/", headers=headers)
+    assert response.status_code == 403
+    assert response.json() == {"detail": "Your shop is not approved."}
+
+    with TestingSessionLocal() as db:
+        db.get(User, user_id).role = "CUSTOMER"
+        db.commit()
+    response = client.get("/shop-admin/categories/", headers=headers)
+    assert response.json() == {"detail": "Forbidden."}
+    delete_user(new_shop)
+
+
+def test_principal_cache_invalidated_on_deletion():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    headers = get_headers(new_shop.json()["id"])
+    assert client.get("/user/me", headers=headers).status_code == 200
+
+    delete_user(new_shop)
+    response = client.get("/user/me", headers=headers)
+    assert response.status_code == 401
+    assert response.json() == {"detail": "Could not validate credentials"}
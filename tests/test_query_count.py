@@ -0,0 +1,111 @@
+from shop import constants, querystats
+from shop.cache import catalog_cache
+from shop.database import TestingSessionLocal
+from shop.models import Item, ItemReview
+from tests.conftest import client, count_queries, create_order, delete_user, get_headers, get_shop_by_user_id
+from tests.factories import ShopFactory
+
+
+def add_reviewed_items(shop_id: int, category_id: int, user_id: int, amount: int):
+    with TestingSessionLocal() as db:
+        for number in range(amount):
+            item = Item(
+                shop_id=shop_id,
+                category_id=category_id,
+                name=f"query-count-item-{number}",
+                image="/query-count.jpg",
+                title="query-count-title",
+                description="query-count-description",
+                price=number + 1,
+                slug=f"query-count-item-{shop_id}-{number}",
+            )
+            item.reviews.append(ItemReview(user_id=user_id, stars=5, comment="query-count-review"))
+            db.add(item)
+        db.commit()
+
+
+def count_list_queries(url: str, **kwargs) -> int:
+    catalog_cache.clear()
+    with count_queries() as statements:
+        response = client.get(url, **kwargs)
+    assert response.status_code == 200
+    return len(statements), response.json()
+
+
+def test_item_lists_load_reviews_with_a_fixed_number_of_queries():
+    counts = {}
+    for amount in (1, 20):
+        user_data_dict = ShopFactory.create()
+        new_shop = user_data_dict["new_shop"]
+        user_id = new_shop.json()["id"]
+        shop_slug = get_shop_by_user_id(user_id).slug
+        add_reviewed_items(user_data_dict["shop_id"], user_data_dict["category_id"], user_id, amount)
+
+        catalog_count, items = count_list_queries("/items/", params={"shop": shop_slug})
+        assert len(items) == amount + 1
+        assert all(len(item["reviews"]) == 1 for item in items if item["slug"] != user_data_dict["item_slug"])
+
+        admin_count, items = count_list_queries("/shop-admin/items/", headers=get_headers(user_id))
+        assert len(items) == amount + 1
+
+        search_count, items = count_list_queries("/items/search", params={"q": "query-count-description"})
+        counts[amount] = (catalog_count, admin_count, search_count)
+        delete_user(new_shop)
+
+    # the async endpoints' statements are counted too
+    assert all(counts[1])
+    assert counts[1] == counts[20]
+
+
+def test_shop_admin_stats_within_query_budget(order_data, query_budget):
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    shop_user_id = new_shop.json()["id"]
+    customers = [ShopFactory.create(role="CUSTOMER")["new_user"] for _ in range(3)]
+    for customer in customers:
+        customer_id = customer.json()["id"]
+        response = client.post(f"/add-to-the-cart/{user_data_dict['item_slug']}/", headers=get_headers(customer_id))
+        assert response.status_code == 200
+        assert create_order(order_data, customer_id).status_code == 200
+        response = client.post(f"/wish-list/{user_data_dict['item_slug']}/", headers=get_headers(customer_id))
+        assert response.status_code == 200
+
+    # the token's user (when not cached), the shop, then a single query whatever the number of orders,
+    # and one spare for the periodic sync of the revoked tokens
+    with query_budget(4):
+        response = client.get("/shop-admin/users/", headers=get_headers(shop_user_id))
+    assert response.status_code == 200
+    assert {user["id"] for user in response.json()} == {customer.json()["id"] for customer in customers}
+
+    with query_budget(4):
+        response = client.get("/shop-admin/stats-items/", headers=get_headers(shop_user_id))
+    assert response.status_code == 200
+    stats = response.json()[str(user_data_dict["item_id"])]
+    assert stats["quantity"] == 3
+    assert stats["wish_list_count"] == 3
+
+    for customer in customers:
+        delete_user(customer)
+    delete_user(new_shop)
+
+
+def test_query_stats_headers():
+    catalog_cache.clear()
+    response = client.get("/items/")
+    assert int(response.headers["X-Query-Count"]) >= 1
+    assert float(response.headers["X-Query-Time-Ms"]) >= 0
+    assert "X-Query-Repeated" not in response.headers
+
+
+def test_repeated_statements_are_flagged():
+    with TestingSessionLocal() as db, querystats.collect() as stats:
+        for item_id in range(constants.N_PLUS_ONE_THRESHOLD):
+            db.query(Item).filter(Item.id == item_id).first()
+        db.query(Item).filter(Item.id.in_([1, 2, 3])).all()
+        db.query(Item).filter(Item.id.in_([1, 2])).all()
+    assert stats.count == constants.N_PLUS_ONE_THRESHOLD + 2
+    repeated = stats.repeated()
+    assert len(repeated) == 1
+    assert repeated[0][1] == constants.N_PLUS_ONE_THRESHOLD
+    # IN lists of any length have the same shape
+    assert len(stats.shapes) == 2
@@ -0,0 +1,109 @@
+from unittest.mock import patch
+
+import pytest
+
+from shop import passwords
+from shop.ratelimit import (
+    MemoryBackend,
+    RateLimiter,
+    SharedBackend,
+    SlidingWindow,
+    TokenBucket,
+    hit_window,
+    take_token,
+)
+from tests.conftest import client, create_user, delete_user
+
+
+class FakeSharedClient:
+    """
+    Stand-in for the shared store, keeps the values in a dict and ignores ttls.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.available = True
+
+    def _check(self):
+        if not self.available:
+            raise ConnectionError("store is down")
+
+    def get(self, key):
+        self._check()
+        return self.values.get(key)
+
+    def compare_and_set(self, key, expected, value, ttl):
+        self._check()
+        if self.values.get(key) != expected:
+            return False
+        self.values[key] = value
+        return True
+
+    def incr(self, key, ttl):
+        self._check()
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+
+@pytest.mark.parametrize("backend", [MemoryBackend(), SharedBackend(FakeSharedClient())])
+def test_token_bucket(backend):
+    bucket = TokenBucket(capacity=3, rate=1)
+    with patch("shop.ratelimit.clock", return_value=1000.0):
+        assert [take_token(backend, "bucket", bucket) for _ in range(3)] == [0, 0, 0]
+        assert take_token(backend, "bucket", bucket) == pytest.approx(1)
+    with patch("shop.ratelimit.clock", return_value=1001.0):
+        assert take_token(backend, "bucket", bucket) == 0
+        assert take_token(backend, "bucket", bucket) > 0
+    with patch("shop.ratelimit.clock", return_value=1000.0):
+        assert take_token(backend, "other-bucket", bucket) == 0
+
+
+@pytest.mark.parametrize("backend", [MemoryBackend(), SharedBackend(FakeSharedClient())])
+def test_sliding_window(backend):
+    window = SlidingWindow(limit=2, window=60)
+    with patch("shop.ratelimit.clock", return_value=6000.0):
+        assert hit_window(backend, "window", window) == 0
+        assert hit_window(backend, "window", window) == 0
+    # half of the previous window still counts
+    with patch("shop.ratelimit.clock", return_value=6090.0):
+        assert hit_window(backend, "window", window) == 0
+        assert hit_window(backend, "window", window) == pytest.approx(30)
+
+
+def test_shared_backend_lets_requests_through_when_store_is_down():
+    shared_client = FakeSharedClient()
+    limiter = RateLimiter(SharedBackend(shared_client))
+    rules = [("test", "key", TokenBucket(capacity=1, rate=0.01))]
+    assert limiter.check(rules) == 0
+    assert limiter.check(rules) > 0
+    shared_client.available = False
+    assert limiter.check(rules) == 0
+    assert limiter.stats() == {"allowed": 2, "throttled": {"test": 1}, "backend_errors": 2}
+
+
+def test_login_throttled_before_password_verification(random_user_data):
+    new_user = create_user(random_user_data)
+    data = {"username": random_user_data["email"], "password": "wrong-password"}
+    limiter = RateLimiter(MemoryBackend())
+    with patch("shop.constants.RATE_LIMIT_ENABLED", True), patch("shop.ratelimit.rate_limiter", limiter):
+        for _ in range(10):
+            assert client.post("/login", data=data).status_code == 400
+        with patch.object(passwords.password_hasher, "submit") as submit:
+            response = client.post("/login", data=data)
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) > 0
+        submit.assert_not_called()
+    assert limiter.stats()["throttled"] == {"login-ip": 1, "login-account": 1}
+    delete_user(new_user)
+
+
+def test_signup_throttled_per_account(random_user_data):
+    limiter = RateLimiter(MemoryBackend())
+    with patch("shop.constants.RATE_LIMIT_ENABLED", True), patch("shop.ratelimit.rate_limiter", limiter):
+        new_user = create_user(random_user_data)
+        assert new_user.status_code == 200
+        for _ in range(2):
+            assert client.post("/signup/", json=random_user_data).status_code == 409
+        response = client.post("/signup/", json=random_user_data)
+    assert response.status_code == 429
+    delete_user(new_user)
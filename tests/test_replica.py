@@ -0,0 +1,92 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from shop import models, replica
+from shop.database import RoutingSession, TestingSessionLocal, async_url, test_engine
+from shop.replica import ReplicaRouter
+from tests.conftest import client, get_headers, get_shop_by_user_id
+
+
+@pytest.fixture
+def replica_engine(tmp_path, monkeypatch):
+    """
+    A second SQLite file with the schema but none of the rows stands in for a replica which is far behind,
+    reads that find nothing were served by the replica.
+    """
+    engine = create_engine(f"sqlite:///{tmp_path / 'replica.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    # the asyncio connections are opened on the test client's event loop, none of them is kept past a request
+    async_engine = create_async_engine(async_url(engine.url), poolclass=NullPool)
+    router = ReplicaRouter(engine, max_lag=5, check_interval=0, async_engine=async_engine)
+    monkeypatch.setattr(replica, "replica_router", router)
+    yield engine
+    engine.dispose()
+
+
+def test_reads_go_to_the_replica(shop_data, replica_engine):
+    item_slug = shop_data["item_slug"]
+    shop_slug = get_shop_by_user_id(shop_data["new_shop"].json()["id"]).slug
+
+    assert client.get(f"/item/{item_slug}/").status_code == 404
+    assert client.get(f"/shop/{shop_slug}").status_code == 404
+    assert replica.replica_router.stats()["reads"] == {"replica": 2}
+
+
+def test_lagging_replica_falls_back_to_the_primary(shop_data, replica_engine, monkeypatch):
+    monkeypatch.setattr(replica.replica_router, "measure_lag", lambda: 10.0)
+    response = client.get(f"/item/{shop_data['item_slug']}/")
+    assert response.status_code == 200
+    assert replica.replica_router.stats()["reads"] == {"primary_lag": 1}
+
+
+def test_unavailable_replica_falls_back_to_the_primary(shop_data, replica_engine, monkeypatch):
+    def measure_lag():
+        raise ConnectionError("replica is down")
+
+    monkeypatch.setattr(replica.replica_router, "measure_lag", measure_lag)
+    assert client.get(f"/item/{shop_data['item_slug']}/").status_code == 200
+    assert replica.replica_router.stats()["lag"] == float("inf")
+
+
+def test_writer_reads_own_writes_from_the_primary(shop_data, replica_engine):
+    user_id = shop_data["new_shop"].json()["id"]
+    response = client.patch("/shop/", headers=get_headers(user_id), json={"description": "new description"})
+    assert response.status_code == 200
+    shop_slug = get_shop_by_user_id(user_id).slug
+
+    assert client.get(f"/shop/{shop_slug}", headers=get_headers(user_id)).status_code == 200
+    # other users still read from the replica
+    assert client.get(f"/shop/{shop_slug}").status_code == 404
+    assert replica.replica_router.stats()["reads"] == {"primary_recent_write": 1, "replica": 1}
+
+
+def test_routing_session_writes_to_the_primary(replica_engine):
+    db = RoutingSession(bind=test_engine, replica=replica_engine)
+    try:
+        assert db.get_bind(clause=db.query(models.Shop).statement) is replica_engine
+        db.add(models.NewsLetter(email="routing-session@example.com"))
+        db.flush()
+        # after a write the session reads its own writes
+        assert db.query(models.NewsLetter).filter_by(email="routing-session@example.com").count() == 1
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_savepoint_rollback_keeps_the_write():
+    db = TestingSessionLocal()
+    try:
+        db.add(models.NewsLetter(email="savepoint-write@example.com"))
+        db.flush()
+        with pytest.raises(IntegrityError):
+            with db.begin_nested():
+                db.add(models.NewsLetter(email="savepoint-write@example.com"))
+                db.flush()
+        assert db.info["replica_wrote"] is True
+        db.rollback()
+        assert "replica_wrote" not in db.info
+    finally:
+        db.close()
@@ -0,0 +1,50 @@
+from unittest.mock import patch
+
+from shop.cache import catalog_cache
+from shop.database import TestingSessionLocal
+from shop.models import Item, ItemReview
+from tests.conftest import client, delete_user, get_headers
+from tests.factories import ShopFactory
+
+
+def add_review(item_slug: str, user_id: int):
+    with TestingSessionLocal() as db:
+        item = db.query(Item).filter(Item.slug == item_slug).first()
+        db.add(ItemReview(item_id=item.id, user_id=user_id, stars=4, comment="fast-serialization-review"))
+        db.commit()
+
+
+def get_with_both_paths(url: str, **kwargs):
+    responses = []
+    for fast in (False, True):
+        catalog_cache.clear()
+        with patch("shop.constants.FAST_SERIALIZATION", fast):
+            responses.append(client.get(url, **kwargs))
+    return responses
+
+
+def test_fast_serialization_matches_pydantic_for_shop_items():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+    user_id = new_shop.json()["id"]
+    add_review(user_data_dict["item_slug"], user_id)
+    headers = get_headers(user_id)
+
+    slow, fast = get_with_both_paths("/shop-admin/items/", headers=headers)
+    assert slow.status_code == fast.status_code == 200
+    assert fast.json() == slow.json()
+    assert fast.json()[0]["reviews"][0]["comment"] == "fast-serialization-review"
+    delete_user(new_shop)
+
+
+def test_fast_serialization_matches_pydantic_for_catalog_and_users():
+    user_data_dict = ShopFactory.create()
+    new_shop = user_data_dict["new_shop"]
+
+    slow, fast = get_with_both_paths("/items/", params={"limit": 500})
+    assert fast.json() == slow.json()
+    assert fast.headers.get("X-Next-Cursor") == slow.headers.get("X-Next-Cursor")
+
+    slow, fast = get_with_both_paths("/users/")
+    assert fast.json() == slow.json()
+    delete_user(new_shop)
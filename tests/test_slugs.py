@@ -0,0 +1,87 @@
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from shop import models, utils
+from shop.database import TestingSessionLocal
+from shop.querystats import collect
+from tests.conftest import client, get_headers, get_shop_by_user_id
+
+
+@pytest.fixture
+def db():
+    session = TestingSessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+
+
+def test_next_free_slug(db):
+    for slug in ["slug-test", "slug-test-1", "slug-test-7", "slug-test-blue", "slug-test-1234567890", "slug-other-3"]:
+        db.add(models.Category(name=slug, slug=slug))
+    db.flush()
+
+    with collect() as stats:
+        assert utils.next_free_slug(db, models.Category.slug, "slug-test") == "slug-test-8"
+    assert stats.count == 1
+    assert utils.next_free_slug(db, models.Category.slug, "slug-test-blue") == "slug-test-blue-1"
+    assert utils.next_free_slug(db, models.Category.slug, "slug-free") == "slug-free"
+    # the base slug is free, whatever suffixes are taken
+    assert utils.next_free_slug(db, models.Category.slug, "slug-other") == "slug-other"
+    # LIKE wildcards in the base slug are literal
+    assert utils.next_free_slug(db, models.Category.slug, "slug_test") == "slug_test"
+
+    slugs = utils.allocate_slugs(db, models.Category.slug, ["slug-other", "slug-test", "slug-other", "slug-free"])
+    assert slugs == ["slug-other", "slug-test-8", "slug-other-4", "slug-free"]
+
+
+def test_unique_violation_of_the_slug():
+    def error(message: str) -> IntegrityError:
+        return IntegrityError("INSERT INTO item ...", {}, Exception(message))
+
+    assert utils.is_unique_violation(error("UNIQUE constraint failed: item.slug"), models.Item.slug)
+    postgres = 'duplicate key value violates unique constraint "item_slug_key"\nDETAIL:  Key (slug)=(a) already exists.'
+    assert utils.is_unique_violation(error(postgres), models.Item.slug)
+    assert not utils.is_unique_violation(error("NOT NULL constraint failed: item.slug"), models.Item.slug)
+    assert not utils.is_unique_violation(error("UNIQUE constraint failed: category.slug"), models.Item.slug)
+    foreign_key = 'insert or update on table "item" violates foreign key constraint "item_category_id_fkey"'
+    assert not utils.is_unique_violation(error(foreign_key), models.Item.slug)
+
+
+def test_items_with_the_same_slug_get_increasing_suffixes(shop_data):
+    user_id = shop_data["new_shop"].json()["id"]
+    data = {"image": "image", "title": "title", "description": "description", "price": 10}
+    data["category_id"] = shop_data["category_id"]
+    slugs = []
+    for name in ["Same Name", "same name", "Same name!"]:
+        response = client.post("/item/", headers=get_headers(user_id), json={**data, "name": name})
+        assert response.status_code == 200
+        slugs.append(response.json()["slug"])
+
+    base_slug = slugs[0]
+    assert slugs == [base_slug, f"{base_slug}-1", f"{base_slug}-2"]
+
+    response = client.patch(f"/item/{slugs[2]}/", headers=get_headers(user_id), json={"name": "SAME NAME"})
+    assert response.status_code == 200
+    assert response.json()["slug"] == f"{base_slug}-3"
+
+
+def test_slug_taken_by_a_concurrent_request_is_generated_again(shop_data, db):
+    shop = get_shop_by_user_id(shop_data["new_shop"].json()["id"])
+    taken_slug = db.execute(text("SELECT slug FROM category WHERE shop_id = :id"), {"id": shop.id}).scalar()
+    generated = iter([taken_slug, "slug-race-1"])
+
+    category = models.Category(shop_id=shop.id, name="slug race")
+    assert utils.add_with_unique_slug(db, category, lambda db: next(generated)) == "slug-race-1"
+    assert db.execute(text("SELECT count(*) FROM category WHERE slug = 'slug-race-1'")).scalar() == 1
+
+
+def test_slug_taken_again_and_again(shop_data, db):
+    shop = get_shop_by_user_id(shop_data["new_shop"].json()["id"])
+    taken_slug = db.execute(text("SELECT slug FROM category WHERE shop_id = :id"), {"id": shop.id}).scalar()
+
+    category = models.Category(shop_id=shop.id, name="slug race")
+    with pytest.raises(HTTPException) as error:
+        utils.add_with_unique_slug(db, category, lambda db: taken_slug)
+    assert error.value.status_code == 409